@@ -0,0 +1,185 @@
+"""
+Coalesced platform-access events.
+
+Frontends report a platform access on every wallet connect, so logging each
+one as a user_activities document produces hundreds of near-identical
+documents per user per day. In coalescing mode an access is kept raw only
+when it says something new:
+
+    - first seen: no raw event for the same (wallet, access_type, user agent,
+      IP) within raw_ttl seconds (one hour by default)
+    - unique: it carries additional_data, which cannot be merged
+
+Every access, raw or not, is counted in memory per (wallet, access_type,
+minute bucket) and flushed periodically as one $inc upsert per bucket:
+
+    access_buckets
+        wallet_address  BinData (compact schema)
+        access_type     e.g. 'wallet_connect'
+        bucket          start of the minute (UTC)
+        count           accesses in that minute
+        first_seen / last_seen
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from dbmanager import DBManager, SCHEMA_VERSION, encode_address
+
+
+def minute_bucket(timestamp: datetime, bucket_seconds: int = 60) -> datetime:
+    """Start of the bucket a timestamp falls in"""
+    epoch_seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch_seconds - epoch_seconds % bucket_seconds, tz=timezone.utc)
+
+
+class AccessCounter:
+    """In-memory access counts flushed as $inc upserts, raw activities only for new information"""
+
+    def __init__(self, db_manager: DBManager, bucket_seconds: int = 60, raw_ttl: float = 3600.0,
+                 max_fingerprints: int = 100000, max_pending: int = 100000,
+                 collection_name: str = 'access_buckets'):
+        self.db_manager = db_manager
+        self.bucket_seconds = bucket_seconds
+        self.raw_ttl = raw_ttl
+        self.max_fingerprints = max_fingerprints
+        # Buckets kept while MongoDB is unreachable; beyond this the oldest are dropped
+        self.max_pending = max_pending
+        self.collection_name = collection_name
+        self.stats = {'events': 0, 'raw': 0, 'coalesced': 0, 'flushed_buckets': 0, 'dropped_buckets': 0}
+        self._pending: Dict[Tuple[str, str, datetime], Dict[str, Any]] = OrderedDict()
+        self._fingerprints: Dict[str, datetime] = OrderedDict()
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _collection(self):
+        collection = self.db_manager.db[self.collection_name]
+        if not self._indexes_ready:
+            collection.create_index([('wallet_address', ASCENDING), ('access_type', ASCENDING),
+                                     ('bucket', ASCENDING)], unique=True)
+            self._indexes_ready = True
+        return collection
+
+    def record(self, wallet_address: str, access_type: str, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Count an access; also log it as a raw activity if it is first-seen or unique"""
+        wallet_address = wallet_address.lower()
+        now = datetime.now(timezone.utc)
+        raw = bool(details.get('additional_data')) or self._first_seen(wallet_address, access_type, details, now)
+
+        with self._lock:
+            self.stats['events'] += 1
+            self.stats['raw' if raw else 'coalesced'] += 1
+            key = (wallet_address, access_type, minute_bucket(now, self.bucket_seconds))
+            bucket = self._pending.get(key)
+            if bucket is None:
+                self._pending[key] = {'count': 1, 'first_seen': now, 'last_seen': now}
+                while len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+                    self.stats['dropped_buckets'] += 1
+            else:
+                bucket['count'] += 1
+                bucket['last_seen'] = now
+
+        if raw:
+            result = self.db_manager.log_user_activity(wallet_address, 'platform_access', details)
+            return {**result, "coalesced": False}
+        return {"success": True, "coalesced": True}
+
+    def _first_seen(self, wallet_address: str, access_type: str, details: Dict[str, Any], now: datetime) -> bool:
+        source = f"{wallet_address}|{access_type}|{details.get('user_agent')}|{details.get('ip_address')}"
+        fingerprint = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+        with self._lock:
+            last_raw = self._fingerprints.get(fingerprint)
+            if last_raw is not None and (now - last_raw).total_seconds() < self.raw_ttl:
+                return False
+            self._fingerprints[fingerprint] = now
+            self._fingerprints.move_to_end(fingerprint)
+            while len(self._fingerprints) > self.max_fingerprints:
+                self._fingerprints.popitem(last=False)
+            return True
+
+    def flush(self) -> Dict[str, Any]:
+        """Write pending bucket counts as $inc upserts; kept for the next flush if the write fails"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+            if not pending:
+                return {"success": True, "buckets": 0}
+            if not self.db_manager.is_connected():
+                self._restore(pending)
+                return {"success": False, "error": "Database not connected", "buckets": 0}
+
+            try:
+                operations = [
+                    UpdateOne(
+                        {'wallet_address': encode_address(wallet), 'access_type': access_type, 'bucket': bucket},
+                        {
+                            '$inc': {'count': counts['count']},
+                            '$min': {'first_seen': counts['first_seen']},
+                            '$max': {'last_seen': counts['last_seen']},
+                            '$setOnInsert': {'schema_version': SCHEMA_VERSION}
+                        },
+                        upsert=True
+                    )
+                    for (wallet, access_type, bucket), counts in pending.items()
+                ]
+                self._collection().bulk_write(operations, ordered=False)
+                with self._lock:
+                    self.stats['flushed_buckets'] += len(operations)
+                return {"success": True, "buckets": len(operations)}
+
+            except PyMongoError as e:
+                self._restore(pending)
+                return {"success": False, "error": f"Database error: {str(e)}"}
+            except Exception as e:
+                self._restore(pending)
+                return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    def _restore(self, pending: Dict[Tuple[str, str, datetime], Dict[str, Any]]) -> None:
+        """Merge unflushed counts back in front of anything recorded since"""
+        with self._lock:
+            for key, counts in self._pending.items():
+                merged = pending.get(key)
+                if merged is None:
+                    pending[key] = counts
+                else:
+                    merged['count'] += counts['count']
+                    merged['last_seen'] = counts['last_seen']
+            self._pending = pending
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.stats['dropped_buckets'] += 1
+
+    def get_access_counts(self, wallet_address: str, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Flushed access counts for a wallet per access type"""
+        if not self.db_manager.is_connected():
+            return {"success": True, "counts": {}, "offline_mode": True}
+
+        try:
+            match = {'wallet_address': encode_address(wallet_address)}
+            if since is not None:
+                match['bucket'] = {'$gte': since}
+            counts = {
+                row['_id']: {'count': row['count'], 'first_seen': row['first_seen'], 'last_seen': row['last_seen']}
+                for row in self._collection().aggregate([
+                    {'$match': match},
+                    {'$group': {'_id': '$access_type', 'count': {'$sum': '$count'},
+                                'first_seen': {'$min': '$first_seen'}, 'last_seen': {'$max': '$last_seen'}}}
+                ])
+            }
+            return {"success": True, "counts": counts}
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'pending_buckets': len(self._pending)}
@@ -0,0 +1,96 @@
+"""
+Canonical wallet addresses, validated and normalized once per distinct value.
+
+Address is a str holding the lowercase 0x form, so it can be used anywhere a
+plain address string was used before: as a dict key, in MongoDB filters, in
+JSON. It also carries the EIP-55 checksum form and the raw 20 bytes. Both
+are computed on first access and then kept on the instance.
+
+canonical_address() memoizes Address objects in a bounded LRU cache
+(ADDRESS_CACHE_SIZE). The keccak hash behind checksum validation and the
+checksum form is therefore paid once per distinct address per process,
+not once per request or per DB call.
+
+Routes validate at the request boundary with parse_address(). The DB layer
+recognises Address values and skips its own lower()/hex decoding for them.
+"""
+from functools import cached_property, lru_cache
+from typing import Any, Dict, Optional
+
+from config import Config
+
+HEX_DIGITS = frozenset('0123456789abcdef')
+
+
+class InvalidAddress(ValueError):
+    """Not a 20-byte hex address, or a mixed-case address with a wrong checksum"""
+
+
+class Address(str):
+    """A validated wallet address whose str value is the lowercase 0x form"""
+
+    @cached_property
+    def checksum(self) -> str:
+        """EIP-55 mixed-case form, as expected by web3 calls"""
+        from eth_utils import to_checksum_address
+        return to_checksum_address(str(self))
+
+    @cached_property
+    def raw(self) -> bytes:
+        """The 20 address bytes"""
+        return bytes.fromhex(self[2:])
+
+    def lower(self) -> 'Address':
+        # Already lowercase: keep the instance (and its cached forms) instead of copying
+        return self
+
+
+@lru_cache(maxsize=Config.ADDRESS_CACHE_SIZE)
+def _parse(value: str) -> Address:
+    body = value[2:] if value[:2] in ('0x', '0X') else value
+    lowered = body.lower()
+    if len(body) != 40 or not HEX_DIGITS.issuperset(lowered):
+        raise InvalidAddress(f"Invalid address: {value!r}")
+    address = Address('0x' + lowered)
+    # All-lowercase and all-uppercase addresses carry no checksum (EIP-55)
+    if body != lowered and body != body.upper() and address.checksum[2:] != body:
+        raise InvalidAddress(f"Invalid address checksum: {value!r}")
+    return address
+
+
+def canonical_address(value: Any) -> Address:
+    """Validated Address for a hex string (0x optional) or 20 raw bytes; raises InvalidAddress"""
+    if isinstance(value, Address):
+        return value
+    if isinstance(value, (bytes, bytearray)) and len(value) == 20:
+        value = '0x' + bytes(value).hex()
+    if not isinstance(value, str):
+        raise InvalidAddress(f"Invalid address: {value!r}")
+    return _parse(value)
+
+
+def parse_address(value: Any) -> Optional[Address]:
+    """Address for a request value, or None if it is missing or invalid"""
+    if not value:
+        return None
+    try:
+        return canonical_address(value)
+    except InvalidAddress:
+        return None
+
+
+def is_address(value: Any) -> bool:
+    return parse_address(value) is not None
+
+
+def address_cache_stats() -> Dict[str, Any]:
+    """Hits, misses and size of the address memo cache"""
+    info = _parse.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_ratio': round(info.hits / lookups, 4) if lookups else 0.0
+    }
@@ -0,0 +1,218 @@
+"""
+Live admin dashboard feed backed by MongoDB change streams.
+
+One watcher thread follows inserts/updates on users, user_activities and
+transactions, keeps the platform counters up to date in memory and pushes
+new logins, access changes and transactions to every subscribed admin.
+On deployments that are not replica sets (change streams unavailable) it
+falls back to re-running get_platform_stats on a fixed interval, once for
+all subscribers.
+"""
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from dbmanager import DBManager
+
+# Server error code for "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+WATCHED_COLLECTIONS = ('users', 'user_activities', 'transactions')
+
+# User fields whose change is reported as an access change
+ACCESS_FIELDS = ('access_level', 'is_active', 'platform_access.has_access')
+
+
+class AdminFeed:
+    """Change-stream driven platform counters and event fan-out for admin clients"""
+
+    def __init__(self, db_manager: DBManager, poll_interval: float = 30.0,
+                 resync_interval: float = 300.0, max_queue_size: int = 200):
+        self.db_manager = db_manager
+        self.poll_interval = poll_interval
+        # The 24h counters cannot be decremented from inserts alone, so they are resynced
+        self.resync_interval = resync_interval
+        self.max_queue_size = max_queue_size
+        self.mode = 'stopped'
+        self.stats: Dict[str, Any] = {}
+        self.last_error = None
+        self._last_resync = 0.0
+        self._resync_pending = False
+        self._resume_token = None
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the watcher thread if it is not running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='admin-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the watcher thread"""
+        self._stop.set()
+
+    def is_live(self) -> bool:
+        """Whether counters are maintained from a change stream"""
+        return self.mode == 'change_stream' and bool(self.stats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current in-memory counters"""
+        with self._lock:
+            return dict(self.stats)
+
+    def subscribe(self) -> queue.Queue:
+        """Register an admin client and seed it with the current counters"""
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        self.start()
+        self._offer(subscriber, {'type': 'stats', 'mode': self.mode, 'stats': self.get_stats()})
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        """Remove an admin client"""
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.db_manager.is_connected():
+                self._set_mode('offline')
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self._resync()
+            try:
+                self._watch()
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_UNSUPPORTED:
+                    self._record_error(e)
+                    self._stop.wait(1)
+                    continue
+                self._poll()
+            except PyMongoError as e:
+                # Resume from the last token after transient errors
+                self._record_error(e)
+                self._stop.wait(1)
+
+    def _watch(self) -> None:
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': list(WATCHED_COLLECTIONS)},
+            'operationType': {'$in': ['insert', 'update', 'replace']}
+        }}]
+        with self.db_manager.db.watch(pipeline, resume_after=self._resume_token,
+                                      max_await_time_ms=1000) as stream:
+            self._set_mode('change_stream')
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self._resume_token = stream.resume_token
+                    self._apply_change(change)
+                elif self._resync_pending or time.monotonic() - self._last_resync > self.resync_interval:
+                    self._resync()
+
+    def _poll(self) -> None:
+        """Fallback for standalone servers: one shared stats query per interval"""
+        self._set_mode('polling')
+        while not self._stop.wait(self.poll_interval):
+            if not self.db_manager.is_connected():
+                return
+            self._resync()
+
+    def _resync(self) -> None:
+        self._resync_pending = False
+        result = self.db_manager.get_platform_stats()
+        self._last_resync = time.monotonic()
+        if not result.get('success') or result.get('offline_mode'):
+            return
+        with self._lock:
+            changed = result['stats'] != self.stats
+            self.stats = dict(result['stats'])
+        if changed:
+            self._broadcast({'type': 'stats', 'mode': self.mode, 'stats': self.get_stats()})
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        collection = change['ns']['coll']
+        operation = change['operationType']
+        document = change.get('fullDocument') or {}
+        event: Optional[Dict[str, Any]] = None
+
+        with self._lock:
+            stats = self.stats
+            if collection == 'users' and operation == 'insert':
+                stats['total_users'] = stats.get('total_users', 0) + 1
+                if document.get('is_active'):
+                    stats['active_users'] = stats.get('active_users', 0) + 1
+                if document.get('platform_access', {}).get('has_access'):
+                    stats['users_with_access'] = stats.get('users_with_access', 0) + 1
+                event = {'type': 'user_created', 'wallet_address': document.get('wallet_address'),
+                         'timestamp': document.get('created_at')}
+            elif collection == 'users':
+                updated = change.get('updateDescription', {}).get('updatedFields', {})
+                access_changes = {field: updated[field] for field in ACCESS_FIELDS if field in updated}
+                if access_changes:
+                    event = {'type': 'access_changed', 'document_key': change['documentKey']['_id'],
+                             'changes': access_changes}
+            elif collection == 'user_activities' and operation == 'insert':
+                stats['total_activities'] = stats.get('total_activities', 0) + 1
+                stats['recent_activities_24h'] = stats.get('recent_activities_24h', 0) + 1
+                activity_type = document.get('activity_type')
+                if activity_type == 'login':
+                    stats['recent_logins_24h'] = stats.get('recent_logins_24h', 0) + 1
+                event = {'type': 'login' if activity_type == 'login' else 'activity',
+                         'wallet_address': document.get('wallet_address'),
+                         'activity_type': activity_type,
+                         'timestamp': document.get('timestamp')}
+            elif collection == 'transactions' and operation == 'insert':
+                stats['total_transactions'] = stats.get('total_transactions', 0) + 1
+                event = {'type': 'transaction',
+                         'wallet_address': document.get('wallet_address'),
+                         'transaction_hash': document.get('transaction_hash'),
+                         'transaction_type': document.get('transaction_type'),
+                         'amount': document.get('amount'),
+                         'token': document.get('token'),
+                         'status': document.get('status'),
+                         'timestamp': document.get('timestamp')}
+
+        if event is None:
+            return
+        if event['type'] == 'access_changed':
+            # Access flips change counters whose previous value the event does not carry.
+            # Resync once the stream is idle, so a bulk change costs one stats query.
+            self._resync_pending = True
+        event['stats'] = self.get_stats()
+        self._broadcast(event)
+
+    def _set_mode(self, mode: str) -> None:
+        if mode != self.mode:
+            self.mode = mode
+            self._broadcast({'type': 'mode', 'mode': mode})
+
+    def _record_error(self, error: Exception) -> None:
+        if str(error) != self.last_error:
+            print(f"[WARNING] Admin feed error: {error}")
+        self.last_error = str(error)
+
+    def _broadcast(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._offer(subscriber, event)
+
+    @staticmethod
+    def _offer(subscriber: queue.Queue, event: Dict[str, Any]) -> None:
+        # A client that stopped reading must not stall the watcher
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            pass
@@ -0,0 +1,234 @@
+"""
+Retention and engagement analytics over activity data.
+
+Once per UTC day, ActivityAnalytics reads compact columns (wallet, day,
+activity type) for the last `window_days` days. It reads them from
+user_activities and from the coalesced access_buckets counters, plus each
+wallet's created_at from users. Everything is held in numpy arrays:
+
+    wallet   int32   dense wallet id
+    day      int32   days since 1970-01-01 (UTC)
+    kind     int8    activity type code
+
+Reports are computed from these arrays with vectorised operations and
+cached until the day changes:
+
+    daily_active      distinct active wallets per day
+    retention         weekly signup cohorts (Monday-based) x weeks since signup
+    login_frequency   distribution of logins per wallet
+
+Wallets are counted as active on a day if they have any activity or access
+bucket that day.
+"""
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo.errors import PyMongoError
+
+from dbmanager import DBManager, decode_address
+
+EPOCH = datetime(1970, 1, 1)
+# Upper edges of the login frequency buckets: 1, 2, 3-5, 6-10, 11-20, 21+
+LOGIN_BINS = (1, 2, 3, 6, 11, 21)
+
+
+def day_number(timestamp: datetime) -> int:
+    """Days since 1970-01-01 for a naive-UTC or aware datetime"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - EPOCH).days
+
+
+def week_number(days):
+    """Monday-based week of a day number (1970-01-01 was a Thursday); works on arrays"""
+    return (days + 3) // 7
+
+
+def day_to_date(day: int) -> str:
+    return (date(1970, 1, 1) + timedelta(days=int(day))).isoformat()
+
+
+class ActivityAnalytics:
+    """Per-day snapshot of activity columns with cached cohort/retention reports"""
+
+    def __init__(self, db_manager: DBManager, window_days: int = 180, batch_size: int = 10000):
+        self.db_manager = db_manager
+        self.window_days = window_days
+        self.batch_size = batch_size
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._reports: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self, refresh: bool = False) -> Dict[str, Any]:
+        """Column arrays for the current day, loaded at most once per day unless refreshed"""
+        today = day_number(datetime.now(timezone.utc))
+        with self._lock:
+            if refresh or self._snapshot is None or self._snapshot['day'] != today:
+                self._snapshot = self._load(today)
+                self._reports = {}
+            return self._snapshot
+
+    def _load(self, today: int) -> Dict[str, Any]:
+        started = time.monotonic()
+        since = EPOCH + timedelta(days=today - self.window_days + 1)
+        wallet_ids: Dict[str, int] = {}
+        kind_codes: Dict[str, int] = {}
+        wallets, days, kinds = array('i'), array('i'), array('b')
+
+        def wallet_id(value: Any) -> int:
+            address = decode_address(value)
+            index = wallet_ids.get(address)
+            if index is None:
+                index = wallet_ids[address] = len(wallet_ids)
+            return index
+
+        def kind_code(activity_type: str) -> int:
+            code = kind_codes.get(activity_type)
+            if code is None:
+                # int8 column: rare types beyond 127 share the last code
+                code = kind_codes[activity_type] = min(len(kind_codes), 127)
+            return code
+
+        db = self.db_manager.db
+        activities = db.user_activities.find(
+            {'timestamp': {'$gte': since}},
+            {'wallet_address': 1, 'timestamp': 1, 'activity_type': 1, '_id': 0},
+            batch_size=self.batch_size
+        )
+        for activity in activities:
+            wallets.append(wallet_id(activity['wallet_address']))
+            days.append(day_number(activity['timestamp']))
+            kinds.append(kind_code(activity.get('activity_type', 'unknown')))
+
+        access_code = kind_code('platform_access')
+        buckets = db.access_buckets.find(
+            {'bucket': {'$gte': since}},
+            {'wallet_address': 1, 'bucket': 1, '_id': 0},
+            batch_size=self.batch_size
+        )
+        for bucket in buckets:
+            wallets.append(wallet_id(bucket['wallet_address']))
+            days.append(day_number(bucket['bucket']))
+            kinds.append(access_code)
+
+        created_pairs = array('i')
+        for user in db.users.find({}, {'wallet_address': 1, 'created_at': 1, '_id': 0}, batch_size=self.batch_size):
+            if user.get('created_at') is not None:
+                created_pairs.append(wallet_id(user['wallet_address']))
+                created_pairs.append(day_number(user['created_at']))
+
+        created = np.full(len(wallet_ids), -1, dtype=np.int32)
+        pairs = np.frombuffer(created_pairs, dtype=np.int32).reshape(-1, 2)
+        created[pairs[:, 0]] = pairs[:, 1]
+
+        return {
+            'day': today,
+            'wallet': np.frombuffer(wallets, dtype=np.int32),
+            'days': np.frombuffer(days, dtype=np.int32),
+            'kind': np.frombuffer(kinds, dtype=np.int8),
+            'created': created,
+            'kind_codes': kind_codes,
+            'wallet_count': len(wallet_ids),
+            'load_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+
+    def get_report(self, days: int = 30, weeks: int = 8, refresh: bool = False) -> Dict[str, Any]:
+        """Daily actives, retention cohorts and login frequency, cached per day"""
+        if not self.db_manager.is_connected():
+            return {"success": True, "daily_active": [], "retention": [], "login_frequency": [],
+                    "offline_mode": True}
+
+        days = max(1, min(days, self.window_days))
+        weeks = max(1, min(weeks, self.window_days // 7))
+        try:
+            snapshot = self.snapshot(refresh)
+            key = (days, weeks)
+            with self._lock:
+                report = self._reports.get(key)
+            if report is None:
+                started = time.monotonic()
+                report = {
+                    'as_of': day_to_date(snapshot['day']),
+                    'events': int(len(snapshot['wallet'])),
+                    'wallets': snapshot['wallet_count'],
+                    'load_ms': snapshot['load_ms'],
+                    'daily_active': self.daily_active(snapshot, days),
+                    'retention': self.retention(snapshot, weeks),
+                    'login_frequency': self.login_frequency(snapshot, days),
+                }
+                report['compute_ms'] = round((time.monotonic() - started) * 1000, 1)
+                with self._lock:
+                    if self._snapshot is snapshot:
+                        self._reports[key] = report
+            return {"success": True, **report}
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    @staticmethod
+    def daily_active(snapshot: Dict[str, Any], days: int) -> List[Dict[str, Any]]:
+        """Distinct active wallets for each of the last `days` days"""
+        first = snapshot['day'] - days + 1
+        mask = snapshot['days'] >= first
+        wallet_count = max(snapshot['wallet_count'], 1)
+        pairs = np.unique((snapshot['days'][mask].astype(np.int64) - first) * wallet_count + snapshot['wallet'][mask])
+        counts = np.bincount(pairs // wallet_count, minlength=days)[:days]
+        return [{'date': day_to_date(first + offset), 'active_wallets': int(count)}
+                for offset, count in enumerate(counts)]
+
+    @staticmethod
+    def retention(snapshot: Dict[str, Any], weeks: int) -> List[Dict[str, Any]]:
+        """Share of each weekly signup cohort active N weeks after signing up"""
+        current = week_number(snapshot['day'])
+        first = current - weeks + 1
+        cohort_of_wallet = np.where(snapshot['created'] >= 0, week_number(snapshot['created']), -1)
+        in_window = cohort_of_wallet >= first
+        sizes = np.bincount(cohort_of_wallet[in_window] - first, minlength=weeks)[:weeks]
+
+        cohort = cohort_of_wallet[snapshot['wallet']]
+        offset = week_number(snapshot['days']) - cohort
+        mask = (cohort >= first) & (offset >= 0) & (offset < weeks)
+        # One count per wallet and week, however many events it had that week
+        pairs = np.unique(snapshot['wallet'][mask].astype(np.int64) * weeks + offset[mask])
+        cohort_index = cohort_of_wallet[pairs // weeks] - first
+        active = np.bincount(cohort_index * weeks + pairs % weeks, minlength=weeks * weeks).reshape(weeks, weeks)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(sizes[:, None] > 0, active / sizes[:, None], 0.0)
+
+        return [
+            {
+                'cohort': day_to_date((first + index) * 7 - 3),
+                'size': int(sizes[index]),
+                # Only weeks that have already started for this cohort
+                'retention': [round(float(rate), 4) for rate in rates[index][:weeks - index]]
+            }
+            for index in range(weeks)
+        ]
+
+    @staticmethod
+    def login_frequency(snapshot: Dict[str, Any], days: int) -> List[Dict[str, Any]]:
+        """How many wallets logged in 1, 2, 3-5, ... times in the last `days` days"""
+        code = snapshot['kind_codes'].get('login')
+        if code is None:
+            return []
+        mask = (snapshot['kind'] == code) & (snapshot['days'] >= snapshot['day'] - days + 1)
+        logins = np.bincount(snapshot['wallet'][mask], minlength=snapshot['wallet_count'])
+        logins = logins[logins > 0]
+        edges = list(LOGIN_BINS) + [max(int(logins.max()) + 1 if len(logins) else 0, LOGIN_BINS[-1] + 1)]
+        counts, _ = np.histogram(logins, bins=edges)
+
+        buckets = []
+        for low, high, count in zip(edges[:-1], edges[1:], counts):
+            if high == edges[-1]:
+                label = f"{low}+"
+            else:
+                label = str(low) if high - low == 1 else f"{low}-{high - 1}"
+            buckets.append({'logins': label, 'wallets': int(count)})
+        return buckets
@@ -1,39 +1,77 @@
-import json
+import atexit
 import os
+import queue
+from datetime import datetime, timezone
 from typing import Dict, List, Any
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request
-from web3 import Web3
+from flask import Flask, Response, jsonify, request
+from access_counter import AccessCounter
+from addresses import address_cache_stats, canonical_address, parse_address
+from admin_feed import AdminFeed
+from analytics import ActivityAnalytics
+from asset_cache import AssetCache
+from balance_snapshots import BalanceSnapshotJob
+from balance_stream import BalanceStream
+from breaker import CircuitOpen
+from chain import (UnknownChain, chain_registry, encode_call, get_w3, is_w3_ready, start_w3_warmup,
+                   to_checksum_address)
+from config import Config
 from dbmanager import db_manager
+from event_ingester import EventIngester, start_block_from_env
+from finality import BlockCache, FinalityTracker
+from fee_service import DEFAULT_ESTIMATE_SENDER, MAX_UINT256, FeeService, call_template
+from head_follower import head_follower
+from history_query import QUERY_SPECS, HistoryQuery
+from json_provider import BSONJSONProvider
+from multicall import DEFAULT_BATCH_SIZE, MULTICALL3_ADDRESS, aggregate, decode_result
+from rate_limiter import InMemoryBackend, MongoBackend, RateLimiter, batched_read_cost
+from rpc_session import rpc_session
+from scheduler import scheduler
+from singleflight import rpc_flight
+from streaming import init_compression, stream_json
+from token_registry import TokenRegistry
+from valuation import ValuationEngine
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+# Encode ObjectId/datetime/Decimal128 natively so raw Mongo documents can be returned
+app.json = BSONJSONProvider(app)
 
-# BSC Mainnet Configuration (FOR REAL USDT!)
-BSC_RPC_URL = "https://bsc-dataseed1.binance.org:443"
-BSC_TESTNET_RPC_URL = "https://data-seed-prebsc-1-s1.binance.org:8545"
+# Large admin JSON bodies are compressed with the best encoding the client accepts
+init_compression(app, '/api/admin/')
 
-# Use MAINNET for real USDT transfers
-w3 = Web3(Web3.HTTPProvider(BSC_RPC_URL))
+# Hashed/precompressed static assets and cached page renders
+asset_cache = AssetCache()
+asset_cache.init_app(app)
 
-# Contract Addresses from environment variables
-USDT_CONTRACT_ADDRESS = os.getenv('USDT_CONTRACT_ADDRESS', "0x55d398326f99059fF775485246999027B3197955")
-PROGRAM_CONTRACT_ADDRESS = os.getenv('PROGRAM_CONTRACT_ADDRESS', "0x8B9c85D168d82D6266d71b6f31bb48e3bE1caDf4")
+# Protect the RPC quota with weighted per-IP/per-wallet token buckets
+rate_limiter = RateLimiter(MongoBackend(db_manager) if Config.RATE_LIMIT_BACKEND == 'mongodb' else InMemoryBackend())
+rate_limiter.init_app(app)
 
-# USDT ABI (ERC20 Standard)
-USDT_ABI = json.loads('''[
+# Token metadata from contracts/token-config.json, verified on-chain in the background
+token_registry = TokenRegistry(db_manager)
+token_registry.load()
+
+# Contract addresses on the default chain (Config.CHAINS, chosen by DEFAULT_CHAIN)
+USDT_CONTRACT_ADDRESS = chain_registry.default.contract('usdt') or ''
+PROGRAM_CONTRACT_ADDRESS = chain_registry.default.contract('program') or ''
+UNIVERSAL_CONTRACT_ADDRESS = chain_registry.default.contract('universal') or 'YOUR_UNIVERSAL_CONTRACT_ADDRESS_HERE'
+print(f"[INFO] Default chain: {chain_registry.default.name} (chain id {chain_registry.default.chain_id})")
+
+# USDT ABI (ERC20 Standard), kept as a literal so nothing is parsed at import
+USDT_ABI = [
     {
-        "constant": true,
+        "constant": True,
         "inputs": [{"name": "_owner", "type": "address"}],
         "name": "balanceOf",
         "outputs": [{"name": "balance", "type": "uint256"}],
         "type": "function"
     },
     {
-        "constant": false,
+        "constant": False,
         "inputs": [
             {"name": "_spender", "type": "address"},
             {"name": "_value", "type": "uint256"}
@@ -43,7 +81,7 @@ USDT_ABI = json.loads('''[
         "type": "function"
     },
     {
-        "constant": true,
+        "constant": True,
         "inputs": [
             {"name": "_owner", "type": "address"},
             {"name": "_spender", "type": "address"}
@@ -53,7 +91,7 @@ USDT_ABI = json.loads('''[
         "type": "function"
     },
     {
-        "constant": false,
+        "constant": False,
         "inputs": [
             {"name": "_to", "type": "address"},
             {"name": "_value", "type": "uint256"}
@@ -63,138 +101,434 @@ USDT_ABI = json.loads('''[
         "type": "function"
     },
     {
-        "constant": true,
+        "constant": True,
         "inputs": [],
         "name": "decimals",
         "outputs": [{"name": "", "type": "uint8"}],
         "type": "function"
     },
     {
-        "constant": true,
+        "constant": True,
         "inputs": [],
         "name": "symbol",
         "outputs": [{"name": "", "type": "string"}],
         "type": "function"
     }
-]''')
+]
+
+
+def read_wallet_balances(address: str) -> Dict[str, str]:
+    """Read BNB/USDT balances and the USDT allowance granted to the program contract"""
+    w3 = get_w3()
+    owner = canonical_address(address).checksum
+    usdt_contract = w3.eth.contract(
+        address=to_checksum_address(USDT_CONTRACT_ADDRESS),
+        abi=USDT_ABI
+    )
+    spender = to_checksum_address(PROGRAM_CONTRACT_ADDRESS)
+    usdt_decimals = token_registry.decimals(USDT_CONTRACT_ADDRESS, usdt_contract.functions.decimals().call)
+
+    bnb_balance = rpc_flight.do(('get_balance', owner), lambda: w3.eth.get_balance(owner))
+    usdt_balance_raw = rpc_flight.do(
+        ('balance_of', USDT_CONTRACT_ADDRESS, owner),
+        usdt_contract.functions.balanceOf(owner).call
+    )
+    allowance = rpc_flight.do(
+        ('allowance', USDT_CONTRACT_ADDRESS, owner, spender),
+        usdt_contract.functions.allowance(owner, spender).call
+    )
+    return format_wallet_balances(w3, bnb_balance, usdt_balance_raw, allowance, usdt_decimals)
+
+
+def read_many_wallet_balances(addresses: List[str]) -> Dict[str, Dict[str, str]]:
+    """read_wallet_balances for many wallets through batched Multicall3 reads; failed wallets are left out"""
+    w3 = get_w3()
+    usdt_contract = w3.eth.contract(
+        address=to_checksum_address(USDT_CONTRACT_ADDRESS),
+        abi=USDT_ABI
+    )
+    spender = to_checksum_address(PROGRAM_CONTRACT_ADDRESS)
+    usdt_decimals = token_registry.decimals(USDT_CONTRACT_ADDRESS, usdt_contract.functions.decimals().call)
+
+    calls = []
+    for address in addresses:
+        owner = canonical_address(address).checksum
+        calls.extend([
+            (MULTICALL3_ADDRESS, encode_call('getEthBalance(address)', [owner])),
+            (USDT_CONTRACT_ADDRESS, encode_call('balanceOf(address)', [owner])),
+            (USDT_CONTRACT_ADDRESS, encode_call('allowance(address,address)', [owner, spender]))
+        ])
+    results = aggregate(calls, w3=w3)
+
+    balances = {}
+    for index, address in enumerate(addresses):
+        values = [decode_result(['uint256'], *result) for result in results[3 * index:3 * index + 3]]
+        if all(value is not None for value in values):
+            balances[address] = format_wallet_balances(w3, *(value[0] for value in values), usdt_decimals)
+    return balances
+
+
+def format_wallet_balances(w3, bnb_wei: int, usdt_raw: int, allowance: int, usdt_decimals: int) -> Dict[str, str]:
+    return {
+        'bnb_balance': str(w3.from_wei(bnb_wei, 'ether')),
+        'usdt_balance': str(usdt_raw / (10 ** usdt_decimals)),
+        'usdt_allowance': str(allowance / (10 ** usdt_decimals)),
+        'usdt_allowance_raw': str(allowance)
+    }
+
+
+def request_chain(data: Dict[str, Any] = None):
+    """Chain named by the `chain` query/body parameter (key or chain id), else the default chain"""
+    return chain_registry.get(request.args.get('chain') or (data or {}).get('chain'))
+
+
+def require_default_chain():
+    """Error response for endpoints backed by default-chain background services, else None"""
+    client = request_chain(request.get_json(silent=True) if request.is_json else None)
+    if not chain_registry.is_default(client):
+        return jsonify({'success': False,
+                        'error': f"Only available on the default chain ({chain_registry.default_key})"}), 400
+    return None
+
+
+def token_decimals(client, token_address: str, contract) -> int:
+    """Token decimals: the verified registry on the default chain, cached per client elsewhere"""
+    if chain_registry.is_default(client):
+        return token_registry.decimals(token_address, contract.functions.decimals().call)
+    return client.cached(('decimals', token_address), contract.functions.decimals().call)
+
+
+# Recent block hashes for reorg detection and confirmed/unconfirmed marking
+finality_tracker = FinalityTracker(head_follower, confirmations=int(os.getenv('FINALITY_CONFIRMATIONS', '15')))
+block_cache = BlockCache(finality_tracker)
+finality_tracker.add_reorg_listener(block_cache.invalidate_from)
+
+# One head follower drives balance pushes for every SSE client
+balance_stream = BalanceStream(head_follower, read_wallet_balances, fetch_many=read_many_wallet_balances)
+
+# Live admin counters/events from MongoDB change streams (polling on standalone servers)
+admin_feed = AdminFeed(db_manager)
+
+# Participant/approval state is indexed from contract events instead of getAllParticipants()
+event_ingester = EventIngester(db_manager, {
+    name: address for name, address in (('program', PROGRAM_CONTRACT_ADDRESS), ('universal', UNIVERSAL_CONTRACT_ADDRESS))
+    if address.startswith('0x') and len(address) == 42
+}, start_block=start_block_from_env())
+if os.getenv('EVENT_INGESTER_ENABLED', 'true').lower() == 'true':
+    # Singleton: only the replica holding the lease ingests
+    scheduler.register('event_ingester', event_ingester.ingest,
+                       interval=float(os.getenv('EVENT_INGEST_INTERVAL', '3')), run_immediately=True)
+
+
+def rollback_event_index(fork_block: int) -> None:
+    """Reorg listener: the ingesting replica drops index rows from orphaned blocks"""
+    if scheduler.is_leader('event_ingester'):
+        result = event_ingester.rollback(fork_block)
+        if not result['success']:
+            print(f"[WARNING] Event index rollback failed: {result['error']}")
+
+
+finality_tracker.add_reorg_listener(rollback_event_index)
+
+# USD prices from PancakeSwap reserves, one batched read per block
+valuation_engine = ValuationEngine(token_registry, head_follower)
+finality_tracker.add_reorg_listener(valuation_engine.invalidate_from)
+
+# Day-bucketed balance history for every registered wallet
+balance_snapshots = BalanceSnapshotJob(db_manager, valuation_engine, token_registry)
+BALANCE_SNAPSHOT_INTERVAL = int(os.getenv('BALANCE_SNAPSHOT_INTERVAL', '3600'))
+if BALANCE_SNAPSHOT_INTERVAL > 0:
+    scheduler.register('balance_snapshots', balance_snapshots.run_once, interval=BALANCE_SNAPSHOT_INTERVAL)
+
+# Platform accesses counted per wallet and minute, flushed as $inc upserts
+access_counter = AccessCounter(db_manager)
+if Config.ACCESS_EVENT_MODE == 'coalesce':
+    scheduler.register('access_counter_flush', access_counter.flush,
+                       interval=int(os.getenv('ACCESS_FLUSH_INTERVAL', '5')), singleton=False)
+    atexit.register(access_counter.flush)
+
+# Daily actives, retention cohorts and login frequency from an in-memory, per-day snapshot
+activity_analytics = ActivityAnalytics(db_manager)
+
+# Filtered, index-backed admin queries over activities and transactions
+history_query = HistoryQuery(db_manager)
+
+# Gas price/fee history sampled once per block for all clients, plus gas limits for common calls
+fee_service = FeeService(head_follower, {
+    'approve': call_template(USDT_CONTRACT_ADDRESS, 'approve(address,uint256)',
+                             [PROGRAM_CONTRACT_ADDRESS, MAX_UINT256], default_gas=100000),
+    'joinProgram': call_template(PROGRAM_CONTRACT_ADDRESS, 'joinProgram()', [], default_gas=150000),
+    'approveToken': call_template(UNIVERSAL_CONTRACT_ADDRESS, 'approveToken(address)',
+                                  [USDT_CONTRACT_ADDRESS], default_gas=100000),
+}, sender=os.getenv('FEE_ESTIMATE_SENDER', DEFAULT_ESTIMATE_SENDER))
+
+def start_background_services() -> None:
+    """Warm up MongoDB and web3, verify tokens and run the background jobs"""
+    # Warm up in the background so startup never blocks on MongoDB or the RPC node
+    db_manager.connect_in_background()
+    start_w3_warmup()
+    token_registry.start()
+    # Singleton jobs only run on the lease-holding replica
+    scheduler.start()
+    finality_tracker.start()
+
+
+# Off (BACKGROUND_SERVICES=false) in tests, so importing the app touches no external service
+if Config.BACKGROUND_SERVICES:
+    start_background_services()
 
 
 @app.route('/')
 def index():
-    return render_template('index.html',
-                         usdt_contract_address=USDT_CONTRACT_ADDRESS,
-                         program_contract_address=PROGRAM_CONTRACT_ADDRESS)
+    return asset_cache.render_page('index.html',
+                                   usdt_contract_address=USDT_CONTRACT_ADDRESS,
+                                   program_contract_address=PROGRAM_CONTRACT_ADDRESS)
 
 
 @app.route('/admin')
 def admin():
-    return render_template('admin.html',
-                         usdt_contract_address=USDT_CONTRACT_ADDRESS,
-                         program_contract_address=PROGRAM_CONTRACT_ADDRESS)
+    return asset_cache.render_page('admin.html',
+                                   usdt_contract_address=USDT_CONTRACT_ADDRESS,
+                                   program_contract_address=PROGRAM_CONTRACT_ADDRESS)
 
 
 @app.route('/multi-token')
 def multi_token_user():
-    return render_template('multi-token-user.html',
-                         universal_contract_address=os.getenv('UNIVERSAL_CONTRACT_ADDRESS', 'YOUR_UNIVERSAL_CONTRACT_ADDRESS_HERE'),
-                         usdt_contract_address=USDT_CONTRACT_ADDRESS,
-                         program_contract_address=PROGRAM_CONTRACT_ADDRESS)
+    return asset_cache.render_page('multi-token-user.html',
+                                   universal_contract_address=UNIVERSAL_CONTRACT_ADDRESS,
+                                   usdt_contract_address=USDT_CONTRACT_ADDRESS,
+                                   program_contract_address=PROGRAM_CONTRACT_ADDRESS)
 
 
 @app.route('/multi-token-admin')
 def multi_token_admin():
-    return render_template('multi-token-admin.html',
-                         universal_contract_address=os.getenv('UNIVERSAL_CONTRACT_ADDRESS', 'YOUR_UNIVERSAL_CONTRACT_ADDRESS_HERE'),
-                         usdt_contract_address=USDT_CONTRACT_ADDRESS,
-                         program_contract_address=PROGRAM_CONTRACT_ADDRESS)
+    return asset_cache.render_page('multi-token-admin.html',
+                                   universal_contract_address=UNIVERSAL_CONTRACT_ADDRESS,
+                                   usdt_contract_address=USDT_CONTRACT_ADDRESS,
+                                   program_contract_address=PROGRAM_CONTRACT_ADDRESS)
+
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Liveness probe; never touches the RPC node or MongoDB"""
+    return jsonify({'success': True, 'status': 'ok'})
+
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe; ready once warm-up has finished, even in offline mode"""
+    db_ready = db_manager.is_ready()
+    web3_ready = is_w3_ready()
+    is_ready = db_ready and web3_ready
+    return jsonify({
+        'success': is_ready,
+        'ready': is_ready,
+        'database_ready': db_ready,
+        'web3_ready': web3_ready
+    }), 200 if is_ready else 503
 
 
 @app.route('/api/check-connection', methods=['GET'])
 def check_connection():
     """Check if Web3 connection is active"""
     try:
-        is_connected = w3.is_connected()
+        client = request_chain()
+        # An open circuit breaker makes this fail fast instead of waiting for the RPC timeout
+        is_connected = client.w3.is_connected()
         return jsonify({
             'success': True,
             'connected': is_connected,
-            'network': 'BSC Mainnet'
+            'network': client.name,
+            'chain': client.key,
+            'chainId': client.chain_id,
+            'circuit': client.breaker.state
         })
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/get-balance', methods=['POST'])
 def get_balance():
-    """Get BNB and USDT balance for an address"""
+    """Get native (BNB on BSC) and USDT balance for an address"""
     try:
         data = request.get_json()
-        address = data.get('address')
+        client = request_chain(data)
+        w3 = client.w3
+        address = parse_address(data.get('address'))
         
-        if not address or not w3.is_address(address):
+        if address is None:
             return jsonify({'success': False, 'error': 'Invalid address'}), 400
         
-        # Get BNB balance
-        bnb_balance_wei = w3.eth.get_balance(address)
-        bnb_balance = w3.from_wei(bnb_balance_wei, 'ether')
-        
-        # Get USDT balance
-        usdt_contract = w3.eth.contract(
-            address=Web3.to_checksum_address(USDT_CONTRACT_ADDRESS),
-            abi=USDT_ABI
-        )
-        usdt_balance_raw = usdt_contract.functions.balanceOf(
-            Web3.to_checksum_address(address)
-        ).call()
-        usdt_decimals = usdt_contract.functions.decimals().call()
-        usdt_balance = usdt_balance_raw / (10 ** usdt_decimals)
+        def read_balances():
+            # Get native balance
+            owner = address.checksum
+            bnb_balance_wei = client.flight.do(('get_balance', owner), lambda: w3.eth.get_balance(owner))
+            bnb_balance = w3.from_wei(bnb_balance_wei, 'ether')
+
+            # Get USDT balance, if USDT is configured on this chain
+            usdt_balance = None
+            usdt_address = client.contract('usdt')
+            if usdt_address:
+                usdt_contract = w3.eth.contract(
+                    address=to_checksum_address(usdt_address),
+                    abi=USDT_ABI
+                )
+                usdt_balance_raw = client.flight.do(
+                    ('balance_of', usdt_address, owner),
+                    usdt_contract.functions.balanceOf(owner).call
+                )
+                usdt_balance = str(usdt_balance_raw / (10 ** token_decimals(client, usdt_address, usdt_contract)))
+            return {'bnb_balance': str(bnb_balance), 'usdt_balance': usdt_balance}
+
+        # Last known balances, marked stale, while the node is down or its circuit is open
+        balances, stale_seconds = client.breaker.fallback(('balance', address), read_balances)
         
         return jsonify({
             'success': True,
-            'bnb_balance': str(bnb_balance),
-            'usdt_balance': str(usdt_balance),
-            'address': address
+            'chain': client.key,
+            'native_symbol': client.native_symbol,
+            **balances,
+            'address': address,
+            **stale_fields(stale_seconds)
         })
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except CircuitOpen as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def stale_fields(stale_seconds):
+    """Explicit staleness marker for responses that may come from a breaker's last-known-good cache"""
+    return {'stale': stale_seconds is not None, 'stale_seconds': stale_seconds}
+
+
+def circuit_open_response(error: CircuitOpen):
+    """503 with Retry-After for a dependency whose circuit is open and nothing cached to serve"""
+    response = jsonify({'success': False, 'error': str(error), 'circuit_open': True})
+    response.headers['Retry-After'] = str(max(int(error.retry_in), 1))
+    return response, 503
+
+
+def sse_response(subscriber: queue.Queue, event_name: str, on_close) -> Response:
+    """Stream events from a subscriber queue as Server-Sent Events"""
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event_name}\ndata: {app.json.dumps(event)}\n\n"
+        finally:
+            on_close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/stream/balances', methods=['GET'])
+def stream_balances():
+    """Server-Sent Events stream of balance/allowance changes for one wallet"""
+    try:
+        wrong_chain = require_default_chain()
+        if wrong_chain:
+            return wrong_chain
+        address = parse_address(request.args.get('address'))
+
+        if address is None:
+            return jsonify({'success': False, 'error': 'Invalid address'}), 400
+
+        subscriber = balance_stream.subscribe(address)
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return sse_response(subscriber, 'balance', lambda: balance_stream.unsubscribe(address, subscriber))
+
+
 @app.route('/api/get-transactions', methods=['POST'])
 def get_transactions():
     """Get recent transactions for an address"""
     try:
         data = request.get_json()
-        address = data.get('address')
+        client = request_chain(data)
+        w3 = client.w3
+        address = parse_address(data.get('address'))
         
-        if not address or not w3.is_address(address):
+        if address is None:
             return jsonify({'success': False, 'error': 'Invalid address'}), 400
         
-        # Get latest block
-        latest_block = w3.eth.block_number
-        transactions = []
-        
-        # Check last 100 blocks for transactions (demo purpose)
-        start_block = max(0, latest_block - 100)
-        
-        for block_num in range(start_block, latest_block + 1):
-            try:
-                block = w3.eth.get_block(block_num, full_transactions=True)
-                for tx in block.transactions:
-                    if tx['from'].lower() == address.lower() or \
-                       (tx['to'] and tx['to'].lower() == address.lower()):
-                        transactions.append({
-                            'hash': tx['hash'].hex(),
-                            'from': tx['from'],
-                            'to': tx['to'],
-                            'value': str(w3.from_wei(tx['value'], 'ether')),
-                            'block': block_num
-                        })
-            except:
-                continue
+        def scan_blocks():
+            # Get latest block
+            latest_block = client.flight.do(('block_number',), lambda: w3.eth.block_number)
+            transactions = []
+            failed_blocks = []
+            last_error = None
+
+            # Check last 100 blocks for transactions (demo purpose)
+            start_block = max(0, latest_block - 100)
+
+            for block_num in range(start_block, latest_block + 1):
+                try:
+                    def fetch():
+                        return client.flight.do(('get_block', block_num),
+                                                lambda: w3.eth.get_block(block_num, full_transactions=True))
+
+                    # On the default chain confirmed blocks come from cache; near-head ones are
+                    # revalidated against reorgs. Other chains have no reorg tracker, so no cache.
+                    block = block_cache.get_block(block_num, fetch) if chain_registry.is_default(client) else fetch()
+                    for tx in block.transactions:
+                        if tx['from'].lower() == address or (tx['to'] and tx['to'].lower() == address):
+                            transactions.append({
+                                'hash': tx['hash'].hex(),
+                                'from': tx['from'],
+                                'to': tx['to'],
+                                'value': str(w3.from_wei(tx['value'], 'ether')),
+                                'block': block_num,
+                                'confirmations': finality_tracker.get_confirmations(block_num, latest_block),
+                                'status': finality_tracker.status(block_num, latest_block)
+                            })
+                except CircuitOpen:
+                    # The node is down: give up on the scan rather than skipping every block
+                    raise
+                except client.breaker.failure_types:
+                    # Transport failures count toward the breaker and fall back to the last good scan
+                    raise
+                except Exception as e:
+                    # A single bad block (e.g. "header not found") is skipped and reported
+                    failed_blocks.append(block_num)
+                    last_error = e
+            result = {'head_block': latest_block, 'transactions': transactions[-10:]}  # Return last 10 transactions
+            if failed_blocks:
+                print(f"[WARNING] Transaction scan skipped {len(failed_blocks)} blocks, first {failed_blocks[0]}: {last_error}")
+                result.update({'partial': True, 'failed_blocks': failed_blocks})
+            return result
+
+        # A partial scan is returned as such but never becomes the last known good result
+        result, stale_seconds = client.breaker.fallback(('transactions', address), scan_blocks,
+                                                        cacheable=lambda scan: not scan.get('partial'))
         
         return jsonify({
             'success': True,
-            'transactions': transactions[-10:]  # Return last 10 transactions
+            'chain': client.key,
+            'required_confirmations': finality_tracker.confirmations,
+            **result,
+            **stale_fields(stale_seconds)
         })
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except CircuitOpen as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -204,60 +538,117 @@ def check_allowance():
     """Check USDT allowance for a spender"""
     try:
         data = request.get_json()
-        owner = data.get('owner')
-        spender = data.get('spender')
+        client = request_chain(data)
+        owner = parse_address(data.get('owner'))
+        spender = parse_address(data.get('spender'))
         
-        if not owner or not spender:
+        if owner is None or spender is None:
             return jsonify({'success': False, 'error': 'Invalid parameters'}), 400
+        usdt_address = client.contract('usdt')
+        if not usdt_address:
+            return jsonify({'success': False, 'error': f'No USDT contract configured on {client.key}'}), 400
         
-        usdt_contract = w3.eth.contract(
-            address=Web3.to_checksum_address(USDT_CONTRACT_ADDRESS),
+        usdt_contract = client.w3.eth.contract(
+            address=to_checksum_address(usdt_address),
             abi=USDT_ABI
         )
         
-        allowance = usdt_contract.functions.allowance(
-            Web3.to_checksum_address(owner),
-            Web3.to_checksum_address(spender)
-        ).call()
-        
-        decimals = usdt_contract.functions.decimals().call()
-        allowance_formatted = allowance / (10 ** decimals)
+        def read_allowance():
+            allowance = client.flight.do(
+                ('allowance', usdt_address, owner, spender),
+                usdt_contract.functions.allowance(owner.checksum, spender.checksum).call
+            )
+            decimals = token_decimals(client, usdt_address, usdt_contract)
+            allowance_formatted = allowance / (10 ** decimals)
+            return {'allowance': str(allowance_formatted), 'allowance_raw': str(allowance)}
+
+        result, stale_seconds = client.breaker.fallback(('allowance', owner, spender), read_allowance)
         
         return jsonify({
             'success': True,
-            'allowance': str(allowance_formatted),
-            'allowance_raw': str(allowance)
+            'chain': client.key,
+            **result,
+            **stale_fields(stale_seconds)
         })
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except CircuitOpen as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/network-info', methods=['GET'])
-def network_info():
-    """Get network information"""
+@app.route('/api/tokens', methods=['GET'])
+def get_tokens():
+    """Configured tokens with on-chain verified metadata and config mismatches"""
     try:
         return jsonify({
             'success': True,
-            'chainId': 56,  # BSC Mainnet
-            'chainName': 'Binance Smart Chain Mainnet',
-            'rpcUrl': BSC_RPC_URL,
-            'blockExplorer': 'https://bscscan.com',
-            'usdtContract': USDT_CONTRACT_ADDRESS,
-            'programContract': PROGRAM_CONTRACT_ADDRESS
+            'tokens': token_registry.get_tokens(),
+            **token_registry.get_status()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/fees', methods=['GET'])
+def get_fees():
+    """Cached gas price, fee suggestions and gas limits for approve/joinProgram/approveToken"""
+    try:
+        wrong_chain = require_default_chain()
+        if wrong_chain:
+            return wrong_chain
+        response = jsonify({'success': True, **fee_service.get_fees()})
+        # Fees only change per block (~3s on BSC)
+        response.cache_control.public = True
+        response.cache_control.max_age = 3
+        return response
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/network-info', methods=['GET'])
+def network_info():
+    """Get network information for the requested (or default) chain"""
+    try:
+        client = request_chain()
+        # Constant for the life of the process: serve with ETag/Cache-Control
+        return asset_cache.constant_json(f'network-info:{client.key}', lambda: jsonify({
+            'success': True,
+            **client.info(),
+            'usdtContract': client.contract('usdt'),
+            'programContract': client.contract('program')
+        }))
+    except UnknownChain as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/chains', methods=['GET'])
+def list_chains():
+    """Enabled chains, usable as the `chain` parameter of the chain-aware endpoints"""
+    try:
+        return asset_cache.constant_json('chains', lambda: jsonify({
+            'success': True,
+            'default': chain_registry.default_key,
+            'chains': chain_registry.list()
+        }))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # User Authentication and Database Routes
 @app.route('/api/user/login', methods=['POST'])
 def user_login():
     """Register or login user with wallet address"""
     try:
         data = request.get_json()
-        wallet_address = data.get('wallet_address')
+        wallet_address = parse_address(data.get('wallet_address'))
 
-        if not wallet_address or not w3.is_address(wallet_address):
+        if wallet_address is None:
             return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
 
         # Create or update user in database
@@ -291,10 +682,10 @@ def access_platform():
     """Record user platform access"""
     try:
         data = request.get_json()
-        wallet_address = data.get('wallet_address')
+        wallet_address = parse_address(data.get('wallet_address'))
         access_type = data.get('access_type', 'wallet_connect')
 
-        if not wallet_address or not w3.is_address(wallet_address):
+        if wallet_address is None:
             return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
 
         # Update user access information
@@ -305,12 +696,16 @@ def access_platform():
             user_result = db_manager.get_user(wallet_address)
 
         # Log platform access
-        db_manager.log_user_activity(wallet_address, 'platform_access', {
+        details = {
             'access_type': access_type,
             'user_agent': request.headers.get('User-Agent'),
             'ip_address': request.remote_addr,
             'additional_data': data.get('additional_data', {})
-        })
+        }
+        if Config.ACCESS_EVENT_MODE == 'coalesce':
+            access_counter.record(wallet_address, access_type, details)
+        else:
+            db_manager.log_user_activity(wallet_address, 'platform_access', details)
 
         return jsonify({
             'success': True,
@@ -327,24 +722,38 @@ def get_user_profile():
     """Get user profile information"""
     try:
         data = request.get_json()
-        wallet_address = data.get('wallet_address')
+        wallet_address = parse_address(data.get('wallet_address'))
 
-        if not wallet_address or not w3.is_address(wallet_address):
+        if wallet_address is None:
             return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
 
         user_result = db_manager.get_user(wallet_address)
         if user_result['success']:
             user_data = user_result['user_data']
+            if user_result.get('offline_mode'):
+                # Database unreachable (or its circuit open): don't wait on history queries
+                return jsonify({
+                    'success': True,
+                    'user_data': user_data,
+                    'recent_activities': [],
+                    'recent_transactions': [],
+                    'access_counts': {},
+                    'offline_mode': True,
+                    **stale_fields(user_result.get('stale_seconds'))
+                })
 
             # Get user's recent activities
             activities_result = db_manager.get_user_activities(wallet_address, limit=10)
             transactions_result = db_manager.get_user_transactions(wallet_address, limit=10)
+            access_result = access_counter.get_access_counts(wallet_address)
 
             return jsonify({
                 'success': True,
                 'user_data': user_data,
                 'recent_activities': activities_result.get('activities', []),
-                'recent_transactions': transactions_result.get('transactions', [])
+                'recent_transactions': transactions_result.get('transactions', []),
+                'access_counts': access_result.get('counts', {}),
+                **stale_fields(None)
             })
         else:
             return jsonify({'success': False, 'error': 'User not found'}), 404
@@ -353,6 +762,27 @@ def get_user_profile():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/balance-history', methods=['GET'])
+def get_balance_history():
+    """Per-wallet balance samples from the periodic snapshot job"""
+    try:
+        wallet_address = parse_address(request.args.get('wallet_address'))
+        days = min(request.args.get('days', 30, type=int), 365)
+
+        if wallet_address is None:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
+
+        result = balance_snapshots.get_history(wallet_address, days)
+
+        if result['success']:
+            return jsonify({'success': True, 'wallet_address': wallet_address, **result})
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/admin/users', methods=['GET'])
 def get_all_users():
     """Get all users (admin endpoint)"""
@@ -361,7 +791,113 @@ def get_all_users():
         page = int(request.args.get('page', 1))
         skip = (page - 1) * limit
 
-        result = db_manager.get_all_users(limit=limit, skip=skip)
+        result = db_manager.iter_users(limit=limit, skip=skip)
+
+        if result['success']:
+            # Users are written out while the cursor is read, so large pages never sit in memory
+            cursor = result.pop('cursor')
+            return stream_json(app, result, 'users', cursor)
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/participants', methods=['GET'])
+def get_participants():
+    """Get contract participants from the event index (admin endpoint)"""
+    try:
+        contract = request.args.get('contract', 'program')
+        limit = int(request.args.get('limit', 100))
+        page = int(request.args.get('page', 1))
+        skip = (page - 1) * limit
+
+        result = event_ingester.get_participants(contract, limit=limit, skip=skip)
+
+        if result['success']:
+            for participant in result['participants']:
+                participant['status'] = finality_tracker.status(participant['block_number'])
+            return jsonify(result)
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/token-approvals', methods=['GET'])
+def get_token_approvals():
+    """Get a user's per-token approvals from the event index (admin endpoint)"""
+    try:
+        contract = request.args.get('contract', 'universal')
+        wallet_address = parse_address(request.args.get('wallet_address'))
+
+        if wallet_address is None:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
+
+        result = event_ingester.get_token_approvals(contract, wallet_address)
+
+        if result['success']:
+            for approval in result['approvals']:
+                approval['status'] = finality_tracker.status(approval['block_number'])
+            return jsonify(result)
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def parse_timestamp(value):
+    """ISO 8601 query parameter as an aware UTC datetime (naive values are taken as UTC)"""
+    if not value:
+        return None
+    timestamp = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp.astimezone(timezone.utc)
+
+
+@app.route('/api/admin/query/<kind>', methods=['GET'])
+def query_history(kind):
+    """Filtered activities/transactions across wallets with cursor pagination (admin endpoint)"""
+    try:
+        if kind not in QUERY_SPECS:
+            return jsonify({'success': False, 'error': f'Unknown collection: {kind}'}), 404
+
+        filters = {field: request.args.get(field) for field in QUERY_SPECS[kind]['filters']}
+        if filters.get('wallet_address'):
+            filters['wallet_address'] = parse_address(filters['wallet_address'])
+            if filters['wallet_address'] is None:
+                return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
+        try:
+            since = parse_timestamp(request.args.get('since'))
+            until = parse_timestamp(request.args.get('until'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'since/until must be ISO 8601 timestamps'}), 400
+
+        result = history_query.query(kind, filters, since=since, until=until, cursor=request.args.get('cursor'),
+                                     limit=request.args.get('limit', 50, type=int))
+
+        if result['success']:
+            return jsonify(result)
+        elif result.get('unsupported'):
+            return jsonify({'success': False, 'error': result['error']}), 400
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/analytics', methods=['GET'])
+def get_analytics():
+    """Daily active wallets, weekly retention cohorts and login frequency (admin endpoint)"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        weeks = request.args.get('weeks', 8, type=int)
+        refresh = request.args.get('refresh') == '1'
+
+        result = activity_analytics.get_report(days=days, weeks=weeks, refresh=refresh)
 
         if result['success']:
             return jsonify(result)
@@ -372,10 +908,51 @@ def get_all_users():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def portfolio_values_cost(data):
+    """RPC cost of a portfolio request: one reserves read plus a multicall per wallets x tokens batch"""
+    wallets = data.get('wallet_addresses')
+    tokens = data.get('tokens')
+    token_count = len(tokens) if isinstance(tokens, list) else len(token_registry.get_tokens())
+    return batched_read_cost(len(wallets) if isinstance(wallets, list) else 0, token_count,
+                             DEFAULT_BATCH_SIZE, fixed=1)
+
+
+rate_limiter.set_cost('get_portfolio_values', portfolio_values_cost)
+
+
+@app.route('/api/admin/portfolio-values', methods=['POST'])
+def get_portfolio_values():
+    """USD value of each wallet's token holdings at DEX prices (admin endpoint)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        wallet_addresses = data.get('wallet_addresses') or []
+        token_keys = data.get('tokens')
+
+        if not isinstance(wallet_addresses, list) or len(wallet_addresses) > 5000:
+            return jsonify({'success': False, 'error': 'wallet_addresses must be a list of at most 5000 addresses'}), 400
+        wallet_addresses = [parse_address(address) for address in wallet_addresses]
+        if None in wallet_addresses:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
+        if token_keys is not None and (not isinstance(token_keys, list)
+                                       or not all(isinstance(key, str) for key in token_keys)):
+            return jsonify({'success': False, 'error': 'tokens must be a list of token keys'}), 400
+        if token_keys is not None and any(token_registry.get(key) is None for key in token_keys):
+            return jsonify({'success': False, 'error': 'Unknown token'}), 400
+
+        return jsonify({'success': True, **valuation_engine.value_wallets(wallet_addresses, token_keys)})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/admin/stats', methods=['GET'])
 def get_platform_stats():
     """Get platform statistics (admin endpoint)"""
     try:
+        # Serve the change-stream maintained counters instead of re-counting
+        if admin_feed.is_live():
+            return jsonify({'success': True, 'stats': admin_feed.get_stats(), 'live': True})
+
         result = db_manager.get_platform_stats()
 
         if result['success']:
@@ -387,6 +964,17 @@ def get_platform_stats():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/admin/stream', methods=['GET'])
+def stream_admin_feed():
+    """Server-Sent Events stream of logins, access changes, transactions and counters"""
+    try:
+        subscriber = admin_feed.subscribe()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return sse_response(subscriber, 'admin', lambda: admin_feed.unsubscribe(subscriber))
+
+
 @app.route('/api/admin/update-access', methods=['POST'])
 def update_user_access():
     """Update user access level (admin endpoint)"""
@@ -398,6 +986,9 @@ def update_user_access():
 
         if not wallet_address or not access_level:
             return jsonify({'success': False, 'error': 'Missing required parameters'}), 400
+        wallet_address = parse_address(wallet_address)
+        if wallet_address is None:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
 
         result = db_manager.update_access_level(wallet_address, access_level, updated_by)
 
@@ -410,6 +1001,94 @@ def update_user_access():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/admin/revoke-access', methods=['POST'])
+def revoke_user_access():
+    """Revoke a user's platform access (admin endpoint)"""
+    try:
+        data = request.get_json()
+        wallet_address = data.get('wallet_address')
+        reason = data.get('reason')
+
+        if not wallet_address:
+            return jsonify({'success': False, 'error': 'Missing required parameters'}), 400
+        wallet_address = parse_address(wallet_address)
+        if wallet_address is None:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
+
+        result = db_manager.revoke_access(wallet_address, reason)
+
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+MAX_BULK_ACCESS_WALLETS = 10000
+
+
+def bulk_access_change(action):
+    """Apply one access action to a list of wallets, reporting a status per wallet"""
+    data = request.get_json(silent=True) or {}
+    wallet_addresses = data.get('wallet_addresses') or []
+
+    if not isinstance(wallet_addresses, list) or not wallet_addresses or len(wallet_addresses) > MAX_BULK_ACCESS_WALLETS:
+        return jsonify({'success': False, 'error': f'wallet_addresses must be a list of 1 to '
+                                                   f'{MAX_BULK_ACCESS_WALLETS} addresses'}), 400
+    if action == 'update' and not data.get('access_level'):
+        return jsonify({'success': False, 'error': 'Missing required parameters'}), 400
+
+    valid, invalid = [], []
+    for address in wallet_addresses:
+        canonical = parse_address(address)
+        if canonical is None:
+            invalid.append({'wallet_address': address, 'status': 'invalid_address'})
+        else:
+            valid.append(canonical)
+
+    result = {'success': True, 'action': action, 'requested': 0, 'matched': 0, 'modified': 0,
+              'not_found': 0, 'results': []}
+    if valid:
+        result = db_manager.bulk_update_access(action, valid, access_level=data.get('access_level'),
+                                               updated_by=data.get('updated_by', 'admin'),
+                                               reason=data.get('reason'))
+        if not result['success']:
+            return jsonify({'success': False, 'error': result['error']}), 500
+
+    result['invalid'] = len(invalid)
+    result['results'] = result['results'] + invalid
+    return jsonify(result)
+
+
+@app.route('/api/admin/bulk-grant-access', methods=['POST'])
+def bulk_grant_access():
+    """Grant platform access to many wallets (admin endpoint)"""
+    try:
+        return bulk_access_change('grant')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/bulk-revoke-access', methods=['POST'])
+def bulk_revoke_access():
+    """Revoke platform access from many wallets (admin endpoint)"""
+    try:
+        return bulk_access_change('revoke')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/admin/bulk-update-access', methods=['POST'])
+def bulk_update_access():
+    """Set the access level of many wallets (admin endpoint)"""
+    try:
+        return bulk_access_change('update')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/transaction/log', methods=['POST'])
 def log_transaction():
     """Log a transaction"""
@@ -420,6 +1099,9 @@ def log_transaction():
 
         if not wallet_address or not transaction_data:
             return jsonify({'success': False, 'error': 'Missing required parameters'}), 400
+        wallet_address = parse_address(wallet_address)
+        if wallet_address is None:
+            return jsonify({'success': False, 'error': 'Invalid wallet address'}), 400
 
         result = db_manager.log_transaction(wallet_address, transaction_data)
 
@@ -432,6 +1114,28 @@ def log_transaction():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Runtime metrics for RPC request coalescing and live streams"""
+    try:
+        return jsonify({
+            'success': True,
+            'rpc_singleflight': rpc_flight.get_stats(),
+            'rpc_http_pool': rpc_session.get_stats(),
+            'address_cache': address_cache_stats(),
+            'balance_stream': balance_stream.subscriber_count(),
+            'finality': finality_tracker.get_status(),
+            'block_cache': block_cache.get_stats(),
+            'access_counter': access_counter.get_stats(),
+            'circuit_breakers': {
+                'mongodb': db_manager.breaker.get_status(),
+                'rpc': chain_registry.get_status()
+            }
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/db/health', methods=['GET'])
 def db_health_check():
     """Check database connection health"""
@@ -474,7 +1178,9 @@ def db_status():
         connection_status = db_manager.get_connection_status()
 
         # Get platform stats if connected
-        if connection_status['connected']:
+        if connection_status['connected'] and admin_feed.is_live():
+            stats = admin_feed.get_stats()
+        elif connection_status['connected']:
             stats_result = db_manager.get_platform_stats()
             stats = stats_result.get('stats', {})
         else:
@@ -493,6 +1199,7 @@ def db_status():
             'success': True,
             'database': connection_status,
             'stats': stats,
+            'jobs': scheduler.get_status(),
             'alerts': generate_db_alerts(connection_status, stats)
         })
 
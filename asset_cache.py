@@ -0,0 +1,106 @@
+"""
+HTTP caching helpers: pre-rendered pages, content-hashed precompressed
+static assets and conditional responses for constant API payloads.
+
+Hashed assets are produced by build_assets.py into static/dist together
+with a manifest; when no build exists the plain /static URLs are used.
+"""
+import json
+import mimetypes
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from flask import Flask, Response, render_template, request, send_from_directory, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Precompressed variants in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+ONE_YEAR = 365 * 24 * 3600
+
+
+class AssetCache:
+    """Serves build-time hashed assets and caches rendered pages and constant responses"""
+
+    def __init__(self):
+        self.manifest: Dict[str, str] = {}
+        self._pages: Dict[Any, Response] = {}
+        self._responses: Dict[str, Response] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.manifest = self.load_manifest()
+        app.add_url_rule('/assets/<path:filename>', 'hashed_asset', self.send_asset)
+        app.jinja_env.globals['asset_url'] = self.asset_url
+
+    @staticmethod
+    def load_manifest() -> Dict[str, str]:
+        """Map of static path (e.g. 'js/app.js') to its hashed dist path"""
+        try:
+            with open(MANIFEST_PATH, 'r') as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+    def asset_url(self, filename: str) -> str:
+        """URL for a static file: the immutable hashed build if present, else /static"""
+        hashed = self.manifest.get(filename)
+        if hashed:
+            return url_for('hashed_asset', filename=hashed)
+        return url_for('static', filename=filename)
+
+    def send_asset(self, filename: str) -> Response:
+        """Send a hashed asset, picking a precompressed variant the client accepts"""
+        accepted = request.accept_encodings
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+                response = send_from_directory(DIST_DIR, filename + suffix, max_age=ONE_YEAR,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(DIST_DIR, filename, max_age=ONE_YEAR)
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        # The hash in the file name changes with the content, so it never needs revalidation
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def render_page(self, template_name: str, **context: Any) -> Response:
+        """Render a template once per distinct context and serve it with an ETag"""
+        key = (template_name, tuple(sorted(context.items())))
+        cached = self._pages.get(key)
+        if cached is None:
+            cached = Response(render_template(template_name, **context), mimetype='text/html')
+            cached.add_etag()
+            # Pages reference hashed assets, so revalidate instead of caching blindly
+            cached.cache_control.no_cache = True
+            cached.freeze()
+            with self._lock:
+                self._pages[key] = cached
+        return self._conditional(cached)
+
+    def constant_json(self, key: str, build: Callable[[], Response], max_age: int = 300) -> Response:
+        """Serve a response that never changes at runtime with ETag/Cache-Control"""
+        cached = self._responses.get(key)
+        if cached is None:
+            cached = build()
+            cached.add_etag()
+            cached.cache_control.public = True
+            cached.cache_control.max_age = max_age
+            cached.freeze()
+            with self._lock:
+                self._responses[key] = cached
+        return self._conditional(cached)
+
+    @staticmethod
+    def _conditional(cached: Response) -> Response:
+        # Copy so per-request conditional handling never mutates the cached response
+        response = Response(cached.get_data(), status=cached.status_code, headers=list(cached.headers.items()))
+        return response.make_conditional(request)
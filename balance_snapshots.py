@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Periodic balance snapshots for per-wallet balance history
+
+Each run reads every configured token balance of every wallet registered
+in `users` at a single block, using batched Multicall3 reads, and appends
+one sample to that wallet's bucket document for the current UTC day:
+
+    balance_history
+        wallet_address  BinData (compact schema)
+        day             UTC midnight of the bucket
+        samples         [{t: <datetime>, n: <block>, b: {'USDT': '1500000000000000000', ...}}]
+        sample_count    number of samples in the bucket
+
+Balances are exact integer strings in the token's smallest unit, and zero
+balances are left out of a sample. One day of history for a wallet is a
+single document read, a 30-day chart one indexed range read.
+
+Usage:
+    python balance_snapshots.py            # take one snapshot now
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from chain import get_w3
+from dbmanager import DBManager, SCHEMA_VERSION, decode_address, encode_address
+from singleflight import rpc_flight
+from token_registry import TokenRegistry
+from valuation import ValuationEngine
+
+
+def day_bucket(timestamp: datetime) -> datetime:
+    """UTC midnight of the day a timestamp falls in"""
+    return timestamp.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class BalanceSnapshotJob:
+    """Batch-reads balances for all registered wallets and stores day-bucketed samples"""
+
+    def __init__(self, db_manager: DBManager, valuation_engine: ValuationEngine, registry: TokenRegistry,
+                 batch_size: int = 500, collection_name: str = 'balance_history'):
+        self.db_manager = db_manager
+        self.valuation_engine = valuation_engine
+        self.registry = registry
+        self.batch_size = batch_size
+        self.collection_name = collection_name
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._indexes_ready = False
+
+    def _collection(self):
+        collection = self.db_manager.db[self.collection_name]
+        if not self._indexes_ready:
+            collection.create_index([('wallet_address', ASCENDING), ('day', ASCENDING)], unique=True)
+            self._indexes_ready = True
+        return collection
+
+    def token_keys(self) -> List[str]:
+        """Tokens included in every sample"""
+        return [token['key'] for token in self.registry.get_tokens() if token.get('isActive', True)]
+
+    def run_once(self, block: Optional[int] = None) -> Dict[str, Any]:
+        """Snapshot all registered wallets at one block"""
+        if not self.db_manager.is_connected():
+            return {"success": False, "error": "Database not connected"}
+
+        started = time.monotonic()
+        try:
+            if block is None:
+                w3 = get_w3()
+                block = rpc_flight.do(('block_number',), lambda: w3.eth.block_number)
+            timestamp = datetime.now(timezone.utc)
+            token_keys = self.token_keys()
+            collection = self._collection()
+
+            wallet_count = 0
+            batch: List[str] = []
+            cursor = self.db_manager.db.users.find({}, {'wallet_address': 1, '_id': 0}, batch_size=self.batch_size)
+            for user in cursor:
+                batch.append(decode_address(user['wallet_address']))
+                if len(batch) >= self.batch_size:
+                    wallet_count += self._store_batch(collection, batch, token_keys, block, timestamp)
+                    batch = []
+            if batch:
+                wallet_count += self._store_batch(collection, batch, token_keys, block, timestamp)
+
+            self.last_result = {
+                "success": True,
+                "block": block,
+                "wallets": wallet_count,
+                "tokens": len(token_keys),
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "timestamp": timestamp
+            }
+            return self.last_result
+
+        except PyMongoError as e:
+            self.last_result = {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            self.last_result = {"success": False, "error": f"Snapshot failed: {str(e)}"}
+        return self.last_result
+
+    def _store_batch(self, collection, wallets: List[str], token_keys: List[str],
+                     block: int, timestamp: datetime) -> int:
+        balances = self.valuation_engine.read_raw_balances(wallets, token_keys, block)
+        day = day_bucket(timestamp)
+        operations = []
+        for wallet, row in zip(wallets, balances):
+            sample = {
+                't': timestamp,
+                'n': block,
+                'b': {key: str(amount) for key, amount in zip(token_keys, row) if amount}
+            }
+            operations.append(UpdateOne(
+                {'wallet_address': encode_address(wallet), 'day': day},
+                {
+                    '$push': {'samples': sample},
+                    '$inc': {'sample_count': 1},
+                    '$setOnInsert': {'schema_version': SCHEMA_VERSION}
+                },
+                upsert=True
+            ))
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def get_history(self, wallet_address: str, days: int = 30) -> Dict[str, Any]:
+        """Balance samples for a wallet over the last N days, oldest first"""
+        if not self.db_manager.is_connected():
+            return {"success": True, "history": [], "offline_mode": True}
+
+        try:
+            since = day_bucket(datetime.now(timezone.utc)) - timedelta(days=max(days, 1) - 1)
+            buckets = self._collection().find(
+                {'wallet_address': encode_address(wallet_address), 'day': {'$gte': since}},
+                {'samples': 1, '_id': 0}
+            ).sort('day', ASCENDING)
+
+            history = [
+                {'timestamp': sample['t'], 'block': sample['n'], 'balances': sample['b']}
+                for bucket in buckets for sample in bucket['samples']
+            ]
+            return {"success": True, "history": history}
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+
+def main():
+    db_manager = DBManager()
+    if not db_manager.is_connected():
+        print("❌ Cannot connect to database")
+        return 1
+
+    registry = TokenRegistry(db_manager)
+    registry.load()
+    registry.verify()
+    job = BalanceSnapshotJob(db_manager, ValuationEngine(registry), registry)
+
+    print("Taking balance snapshot")
+    print("=" * 50)
+    result = job.run_once()
+    db_manager.close()
+    if not result['success']:
+        print(f"❌ {result['error']}")
+        return 1
+    print(f"✅ {result['wallets']} wallets x {result['tokens']} tokens at block {result['block']} "
+          f"in {result['duration_ms']} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
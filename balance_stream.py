@@ -0,0 +1,152 @@
+"""
+Live balance/allowance push channel for Server-Sent Events clients.
+
+Clients subscribe per wallet. On every new block the shared head follower
+triggers one balance read per subscribed wallet (not per client), and only
+the fields that changed are pushed to that wallet's subscribers.
+
+The head follower thread also drives reorg detection and fee sampling, so
+on_new_block only records the block and returns. A dedicated worker thread
+does the reads, all subscribed wallets in one batch through fetch_many
+when it is given. Blocks that arrive while a refresh is running are
+collapsed into the newest one.
+"""
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from head_follower import HeadFollower
+
+
+class BalanceStream:
+    """Fans out per-block balance diffs to wallet subscribers"""
+
+    def __init__(self, follower: HeadFollower, fetch_balances: Callable[[str], Dict[str, Any]],
+                 max_queue_size: int = 100,
+                 fetch_many: Optional[Callable[[List[str]], Dict[str, Dict[str, Any]]]] = None):
+        self.follower = follower
+        self.fetch_balances = fetch_balances
+        # Batched reader for many wallets at once; wallets missing from its result are skipped
+        self.fetch_many = fetch_many
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, List[queue.Queue]] = {}
+        self._last_balances: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pending_block: Optional[int] = None
+        self._wake = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def subscribe(self, wallet_address: str) -> queue.Queue:
+        """Register a subscriber queue for a wallet and seed it with a snapshot"""
+        wallet = wallet_address.lower()
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(wallet, []).append(subscriber)
+            balances = self._last_balances.get(wallet)
+        self.follower.add_listener(self.on_new_block)
+
+        if balances is None:
+            try:
+                balances = self.fetch_balances(wallet_address)
+            except Exception:
+                # No stream will be opened, so nothing would ever unsubscribe this queue
+                self.unsubscribe(wallet_address, subscriber)
+                raise
+            with self._lock:
+                if wallet in self._subscribers:
+                    self._last_balances.setdefault(wallet, balances)
+        self._offer(subscriber, {
+            'type': 'snapshot',
+            'address': wallet,
+            'block': self.follower.latest_block,
+            'balances': balances
+        })
+        return subscriber
+
+    def unsubscribe(self, wallet_address: str, subscriber: queue.Queue) -> None:
+        """Remove a subscriber queue; the wallet is dropped with its last subscriber"""
+        wallet = wallet_address.lower()
+        with self._lock:
+            subscribers = self._subscribers.get(wallet, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(wallet, None)
+                self._last_balances.pop(wallet, None)
+
+    def subscriber_count(self) -> Dict[str, int]:
+        """Number of subscribed wallets and open client streams"""
+        with self._lock:
+            return {
+                'wallets': len(self._subscribers),
+                'clients': sum(len(subscribers) for subscribers in self._subscribers.values())
+            }
+
+    def on_new_block(self, block_number: int) -> None:
+        """Head follower callback: hand the refresh to the worker thread and return"""
+        with self._lock:
+            self._pending_block = block_number
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='balance-stream', daemon=True)
+                self._worker.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                block_number, self._pending_block = self._pending_block, None
+            if block_number is None:
+                continue
+            try:
+                self.refresh(block_number)
+            except Exception as e:
+                print(f"[WARNING] Balance stream refresh for block {block_number} failed: {e}")
+
+    def refresh(self, block_number: int) -> None:
+        """Recompute balances for subscribed wallets and push what changed"""
+        with self._lock:
+            wallets = list(self._subscribers)
+        if not wallets:
+            return
+
+        for wallet, balances in self._read(wallets).items():
+            with self._lock:
+                if wallet not in self._subscribers:
+                    continue
+                previous = self._last_balances.get(wallet, {})
+                changes = {key: value for key, value in balances.items() if previous.get(key) != value}
+                self._last_balances[wallet] = balances
+                subscribers = list(self._subscribers[wallet])
+
+            if not changes:
+                continue
+            event = {'type': 'diff', 'address': wallet, 'block': block_number, 'changes': changes}
+            for subscriber in subscribers:
+                self._offer(subscriber, event)
+
+    def _read(self, wallets: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Balances per wallet; wallets whose read failed are left out"""
+        if self.fetch_many is not None:
+            try:
+                return self.fetch_many(wallets)
+            except Exception as e:
+                print(f"[WARNING] Balance refresh failed for {len(wallets)} wallets: {e}")
+                return {}
+
+        results = {}
+        for wallet in wallets:
+            try:
+                results[wallet] = self.fetch_balances(wallet)
+            except Exception as e:
+                print(f"[WARNING] Balance refresh failed for {wallet}: {e}")
+        return results
+
+    @staticmethod
+    def _offer(subscriber: queue.Queue, event: Dict[str, Any]) -> None:
+        # A client that stopped reading must not stall the block loop
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            pass
@@ -0,0 +1,172 @@
+"""
+Circuit breakers for the RPC node and MongoDB, with last-known-good fallbacks.
+
+A CircuitBreaker counts consecutive failures. Calls slower than
+`slow_call_seconds` count as failures too, so a node that answers too
+slowly trips it the same way as one that errors. After
+`failure_threshold` failures in a row the circuit opens, and calls fail
+fast with CircuitOpen instead of waiting for an HTTP or server-selection
+timeout. Once `reset_timeout` seconds have passed, a single half-open
+probe is let through. If it succeeds the circuit closes; if it fails the
+circuit opens again.
+
+fallback() wraps a read whose result can be served stale. Each successful
+result is stored under a key in a bounded last-known-good cache. If the
+read fails with one of the breaker's failure types, or the circuit is
+open, the stored value is returned with its age and the caller marks the
+response as stale. Without a stored value the error propagates.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(ConnectionError):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by consecutive failures and slow calls"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 slow_call_seconds: Optional[float] = None, failure_types: Tuple[type, ...] = (Exception,),
+                 fallback_size: int = 10000):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_types = failure_types
+        self.fallback_size = fallback_size
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_good: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'trips': 0,
+                       'stale_served': 0}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; an expired open circuit admits one half-open probe"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self, duration: float = 0.0) -> None:
+        if self.slow_call_seconds is not None and duration > self.slow_call_seconds:
+            with self._lock:
+                self._stats['slow_calls'] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self._stats['calls'] += 1
+            if self._state != CLOSED:
+                print(f"[SUCCESS] {self.name} circuit closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['failures'] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                if self._state == CLOSED:
+                    self._stats['trips'] += 1
+                    print(f"[WARNING] {self.name} circuit opened after {self._failures} consecutive failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn through the breaker, raising CircuitOpen while it is open"""
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_in())
+        started = time.monotonic()
+        try:
+            result = fn()
+        except self.failure_types:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Not an outage (e.g. a bad request): release a half-open probe without judging it
+            with self._lock:
+                self._probe_in_flight = False
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def fallback(self, key: Hashable, fetch: Callable[[], Any],
+                 cacheable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, Optional[float]]:
+        """(value, None) from fetch, or (last good value, its age in seconds) if the dependency is down
+
+        cacheable decides whether a fetched value may become the last good one
+        (e.g. not an incomplete result); by default every value is stored.
+        """
+        try:
+            value = fetch()
+        except (CircuitOpen,) + self.failure_types:
+            entry = self.last_good(key)
+            if entry is None:
+                raise
+            return entry
+        if cacheable is None or cacheable(value):
+            self.remember(key, value)
+        return value, None
+
+    def remember(self, key: Hashable, value: Any) -> None:
+        """Store a successful result as the last known good value for key"""
+        with self._lock:
+            self._last_good[key] = (value, time.time())
+            self._last_good.move_to_end(key)
+            while len(self._last_good) > self.fallback_size:
+                self._last_good.popitem(last=False)
+
+    def last_good(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(last good value, its age in seconds) for key, or None"""
+        with self._lock:
+            entry = self._last_good.get(key)
+            if entry is None:
+                return None
+            self._stats['stale_served'] += 1
+            return entry[0], round(time.time() - entry[1], 1)
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def get_status(self) -> Dict[str, Any]:
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'retry_in': round(retry_in, 1),
+                'last_good_entries': len(self._last_good),
+                **self._stats
+            }
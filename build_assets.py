@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Build content-hashed, precompressed copies of the static assets
+
+Writes static/dist/<dir>/<name>.<hash>.<ext> plus .gz (and .br when the
+brotli package is installed) for every CSS/JS file, and a manifest.json
+mapping the original path to the hashed one. The app serves these with
+long-lived immutable caching; run this at image build time.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from asset_cache import DIST_DIR, MANIFEST_PATH, STATIC_DIR
+
+ASSET_DIRS = ('css', 'js')
+
+
+def hashed_name(relative_path, content):
+    """'js/app.js' -> 'js/app.<first 12 hex of sha256>.js'"""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, extension = os.path.splitext(relative_path)
+    return f"{root}.{digest}{extension}"
+
+
+def build():
+    """Build every asset and return the manifest"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+
+    manifest = {}
+    for asset_dir in ASSET_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(STATIC_DIR, asset_dir)):
+            for filename in sorted(filenames):
+                source = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(source, STATIC_DIR).replace(os.sep, '/')
+                with open(source, 'rb') as source_file:
+                    content = source_file.read()
+
+                target_name = hashed_name(relative_path, content)
+                target = os.path.join(DIST_DIR, target_name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as target_file:
+                    target_file.write(content)
+                # mtime=0 keeps the gzip output byte-identical between builds
+                with open(target + '.gz', 'wb') as gzip_file:
+                    gzip_file.write(gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as brotli_file:
+                        brotli_file.write(brotli.compress(content, quality=11))
+
+                manifest[relative_path] = target_name
+                print(f"  ✅ {relative_path} -> dist/{target_name}")
+
+    with open(MANIFEST_PATH, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    print("Building static assets")
+    print("=" * 50)
+    if brotli is None:
+        print("  ℹ️  brotli not installed, writing gzip variants only")
+    try:
+        build()
+    except Exception as e:
+        print(f"❌ Asset build failed: {e}")
+        sys.exit(1)
+    print("🎉 Assets built")
@@ -0,0 +1,180 @@
+"""
+Registry of lazily constructed Web3 clients, one per configured EVM chain.
+
+Each enabled chain in Config.CHAINS gets a ChainClient. The client owns one
+Web3 instance whose HTTP provider sends through the process-wide pooled
+session in rpc_session, a single-flight
+group for coalescing identical reads, and a cache for values that never
+change (token decimals, ...). Clients are built on first use and shared by
+all requests for that chain.
+
+The default chain's client backs get_w3() and the global rpc_flight, so the
+head follower, fee service, event ingester and the other background
+components follow the default chain.
+
+web3 pulls in a large import tree, so nothing here imports it until a
+client is actually requested.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+import requests
+
+from addresses import canonical_address
+from breaker import CircuitBreaker
+from config import Config
+from rpc_session import rpc_session
+from singleflight import SingleFlight, rpc_flight
+
+
+class UnknownChain(ValueError):
+    """A chain key that is not configured or not enabled"""
+
+
+class ChainClient:
+    """Web3 client, read coalescing and immutable-value cache for one chain"""
+
+    def __init__(self, key: str, spec: Dict[str, Any], flight: Optional[SingleFlight] = None):
+        self.key = key
+        self.chain_id = spec['chain_id']
+        self.name = spec['name']
+        self.rpc_url = spec['rpc_url']
+        self.explorer_url = spec.get('explorer_url')
+        self.native_symbol = spec.get('native_symbol', 'ETH')
+        self.contracts = {name: address for name, address in spec.get('contracts', {}).items() if address}
+        self.flight = flight or SingleFlight()
+        # Fails RPC calls fast while the node errors or is too slow; see breaker.py
+        self.breaker = CircuitBreaker(f'rpc:{key}', Config.RPC_BREAKER_FAILURES, Config.RPC_BREAKER_RESET,
+                                      Config.RPC_SLOW_CALL_SECONDS, failure_types=(requests.RequestException,))
+        self._w3 = None
+        self._cache: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def w3(self):
+        """The chain's Web3 client, created on first use"""
+        if self._w3 is None:
+            with self._lock:
+                if self._w3 is None:
+                    from web3 import Web3
+                    self._w3 = Web3(rpc_session.provider(self.rpc_url, self.breaker))
+        return self._w3
+
+    def is_ready(self) -> bool:
+        return self._w3 is not None
+
+    def contract(self, name: str) -> Optional[str]:
+        """Configured address of a named contract ('usdt', 'program', ...) on this chain"""
+        return self.contracts.get(name)
+
+    def cached(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Value that never changes on chain, fetched once (concurrent misses share one call)"""
+        if key in self._cache:
+            return self._cache[key]
+        value = self.flight.do(key, fetch)
+        self._cache[key] = value
+        return value
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'chain': self.key,
+            'chainId': self.chain_id,
+            'chainName': self.name,
+            'rpcUrl': self.rpc_url,
+            'blockExplorer': self.explorer_url,
+            'nativeSymbol': self.native_symbol,
+            'contracts': dict(self.contracts)
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        return {'ready': self.is_ready(), **self.breaker.get_status()}
+
+
+class ChainRegistry:
+    """Enabled chains by key, with one shared client each"""
+
+    def __init__(self, chains: Dict[str, Dict[str, Any]], enabled: Sequence[str], default: str):
+        if default not in chains:
+            raise UnknownChain(f"Unknown default chain: {default}")
+        self.default_key = default
+        self._clients: Dict[str, ChainClient] = {}
+        for key in dict.fromkeys(list(enabled) + [default]):
+            if key not in chains:
+                print(f"[WARNING] Ignoring unknown chain in ENABLED_CHAINS: {key}")
+                continue
+            # The default chain shares the global single-flight group, so its metrics stay in one place
+            self._clients[key] = ChainClient(key, chains[key], rpc_flight if key == default else None)
+
+    def get(self, key: Optional[str] = None) -> ChainClient:
+        """Client for a chain key or numeric chain id; the default chain when key is empty"""
+        if not key:
+            return self._clients[self.default_key]
+        client = self._clients.get(str(key).lower())
+        if client is None:
+            client = next((client for client in self._clients.values() if str(client.chain_id) == str(key)), None)
+        if client is None:
+            raise UnknownChain(f"Unsupported chain: {key}")
+        return client
+
+    @property
+    def default(self) -> ChainClient:
+        return self._clients[self.default_key]
+
+    def is_default(self, client: ChainClient) -> bool:
+        return client.key == self.default_key
+
+    def get_status(self) -> Dict[str, Any]:
+        """Readiness and circuit breaker state per chain"""
+        return {key: client.get_status() for key, client in self._clients.items()}
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [{**client.info(), 'default': client.key == self.default_key} for client in self._clients.values()]
+
+
+# Global registry built from Config.CHAINS
+chain_registry = ChainRegistry(Config.CHAINS, Config.ENABLED_CHAINS, Config.DEFAULT_CHAIN)
+
+
+def get_w3():
+    """Return the default chain's shared Web3 client, creating it on first use"""
+    return chain_registry.default.w3
+
+
+def is_w3_ready() -> bool:
+    """Check whether the default chain's Web3 client has been created"""
+    return chain_registry.default.is_ready()
+
+
+def to_checksum_address(address: str) -> str:
+    """Checksum an address through the memoized canonical-address cache
+
+    Like Web3.to_checksum_address, the case of the input is not validated,
+    so configured addresses with a wrong mix of cases still work.
+    """
+    return canonical_address(address.lower() if isinstance(address, str) else address).checksum
+
+
+def start_w3_warmup() -> threading.Thread:
+    """Import web3 and build the client on a daemon thread"""
+    thread = threading.Thread(target=get_w3, name='web3-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def encode_call(signature: str, args: Sequence[Any] = ()) -> str:
+    """ABI-encode a call from its signature, e.g. ('approve(address,uint256)', [spender, amount])"""
+    from eth_abi import encode
+    from eth_utils import function_signature_to_4byte_selector
+
+    types, depth, current = [], 0, ''
+    # Split on top-level commas only, so tuple types like (address,bool,bytes)[] stay whole
+    for char in signature[signature.index('(') + 1:-1]:
+        if char == ',' and depth == 0:
+            types.append(current)
+            current = ''
+            continue
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        current += char
+    if current:
+        types.append(current)
+    return '0x' + (function_signature_to_4byte_selector(signature) + encode(types, list(args))).hex()
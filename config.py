@@ -17,12 +17,10 @@ class Config:
     BSC_TESTNET_RPC = os.getenv('BSC_TESTNET_RPC', 'https://data-seed-prebsc-1-s1.binance.org:8545')
     
     # Contract Addresses
-    USDT_MAINNET_ADDRESS = os.getenv('USDT_MAINNET_ADDRESS', '0x55d398326f99059fF775485246999027B3197955')
+    USDT_MAINNET_ADDRESS = os.getenv('USDT_MAINNET_ADDRESS',
+                                     os.getenv('USDT_CONTRACT_ADDRESS', '0x55d398326f99059fF775485246999027B3197955'))
     USDT_TESTNET_ADDRESS = os.getenv('USDT_TESTNET_ADDRESS', '')
     
-    # Network Selection (testnet/mainnet)
-    NETWORK = os.getenv('NETWORK', 'testnet')
-    
     # Chain IDs
     BSC_MAINNET_CHAIN_ID = 56
     BSC_TESTNET_CHAIN_ID = 97
@@ -31,28 +29,109 @@ class Config:
     BSC_MAINNET_EXPLORER = 'https://bscscan.com'
     BSC_TESTNET_EXPLORER = 'https://testnet.bscscan.com'
     
+    # EVM chains the backend can talk to, keyed by the `chain` request parameter
+    CHAINS = {
+        'bsc': {
+            'chain_id': BSC_MAINNET_CHAIN_ID,
+            'name': 'Binance Smart Chain Mainnet',
+            'rpc_url': BSC_MAINNET_RPC,
+            'explorer_url': BSC_MAINNET_EXPLORER,
+            'native_symbol': 'BNB',
+            'contracts': {
+                'usdt': USDT_MAINNET_ADDRESS,
+                'program': os.getenv('PROGRAM_CONTRACT_ADDRESS', '0x8B9c85D168d82D6266d71b6f31bb48e3bE1caDf4'),
+                'universal': os.getenv('UNIVERSAL_CONTRACT_ADDRESS', ''),
+            },
+        },
+        'bsc-testnet': {
+            'chain_id': BSC_TESTNET_CHAIN_ID,
+            'name': 'Binance Smart Chain Testnet',
+            'rpc_url': BSC_TESTNET_RPC,
+            'explorer_url': BSC_TESTNET_EXPLORER,
+            'native_symbol': 'tBNB',
+            'contracts': {
+                'usdt': USDT_TESTNET_ADDRESS,
+                'program': os.getenv('PROGRAM_TESTNET_ADDRESS', ''),
+                'universal': os.getenv('UNIVERSAL_TESTNET_ADDRESS', ''),
+            },
+        },
+        'ethereum': {
+            'chain_id': 1,
+            'name': 'Ethereum Mainnet',
+            'rpc_url': os.getenv('ETHEREUM_RPC', 'https://ethereum-rpc.publicnode.com'),
+            'explorer_url': 'https://etherscan.io',
+            'native_symbol': 'ETH',
+            'contracts': {'usdt': '0xdAC17F958D2ee523a2206206994597C13D831ec7'},
+        },
+        'polygon': {
+            'chain_id': 137,
+            'name': 'Polygon PoS',
+            'rpc_url': os.getenv('POLYGON_RPC', 'https://polygon-rpc.com'),
+            'explorer_url': 'https://polygonscan.com',
+            'native_symbol': 'POL',
+            'contracts': {'usdt': '0xc2132D05D31c914a87C6611C10748AEb04B58e8F'},
+        },
+    }
+    
+    # Chains that get a client, and the one used when a request names none.
+    # NETWORK=testnet/mainnet is still honoured when DEFAULT_CHAIN is not set.
+    ENABLED_CHAINS = [key.strip() for key in os.getenv('ENABLED_CHAINS', 'bsc,bsc-testnet').split(',') if key.strip()]
+    DEFAULT_CHAIN = os.getenv('DEFAULT_CHAIN') or ('bsc-testnet' if os.getenv('NETWORK') == 'testnet' else 'bsc')
+    
+    # HTTP connection pool shared by all RPC providers (see rpc_session.py)
+    RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '32'))      # keep-alive connections per RPC host
+    RPC_POOL_HOSTS = int(os.getenv('RPC_POOL_HOSTS', '8'))     # RPC hosts with a cached pool
+    RPC_CONNECT_TIMEOUT = float(os.getenv('RPC_CONNECT_TIMEOUT', '3.05'))
+    RPC_READ_TIMEOUT = float(os.getenv('RPC_READ_TIMEOUT', '10'))
+    RPC_MAX_RETRIES = int(os.getenv('RPC_MAX_RETRIES', '0'))   # connection-level retries only
+    
+    # RPC circuit breaker (see breaker.py): consecutive failures to open, seconds until a
+    # half-open probe, and the latency above which a call counts as a failure.
+    # DBManager reads the DB_BREAKER_* equivalents from the environment itself.
+    RPC_BREAKER_FAILURES = int(os.getenv('RPC_BREAKER_FAILURES', '5'))
+    RPC_BREAKER_RESET = float(os.getenv('RPC_BREAKER_RESET', '30'))
+    RPC_SLOW_CALL_SECONDS = float(os.getenv('RPC_SLOW_CALL_SECONDS', '5'))
+    
+    # Distinct wallet addresses kept validated/checksummed in memory (see addresses.py)
+    ADDRESS_CACHE_SIZE = int(os.getenv('ADDRESS_CACHE_SIZE', '65536'))
+    
     # API Configuration
-    API_RATE_LIMIT = '100 per hour'
+    # Requests per client IP to endpoints that call the RPC node
+    API_RATE_LIMIT = os.getenv('API_RATE_LIMIT', '100 per hour')
+    # Weighted RPC calls per client IP and per wallet (see rate_limiter.ENDPOINT_COSTS)
+    RPC_RATE_LIMIT = os.getenv('RPC_RATE_LIMIT', '2000 per hour')
+    WALLET_RPC_RATE_LIMIT = os.getenv('WALLET_RPC_RATE_LIMIT', '1000 per hour')
+    # 'memory' (per process) or 'mongodb' (shared by all workers)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    # 'coalesce' (per-minute access counters, raw activity only for new information) or 'raw'
+    ACCESS_EVENT_MODE = os.getenv('ACCESS_EVENT_MODE', 'coalesce')
+    # Start MongoDB/web3 warmup, token verification and the head-follower jobs when app is imported
+    BACKGROUND_SERVICES = os.getenv('BACKGROUND_SERVICES', 'true').lower() == 'true'
+    
+    @property
+    def NETWORK(self):
+        """'testnet' or 'mainnet', derived from the default chain"""
+        return 'testnet' if self.DEFAULT_CHAIN.endswith('testnet') else 'mainnet'
     
     @property
     def RPC_URL(self):
-        """Get RPC URL based on selected network"""
-        return self.BSC_TESTNET_RPC if self.NETWORK == 'testnet' else self.BSC_MAINNET_RPC
+        """Get RPC URL of the default chain"""
+        return self.CHAINS[self.DEFAULT_CHAIN]['rpc_url']
     
     @property
     def USDT_ADDRESS(self):
-        """Get USDT contract address based on selected network"""
-        return self.USDT_TESTNET_ADDRESS if self.NETWORK == 'testnet' else self.USDT_MAINNET_ADDRESS
+        """Get USDT contract address on the default chain"""
+        return self.CHAINS[self.DEFAULT_CHAIN]['contracts'].get('usdt', '')
     
     @property
     def CHAIN_ID(self):
-        """Get Chain ID based on selected network"""
-        return self.BSC_TESTNET_CHAIN_ID if self.NETWORK == 'testnet' else self.BSC_MAINNET_CHAIN_ID
+        """Get Chain ID of the default chain"""
+        return self.CHAINS[self.DEFAULT_CHAIN]['chain_id']
     
     @property
     def EXPLORER_URL(self):
-        """Get block explorer URL based on selected network"""
-        return self.BSC_TESTNET_EXPLORER if self.NETWORK == 'testnet' else self.BSC_MAINNET_EXPLORER
+        """Get block explorer URL of the default chain"""
+        return self.CHAINS[self.DEFAULT_CHAIN]['explorer_url']
 
 
 class DevelopmentConfig(Config):
@@ -68,7 +147,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
-    NETWORK = 'testnet'
+    DEFAULT_CHAIN = 'bsc-testnet'
 
 
 # Configuration dictionary
@@ -0,0 +1,7 @@
+"""
+Shared pytest setup: importing app must not start jobs against MongoDB or the RPC node
+"""
+
+import os
+
+os.environ.setdefault('BACKGROUND_SERVICES', 'false')
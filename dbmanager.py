@@ -1,17 +1,71 @@
 import os
+import threading
+import time
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
-from pymongo import MongoClient, DESCENDING
+from bson.binary import Binary
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
 from pymongo.errors import ConnectionFailure, PyMongoError
 from dotenv import load_dotenv
 
+from addresses import Address
+from breaker import CircuitBreaker
+
 load_dotenv()
 
+# On-disk schema version. Version 2 stores addresses (20 bytes) and transaction
+# hashes (32 bytes) as BinData instead of 0x-prefixed hex strings, and keeps only
+# the non-extracted transaction fields under 'details'.
+SCHEMA_VERSION = 2
+
+# Bulk access actions and the activity type each one logs
+BULK_ACCESS_ACTIVITIES = {
+    'grant': 'access_granted',
+    'revoke': 'access_revoked',
+    'update': 'access_level_updated'
+}
+
+# Transaction payload keys that log_transaction stores as top-level fields
+TRANSACTION_FIELDS = ('hash', 'type', 'amount', 'token', 'from', 'to', 'block', 'status')
+
+
+def to_binary(value: Any) -> Any:
+    """Pack a 0x-prefixed hex string into BinData; anything else is returned as is"""
+    if not isinstance(value, str) or len(value) < 4 or value[:2].lower() != '0x':
+        return value
+    try:
+        return Binary(bytes.fromhex(value[2:]))
+    except ValueError:
+        return value
+
+
+def encode_address(wallet_address: str) -> Any:
+    """Compact on-disk form of a wallet address"""
+    if isinstance(wallet_address, Address):
+        # Validated at the request boundary: reuse its bytes instead of re-parsing the hex
+        return Binary(wallet_address.raw)
+    return to_binary(wallet_address.lower())
+
+
+def decode_address(value: Any) -> Any:
+    """Lowercase 0x-hex form of a stored address or hash, whichever schema it uses"""
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    return value
+
+
+def address_filter(wallet_address: str) -> Dict[str, Any]:
+    """Match a wallet stored in either the compact or the legacy hex-string form"""
+    return {'$in': [encode_address(wallet_address), wallet_address.lower()]}
+
+
 class DBManager:
     """Database Manager for MongoDB operations with graceful fallback"""
 
-    def __init__(self):
-        self.db_name = "web_wallet_access"
+    def __init__(self, db_name: str = "web_wallet_access", event_listeners: Optional[List[Any]] = None):
+        self.db_name = db_name
+        # pymongo monitoring listeners, e.g. the command counters in test_db_performance.py
+        self.event_listeners = event_listeners or []
         self.client = None
         self.db = None
         self.mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
@@ -19,23 +73,58 @@ class DBManager:
         self.max_connection_attempts = 3
         self.last_connection_attempt = None
         self._connection_status = False
-        self.connect()
+        self._connect_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warmup_thread = None
+        # Trips after repeated failed/slow pings or connection attempts; while open every
+        # operation answers in offline mode at once, and a half-open probe tries to recover
+        self.breaker = CircuitBreaker(
+            'mongodb',
+            failure_threshold=int(os.getenv('DB_BREAKER_FAILURES', str(self.max_connection_attempts))),
+            reset_timeout=float(os.getenv('DB_BREAKER_RESET', '30')),
+            slow_call_seconds=float(os.getenv('DB_SLOW_CALL_SECONDS', '1')),
+            failure_types=(ConnectionFailure,)
+        )
+        # The connection is deferred until first use or connect_in_background()
 
     def connect(self) -> bool:
         """Establish MongoDB connection with retry logic"""
+        with self._connect_lock:
+            # Another thread may have connected while we waited for the lock
+            if self._connection_status and self.client:
+                return True
+            try:
+                connected = self._connect()
+            finally:
+                self._ready.set()
+            if connected:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            return connected
+
+    def _connect(self) -> bool:
+        """Single connection attempt; the caller holds the connect lock"""
         self.connection_attempts += 1
         self.last_connection_attempt = datetime.now(timezone.utc)
+        if self.client is not None:
+            # A failed earlier attempt: release its monitor threads and sockets before retrying
+            self.client.close()
+            self.client = None
+            self.db = None
 
         try:
             self.client = MongoClient(
                 self.mongodb_uri,
                 serverSelectionTimeoutMS=3000,  # Faster timeout for web applications
                 connectTimeoutMS=3000,
-                socketTimeoutMS=3000
+                socketTimeoutMS=3000,
+                event_listeners=self.event_listeners
             )
             self.client.admin.command('ping')
             self.db = self.client[self.db_name]
             self._connection_status = True
+            self.ensure_indexes()
             print(f"[SUCCESS] Connected to MongoDB: {self.db_name}")
             return True
         except ConnectionFailure as e:
@@ -49,33 +138,78 @@ class DBManager:
             print("[INFO] Application will continue working without database storage")
             return False
 
+    def connect_in_background(self) -> None:
+        """Start the initial connection attempt on a daemon thread"""
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self.connect, name='mongodb-connect', daemon=True)
+            self._warmup_thread.start()
+
+    def is_ready(self) -> bool:
+        """Check if the initial connection attempt has finished, online or offline"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the initial connection attempt has finished"""
+        return self._ready.wait(timeout)
+
+    def ensure_indexes(self) -> None:
+        """Create the indexes used by the per-wallet lookups"""
+        try:
+            self.db.users.create_index([('wallet_address', ASCENDING)])
+            self.db.user_activities.create_index([('wallet_address', ASCENDING), ('timestamp', DESCENDING)])
+            self.db.transactions.create_index([('wallet_address', ASCENDING), ('timestamp', DESCENDING)])
+        except PyMongoError as e:
+            print(f"[WARNING] Could not create MongoDB indexes: {e}")
+
     def is_connected(self) -> bool:
         """Check if MongoDB is connected"""
+        if self.connection_attempts == 0 and self._warmup_thread is None:
+            # Nobody has tried yet: connect lazily on first use
+            self.connect()
         if not self._connection_status or not self.client:
             return False
+        if not self.breaker.allow():
+            # Open circuit: fail fast instead of waiting for server selection to time out
+            return False
+        started = time.monotonic()
         try:
             self.client.admin.command('ping')
-            return True
         except:
-            self._connection_status = False
+            # Keep the client: pymongo reconnects by itself once the server is back
+            self.breaker.record_failure()
             return False
+        self.breaker.record_success(time.monotonic() - started)
+        return True
 
     def get_connection_status(self) -> Dict[str, Any]:
         """Get detailed connection status"""
         return {
             'connected': self.is_connected(),
+            'ready': self.is_ready(),
             'connection_attempts': self.connection_attempts,
             'last_attempt': self.last_connection_attempt.isoformat() if self.last_connection_attempt else None,
             'database_name': self.db_name,
+            'circuit': self.breaker.get_status(),
             'uri': self.mongodb_uri.replace('mongodb://', 'mongodb://***:***@') if '@' in self.mongodb_uri else self.mongodb_uri
         }
 
     def _ensure_connection(self) -> bool:
         """Ensure database connection, reconnect if needed"""
-        if not self.is_connected() and self.connection_attempts < self.max_connection_attempts:
+        if self.is_connected():
+            return True
+        # Never connected: retry until the breaker opens, then once per half-open probe
+        if not self._connection_status and self.breaker.allow():
             print("[INFO] Attempting to reconnect to MongoDB...")
             return self.connect()
-        return self.is_connected()
+        return False
+
+    def _stale_result(self, key: Any) -> Optional[Dict[str, Any]]:
+        """Last successful result for key, marked stale, for answering while the database is unreachable"""
+        entry = self.breaker.last_good(key)
+        if entry is None:
+            return None
+        result, age = entry
+        return {**result, "stale": True, "stale_seconds": age, "offline_mode": True}
 
     def _safe_operation(self, fallback_data: Any = None, fallback_success: bool = False) -> Dict[str, Any]:
         """Safe operation wrapper for database calls"""
@@ -113,7 +247,8 @@ class DBManager:
 
         try:
             user_data = {
-                'wallet_address': wallet_address.lower(),
+                'wallet_address': encode_address(wallet_address),
+                'schema_version': SCHEMA_VERSION,
                 'created_at': datetime.now(timezone.utc),
                 'last_login': datetime.now(timezone.utc),
                 'login_count': 1,
@@ -130,7 +265,7 @@ class DBManager:
                 user_data.update(additional_data)
 
             # Check if user already exists
-            existing_user = self.db.users.find_one({'wallet_address': wallet_address.lower()})
+            existing_user = self.db.users.find_one({'wallet_address': address_filter(wallet_address)})
             if existing_user:
                 return self.update_user_login(wallet_address.lower())
 
@@ -158,12 +293,12 @@ class DBManager:
             }
 
             result = self.db.users.update_one(
-                {'wallet_address': wallet_address.lower()},
+                {'wallet_address': address_filter(wallet_address)},
                 update_data
             )
 
             if result.matched_count > 0:
-                user_data = self.db.users.find_one({'wallet_address': wallet_address.lower()})
+                user_data = self.db.users.find_one({'wallet_address': address_filter(wallet_address)})
                 return {"success": True, "user_data": user_data}
             else:
                 return {"success": False, "error": "User not found"}
@@ -175,8 +310,12 @@ class DBManager:
 
     def get_user(self, wallet_address: str) -> Dict[str, Any]:
         """Get user information by wallet address"""
+        cache_key = ('user', wallet_address.lower())
         safe_check = self._safe_operation()
         if safe_check.get('offline_mode'):
+            stale = self._stale_result(cache_key)
+            if stale:
+                return stale
             # Return mock user data for offline mode
             mock_user_data = {
                 'wallet_address': wallet_address.lower(),
@@ -194,12 +333,17 @@ class DBManager:
             return {"success": True, "user_data": mock_user_data, "offline_mode": True}
 
         try:
-            user_data = self.db.users.find_one({'wallet_address': wallet_address.lower()})
+            user_data = self.db.users.find_one({'wallet_address': address_filter(wallet_address)})
             if user_data:
-                return {"success": True, "user_data": user_data}
+                result = {"success": True, "user_data": user_data}
+                self.breaker.remember(cache_key, result)
+                return result
             else:
                 return {"success": False, "error": "User not found"}
 
+        except ConnectionFailure as e:
+            self.breaker.record_failure()
+            return self._stale_result(cache_key) or {"success": False, "error": f"Database error: {str(e)}"}
         except PyMongoError as e:
             return {"success": False, "error": f"Database error: {str(e)}"}
         except Exception as e:
@@ -213,16 +357,6 @@ class DBManager:
                          .skip(skip)
                          .limit(limit))
 
-            # Convert ObjectId to string for JSON serialization
-            for user in users:
-                user['_id'] = str(user['_id'])
-                if 'created_at' in user:
-                    user['created_at'] = user['created_at'].isoformat()
-                if 'last_login' in user:
-                    user['last_login'] = user['last_login'].isoformat()
-                if 'access_granted_at' in user.get('platform_access', {}):
-                    user['platform_access']['access_granted_at'] = user['platform_access']['access_granted_at'].isoformat()
-
             total_users = self.db.users.count_documents({})
 
             return {
@@ -238,6 +372,28 @@ class DBManager:
         except Exception as e:
             return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
+    def iter_users(self, limit: int = 100, skip: int = 0, batch_size: int = 500) -> Dict[str, Any]:
+        """Like get_all_users, but returns an open cursor instead of a list, for streaming"""
+        try:
+            cursor = (self.db.users.find({})
+                      .sort('created_at', DESCENDING)
+                      .skip(skip)
+                      .limit(limit)
+                      .batch_size(batch_size))
+
+            return {
+                "success": True,
+                "cursor": cursor,
+                "total_count": self.db.users.count_documents({}),
+                "page": skip // limit + 1,
+                "per_page": limit
+            }
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
     # User Activity Collection Operations
     def log_user_activity(self, wallet_address: str, activity_type: str, details: Optional[Dict] = None) -> Dict[str, Any]:
         """Log user activity"""
@@ -254,7 +410,8 @@ class DBManager:
 
         try:
             activity_data = {
-                'wallet_address': wallet_address.lower(),
+                'wallet_address': encode_address(wallet_address),
+                'schema_version': SCHEMA_VERSION,
                 'activity_type': activity_type,
                 'timestamp': datetime.now(timezone.utc),
                 'details': details or {}
@@ -272,15 +429,10 @@ class DBManager:
     def get_user_activities(self, wallet_address: str, limit: int = 50) -> Dict[str, Any]:
         """Get user activity history"""
         try:
-            activities = list(self.db.user_activities.find({'wallet_address': wallet_address.lower()})
+            activities = list(self.db.user_activities.find({'wallet_address': address_filter(wallet_address)})
                              .sort('timestamp', DESCENDING)
                              .limit(limit))
 
-            # Convert ObjectId to string and datetime to isoformat
-            for activity in activities:
-                activity['_id'] = str(activity['_id'])
-                activity['timestamp'] = activity['timestamp'].isoformat()
-
             return {"success": True, "activities": activities}
 
         except PyMongoError as e:
@@ -293,19 +445,24 @@ class DBManager:
         """Log transaction details"""
         try:
             tx_data = {
-                'wallet_address': wallet_address.lower(),
-                'transaction_hash': transaction_data.get('hash'),
+                'wallet_address': encode_address(wallet_address),
+                'schema_version': SCHEMA_VERSION,
+                'transaction_hash': to_binary(transaction_data.get('hash')),
                 'transaction_type': transaction_data.get('type', 'unknown'),
                 'amount': transaction_data.get('amount'),
                 'token': transaction_data.get('token', 'BNB'),
-                'from_address': transaction_data.get('from'),
-                'to_address': transaction_data.get('to'),
+                'from_address': to_binary(transaction_data.get('from')),
+                'to_address': to_binary(transaction_data.get('to')),
                 'block_number': transaction_data.get('block'),
                 'timestamp': datetime.now(timezone.utc),
-                'status': transaction_data.get('status', 'pending'),
-                'details': transaction_data
+                'status': transaction_data.get('status', 'pending')
             }
 
+            # Only keep what was not already extracted into top-level fields
+            extra_details = {key: value for key, value in transaction_data.items() if key not in TRANSACTION_FIELDS}
+            if extra_details:
+                tx_data['details'] = extra_details
+
             result = self.db.transactions.insert_one(tx_data)
             tx_data['_id'] = result.inserted_id
             return {"success": True, "transaction_data": tx_data}
@@ -318,15 +475,10 @@ class DBManager:
     def get_user_transactions(self, wallet_address: str, limit: int = 50) -> Dict[str, Any]:
         """Get user transaction history"""
         try:
-            transactions = list(self.db.transactions.find({'wallet_address': wallet_address.lower()})
+            transactions = list(self.db.transactions.find({'wallet_address': address_filter(wallet_address)})
                                 .sort('timestamp', DESCENDING)
                                 .limit(limit))
 
-            # Convert ObjectId to string and datetime to isoformat
-            for tx in transactions:
-                tx['_id'] = str(tx['_id'])
-                tx['timestamp'] = tx['timestamp'].isoformat()
-
             return {"success": True, "transactions": transactions}
 
         except PyMongoError as e:
@@ -347,7 +499,7 @@ class DBManager:
             }
 
             result = self.db.users.update_one(
-                {'wallet_address': wallet_address.lower()},
+                {'wallet_address': address_filter(wallet_address)},
                 update_data
             )
 
@@ -384,7 +536,7 @@ class DBManager:
             }
 
             result = self.db.users.update_one(
-                {'wallet_address': wallet_address.lower()},
+                {'wallet_address': address_filter(wallet_address)},
                 update_data
             )
 
@@ -407,11 +559,113 @@ class DBManager:
         except Exception as e:
             return {"success": False, "error": f"Unexpected error: {str(e)}"}
 
+    def bulk_update_access(self, action: str, wallet_addresses: List[str], access_level: Optional[str] = None,
+                           updated_by: Optional[str] = None, reason: Optional[str] = None) -> Dict[str, Any]:
+        """Grant, revoke or update access for many wallets with one bulk_write and one audit insert_many"""
+        if action not in BULK_ACCESS_ACTIVITIES:
+            return {"success": False, "error": f"Unknown access action: {action}"}
+        if action == 'update' and not access_level:
+            return {"success": False, "error": "access_level is required for update"}
+
+        safe_check = self._safe_operation()
+        if safe_check.get('offline_mode'):
+            return {"success": False, "error": safe_check['error'], "offline_mode": True}
+
+        try:
+            wallets = list(dict.fromkeys(address.lower() for address in wallet_addresses))
+            now = datetime.now(timezone.utc)
+
+            # One read tells which wallets exist, so results are per wallet rather than a matched count
+            stored = [value for wallet in wallets for value in address_filter(wallet)['$in']]
+            found = {
+                decode_address(user['wallet_address'])
+                for user in self.db.users.find({'wallet_address': {'$in': stored}}, {'wallet_address': 1, '_id': 0})
+            }
+            matched = [wallet for wallet in wallets if wallet in found]
+
+            if action == 'grant':
+                update_data = {
+                    '$set': {
+                        'platform_access.has_access': True,
+                        'platform_access.access_granted_at': now,
+                        'platform_access.updated_by': updated_by,
+                        'is_active': True
+                    },
+                    '$unset': {'platform_access.revoked_at': '', 'platform_access.revocation_reason': ''}
+                }
+                if access_level:
+                    update_data['$set']['access_level'] = access_level
+                details = {'access_level': access_level, 'updated_by': updated_by}
+            elif action == 'revoke':
+                update_data = {
+                    '$set': {
+                        'platform_access.has_access': False,
+                        'platform_access.revoked_at': now,
+                        'platform_access.revocation_reason': reason,
+                        'is_active': False
+                    }
+                }
+                details = {'reason': reason, 'updated_by': updated_by}
+            else:
+                update_data = {
+                    '$set': {
+                        'access_level': access_level,
+                        'platform_access.access_granted_at': now,
+                        'platform_access.updated_by': updated_by
+                    }
+                }
+                details = {'new_access_level': access_level, 'updated_by': updated_by}
+            details['timestamp'] = now.isoformat()
+            details['bulk'] = True
+
+            modified = 0
+            if matched:
+                result = self.db.users.bulk_write(
+                    [UpdateOne({'wallet_address': address_filter(wallet)}, update_data) for wallet in matched],
+                    ordered=False
+                )
+                modified = result.modified_count
+                self.db.user_activities.insert_many(
+                    [
+                        {
+                            'wallet_address': encode_address(wallet),
+                            'schema_version': SCHEMA_VERSION,
+                            'activity_type': BULK_ACCESS_ACTIVITIES[action],
+                            'timestamp': now,
+                            'details': dict(details)
+                        }
+                        for wallet in matched
+                    ],
+                    ordered=False
+                )
+
+            results = [
+                {'wallet_address': wallet, 'status': 'updated' if wallet in found else 'not_found'}
+                for wallet in wallets
+            ]
+            return {
+                "success": True,
+                "action": action,
+                "requested": len(wallets),
+                "matched": len(matched),
+                "modified": modified,
+                "not_found": len(wallets) - len(matched),
+                "results": results
+            }
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
     # Analytics Operations
     def get_platform_stats(self) -> Dict[str, Any]:
         """Get platform statistics"""
         safe_check = self._safe_operation()
         if safe_check.get('offline_mode'):
+            stale = self._stale_result('platform_stats')
+            if stale:
+                return stale
             # Return mock statistics for offline mode
             return {
                 "success": True,
@@ -446,7 +700,7 @@ class DBManager:
                 'timestamp': {'$gte': yesterday}
             })
 
-            return {
+            result = {
                 "success": True,
                 "stats": {
                     "total_users": total_users,
@@ -458,7 +712,12 @@ class DBManager:
                     "recent_logins_24h": recent_logins
                 }
             }
+            self.breaker.remember('platform_stats', result)
+            return result
 
+        except ConnectionFailure as e:
+            self.breaker.record_failure()
+            return self._stale_result('platform_stats') or {"success": False, "error": f"Database error: {str(e)}"}
         except PyMongoError as e:
             return {"success": False, "error": f"Database error: {str(e)}"}
         except Exception as e:
@@ -0,0 +1,347 @@
+"""
+Incremental ingester for ProgramContract / UniversalTokenContract events.
+
+Decodes UserJoined, AdminTransfer, MultiTokenTransfer and TokenApproval logs
+from a stored block checkpoint into MongoDB, so participant sets and per-user
+token approvals are served from indexed collections instead of the O(n)
+getAllParticipants() view functions.
+
+Collections:
+    contract_events       one document per decoded log (idempotent on tx hash + log index)
+    program_participants  one document per (contract, user)
+    token_approvals       one document per (contract, user, token)
+    ingest_checkpoints    last fully ingested block per contract set
+"""
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from chain import get_w3, to_checksum_address
+from dbmanager import DBManager, decode_address, encode_address, to_binary
+
+# Event signatures, as declared in contracts/*.sol
+EVENT_SIGNATURES = {
+    'UserJoined': 'UserJoined(address,uint256)',
+    'AdminTransfer': 'AdminTransfer(address,address,uint256,uint256)',
+    'MultiTokenTransfer': 'MultiTokenTransfer(address,address,address,uint256,uint256)',
+    'TokenApproval': 'TokenApproval(address,address,bool)',
+}
+
+# Indexed (topic) and non-indexed (data) argument names per event
+EVENT_LAYOUTS = {
+    'UserJoined': (('user',), ('timestamp',)),
+    'AdminTransfer': (('from', 'to'), ('amount', 'timestamp')),
+    'MultiTokenTransfer': (('token', 'from', 'to'), ('amount', 'timestamp')),
+    'TokenApproval': (('user', 'token'), ('approved',)),
+}
+
+ADDRESS_ARGS = ('user', 'from', 'to', 'token')
+
+
+def _topic_hash(signature: str) -> str:
+    from eth_utils import keccak
+    return '0x' + keccak(text=signature).hex()
+
+
+def _hex(value: Any) -> str:
+    """Normalise HexBytes/bytes/str log fields to 0x-prefixed lowercase hex"""
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    value = str(value).lower()
+    return value if value.startswith('0x') else '0x' + value
+
+
+def decode_log(log: Dict[str, Any], topic_names: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Decode one raw log into a flat dict, or None if it is not a known event"""
+    topics = [_hex(topic) for topic in log['topics']]
+    event_name = topic_names.get(topics[0]) if topics else None
+    if event_name is None:
+        return None
+
+    indexed_args, data_args = EVENT_LAYOUTS[event_name]
+    data = _hex(log['data'])[2:]
+    words = [int(data[i:i + 64], 16) for i in range(0, len(data), 64)]
+
+    decoded = {
+        'event': event_name,
+        'contract': _hex(log['address']),
+        'block_number': log['blockNumber'],
+        'transaction_hash': _hex(log['transactionHash']),
+        'log_index': log['logIndex'],
+    }
+    for name, topic in zip(indexed_args, topics[1:]):
+        decoded[name] = '0x' + topic[-40:]
+    for name, word in zip(data_args, words):
+        decoded[name] = bool(word) if name == 'approved' else word
+    return decoded
+
+
+class EventIngester:
+    """Follows contract logs from a checkpoint and maintains queryable state in MongoDB"""
+
+    def __init__(self, db_manager: DBManager, contracts: Dict[str, str],
+                 start_block: Optional[int] = None, chunk_size: int = 2000, max_chunks_per_run: int = 5):
+        # contracts maps a short name ('program', 'universal') to a contract address
+        self.db_manager = db_manager
+        self.contracts = {name: address.lower() for name, address in contracts.items() if address}
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.max_chunks_per_run = max_chunks_per_run
+        self.checkpoint_id = 'contract_events:' + ','.join(sorted(self.contracts.values()))
+        self.last_error = None
+        self._topic_names = None
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def topic_names(self) -> Dict[str, str]:
+        if self._topic_names is None:
+            self._topic_names = {_topic_hash(signature): name for name, signature in EVENT_SIGNATURES.items()}
+        return self._topic_names
+
+    def _ensure_indexes(self, db) -> None:
+        if self._indexes_ready:
+            return
+        db.contract_events.create_index([('contract', ASCENDING), ('event', ASCENDING), ('block_number', DESCENDING)])
+        db.program_participants.create_index([('contract', ASCENDING), ('user', ASCENDING)], unique=True)
+        db.program_participants.create_index([('contract', ASCENDING), ('joined_at', ASCENDING)])
+        db.token_approvals.create_index([('contract', ASCENDING), ('user', ASCENDING), ('token', ASCENDING)], unique=True)
+        self._indexes_ready = True
+
+    def _covers_start(self, checkpoint: Optional[Dict[str, Any]]) -> bool:
+        """Whether a checkpoint's ingestion began at or before the configured start block"""
+        if checkpoint is None or checkpoint.get('start_block') is None:
+            # Older checkpoints began at whatever the head was and miss earlier participants
+            return False
+        return self.start_block is None or checkpoint['start_block'] <= self.start_block
+
+    def get_checkpoint(self) -> Optional[int]:
+        """Last block whose events are fully ingested, or None until the index covers the start block"""
+        if not self.db_manager.is_connected():
+            return None
+        checkpoint = self.db_manager.db.ingest_checkpoints.find_one({'_id': self.checkpoint_id})
+        return checkpoint['last_block'] if self._covers_start(checkpoint) else None
+
+    def on_new_block(self, block_number: int) -> None:
+        """Head follower callback"""
+        self.ingest(block_number)
+
+    def ingest(self, head_block: Optional[int] = None) -> Dict[str, Any]:
+        """Ingest up to max_chunks_per_run chunks of logs after the checkpoint"""
+        if not self.contracts:
+            return {"success": False, "error": "No contract addresses configured"}
+        if not self.db_manager.is_connected():
+            return {"success": False, "error": "Database not available - running in offline mode", "offline_mode": True}
+
+        # Overlapping runs would only repeat work; skip instead of queueing
+        if not self._lock.acquire(blocking=False):
+            return {"success": True, "skipped": True}
+        try:
+            db = self.db_manager.db
+            self._ensure_indexes(db)
+            checkpoint = db.ingest_checkpoints.find_one({'_id': self.checkpoint_id})
+            if self._covers_start(checkpoint):
+                start_block, last_block = checkpoint['start_block'], checkpoint['last_block']
+            elif self.start_block is None:
+                # Starting at the head would index only users who join from now on
+                self.last_error = "EVENT_INGEST_START_BLOCK (the contracts' deployment block) is not set"
+                return {"success": False, "error": self.last_error}
+            else:
+                # No checkpoint, or one that began after the start block: backfill from the start
+                start_block, last_block = self.start_block, self.start_block - 1
+
+            w3 = get_w3()
+            if head_block is None:
+                head_block = w3.eth.block_number
+
+            ingested = 0
+            for _ in range(self.max_chunks_per_run):
+                if last_block >= head_block:
+                    break
+                from_block = last_block + 1
+                to_block = min(head_block, from_block + self.chunk_size - 1)
+                logs = w3.eth.get_logs({
+                    'fromBlock': from_block,
+                    'toBlock': to_block,
+                    'address': [to_checksum_address(address) for address in self.contracts.values()],
+                    'topics': [list(self.topic_names)]
+                })
+                events = [event for event in (decode_log(log, self.topic_names) for log in logs) if event]
+                self._store_events(db, events)
+
+                db.ingest_checkpoints.update_one(
+                    {'_id': self.checkpoint_id},
+                    {'$set': {'last_block': to_block, 'start_block': start_block,
+                              'updated_at': datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+                last_block = to_block
+                ingested += len(events)
+
+            self.last_error = None
+            return {"success": True, "events": ingested, "last_block": last_block, "head_block": head_block}
+
+        except PyMongoError as e:
+            self.last_error = f"Database error: {str(e)}"
+            return {"success": False, "error": self.last_error}
+        except Exception as e:
+            self.last_error = f"Unexpected error: {str(e)}"
+            return {"success": False, "error": self.last_error}
+        finally:
+            self._lock.release()
+
+    def rollback(self, fork_block: int) -> Dict[str, Any]:
+        """Drop rows from orphaned blocks (>= fork_block) and rewind the checkpoint to re-ingest them"""
+        if not self.db_manager.is_connected():
+            return {"success": False, "error": "Database not available - running in offline mode", "offline_mode": True}
+
+        # Wait for a running ingest so it cannot write orphaned rows after the rollback
+        with self._lock:
+            try:
+                db = self.db_manager.db
+                now = datetime.now(timezone.utc)
+                orphaned = {
+                    'contract': {'$in': [encode_address(address) for address in self.contracts.values()]},
+                    'block_number': {'$gte': fork_block}
+                }
+                affected_approvals = list(db.token_approvals.find(orphaned, {'contract': 1, 'user': 1, 'token': 1}))
+
+                events = db.contract_events.delete_many(orphaned).deleted_count
+                participants = db.program_participants.delete_many(orphaned).deleted_count
+                db.token_approvals.delete_many(orphaned)
+
+                # Approvals fall back to the latest surviving TokenApproval event, if any
+                for approval in affected_approvals:
+                    key = {'contract': approval['contract'], 'user': approval['user'], 'token': approval['token']}
+                    latest = db.contract_events.find_one(dict(key, event='TokenApproval'),
+                                                         sort=[('block_number', DESCENDING), ('log_index', DESCENDING)])
+                    if latest is not None:
+                        db.token_approvals.update_one(key, {'$set': {
+                            'approved': latest['approved'], 'block_number': latest['block_number'], 'updated_at': now
+                        }}, upsert=True)
+
+                db.ingest_checkpoints.update_one(
+                    {'_id': self.checkpoint_id, 'last_block': {'$gte': fork_block}},
+                    {'$set': {'last_block': fork_block - 1, 'updated_at': now}}
+                )
+                return {"success": True, "fork_block": fork_block, "events_removed": events,
+                        "participants_removed": participants, "approvals_rebuilt": len(affected_approvals)}
+
+            except PyMongoError as e:
+                return {"success": False, "error": f"Database error: {str(e)}"}
+            except Exception as e:
+                return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    def _store_events(self, db, events: List[Dict[str, Any]]) -> None:
+        """Write decoded events and the state they imply; all writes are idempotent upserts"""
+        if not events:
+            return
+        now = datetime.now(timezone.utc)
+        event_writes = []
+        participant_writes = []
+        approval_writes = []
+
+        for event in events:
+            document = {key: to_binary(value) if key in ADDRESS_ARGS + ('contract', 'transaction_hash') else value
+                        for key, value in event.items()}
+            # uint256 amounts do not fit in a BSON int64
+            if 'amount' in document:
+                document['amount'] = str(document['amount'])
+            event_id = f"{event['transaction_hash']}:{event['log_index']}"
+            event_writes.append(UpdateOne({'_id': event_id}, {'$setOnInsert': document}, upsert=True))
+
+            contract = encode_address(event['contract'])
+            if event['event'] == 'UserJoined':
+                participant_writes.append(UpdateOne(
+                    {'contract': contract, 'user': encode_address(event['user'])},
+                    {'$setOnInsert': {
+                        'joined_at': datetime.fromtimestamp(event['timestamp'], timezone.utc),
+                        'block_number': event['block_number'],
+                        'transaction_hash': to_binary(event['transaction_hash'])
+                    }},
+                    upsert=True
+                ))
+            elif event['event'] == 'TokenApproval':
+                approval_writes.append(UpdateOne(
+                    {'contract': contract, 'user': encode_address(event['user']), 'token': encode_address(event['token'])},
+                    {'$set': {'approved': event['approved'], 'block_number': event['block_number'], 'updated_at': now}},
+                    upsert=True
+                ))
+
+        db.contract_events.bulk_write(event_writes, ordered=False)
+        if participant_writes:
+            db.program_participants.bulk_write(participant_writes, ordered=False)
+        if approval_writes:
+            # Ordered so a later approval change for the same key wins
+            db.token_approvals.bulk_write(approval_writes, ordered=True)
+
+    def get_participants(self, contract_name: str, limit: int = 100, skip: int = 0) -> Dict[str, Any]:
+        """Participants of a contract in join order, served from the indexed collection"""
+        contract_address = self.contracts.get(contract_name)
+        if contract_address is None:
+            return {"success": False, "error": f"Unknown contract '{contract_name}'"}
+        if not self.db_manager.is_connected():
+            return {"success": False, "error": "Database not available - running in offline mode", "offline_mode": True}
+
+        try:
+            query = {'contract': encode_address(contract_address)}
+            participants = [
+                {
+                    'address': decode_address(document['user']),
+                    'joined_at': document.get('joined_at'),
+                    'block_number': document.get('block_number')
+                }
+                for document in self.db_manager.db.program_participants.find(query)
+                .sort('joined_at', ASCENDING)
+                .skip(skip)
+                .limit(limit)
+            ]
+            return {
+                "success": True,
+                "contract": contract_address,
+                "participants": participants,
+                "total_count": self.db_manager.db.program_participants.count_documents(query),
+                "synced_block": self.get_checkpoint(),
+                "page": skip // limit + 1 if limit else 1,
+                "per_page": limit
+            }
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+    def get_token_approvals(self, contract_name: str, wallet_address: str) -> Dict[str, Any]:
+        """Per-token approval state of one user on a contract"""
+        contract_address = self.contracts.get(contract_name)
+        if contract_address is None:
+            return {"success": False, "error": f"Unknown contract '{contract_name}'"}
+        if not self.db_manager.is_connected():
+            return {"success": False, "error": "Database not available - running in offline mode", "offline_mode": True}
+
+        try:
+            approvals = [
+                {
+                    'token': decode_address(document['token']),
+                    'approved': document.get('approved', False),
+                    'block_number': document.get('block_number')
+                }
+                for document in self.db_manager.db.token_approvals.find({
+                    'contract': encode_address(contract_address),
+                    'user': encode_address(wallet_address)
+                })
+            ]
+            return {"success": True, "approvals": approvals, "synced_block": self.get_checkpoint()}
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+
+
+def start_block_from_env() -> Optional[int]:
+    """Block to start from when no checkpoint exists (the contracts' deployment block)"""
+    value = os.getenv('EVENT_INGEST_START_BLOCK')
+    return int(value) if value else None
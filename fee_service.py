@@ -0,0 +1,139 @@
+"""
+Shared gas price and fee estimation.
+
+Gas price and fee history are sampled once per new block on the shared
+head follower and served to every client from memory, instead of each
+browser asking its wallet provider. Gas limits for the common contract
+calls are estimated from fixed call templates every few blocks, since
+they only change when the contracts or their state layout do.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from chain import encode_call, get_w3, to_checksum_address
+from head_follower import HeadFollower
+from singleflight import rpc_flight
+
+MAX_UINT256 = 2 ** 256 - 1
+
+# Sender used for estimates; only calls that need no prior state estimate cleanly from it
+DEFAULT_ESTIMATE_SENDER = '0x000000000000000000000000000000000000dEaD'
+
+
+def call_template(to: str, signature: str, args: Sequence[Any], default_gas: int) -> Dict[str, Any]:
+    """Describe a contract call to estimate, e.g. ('approve(address,uint256)', [spender, amount])"""
+    return {'to': to, 'signature': signature, 'args': list(args), 'default_gas': default_gas}
+
+
+class FeeService:
+    """Caches gas price, fee history and gas limit estimates per block"""
+
+    def __init__(self, follower: HeadFollower, templates: Dict[str, Dict[str, Any]],
+                 sender: str = DEFAULT_ESTIMATE_SENDER, history_blocks: int = 10,
+                 percentiles: Sequence[int] = (10, 50, 90), estimate_every: int = 20,
+                 gas_buffer: float = 1.2):
+        self.follower = follower
+        self.templates = templates
+        self.sender = sender
+        self.history_blocks = history_blocks
+        self.percentiles = list(percentiles)
+        self.estimate_every = estimate_every
+        # Headroom over eth_estimateGas for state that changes between estimate and send
+        self.gas_buffer = gas_buffer
+        self.fees: Dict[str, Any] = {}
+        self.estimates: Dict[str, Dict[str, Any]] = {}
+        self._estimated_at: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get_fees(self) -> Dict[str, Any]:
+        """Latest fee snapshot, sampling synchronously on a cold cache"""
+        self.follower.add_listener(self.on_new_block)
+        with self._lock:
+            fees = dict(self.fees)
+        if fees:
+            return fees
+        # Concurrent cold requests share a single sample
+        return rpc_flight.do(('fee_snapshot',), lambda: self.refresh(self.follower.latest_block))
+
+    def on_new_block(self, block_number: int) -> None:
+        """Head follower callback"""
+        self.refresh(block_number)
+
+    def refresh(self, block_number: Optional[int] = None) -> Dict[str, Any]:
+        """Sample gas price and fee history, re-estimating gas limits when due"""
+        w3 = get_w3()
+        if block_number is None:
+            block_number = rpc_flight.do(('block_number',), lambda: w3.eth.block_number)
+
+        gas_price = rpc_flight.do(('gas_price', block_number), lambda: w3.eth.gas_price)
+        fees: Dict[str, Any] = {
+            'block': block_number,
+            'gas_price': str(gas_price),
+            'gas_price_gwei': str(w3.from_wei(gas_price, 'gwei')),
+            'fee_history': None,
+            'updated_at': time.time()
+        }
+
+        try:
+            history = rpc_flight.do(
+                ('fee_history', block_number, self.history_blocks),
+                lambda: w3.eth.fee_history(self.history_blocks, block_number, self.percentiles)
+            )
+            fees['fee_history'] = self.summarize_history(history)
+        except Exception as e:
+            # Nodes without eth_feeHistory still get a legacy gas price
+            fees['fee_history_error'] = str(e)
+
+        if self._estimated_at is None or block_number - self._estimated_at >= self.estimate_every:
+            self.estimates = self.estimate_templates(block_number)
+            self._estimated_at = block_number
+        fees['gas_limits'] = self.estimates
+
+        with self._lock:
+            self.fees = fees
+        return dict(fees)
+
+    def summarize_history(self, history: Dict[str, Any]) -> Dict[str, Any]:
+        """Suggested EIP-1559 fees per percentile from an eth_feeHistory result"""
+        base_fees: List[int] = list(history['baseFeePerGas'])
+        rewards: List[List[int]] = [list(block_rewards) for block_rewards in history.get('reward') or []]
+        # The last entry is the base fee of the next, not yet mined, block
+        next_base_fee = base_fees[-1] if base_fees else 0
+
+        suggestions = {}
+        for index, percentile in enumerate(self.percentiles):
+            tips = sorted(block_rewards[index] for block_rewards in rewards if len(block_rewards) > index)
+            priority_fee = tips[len(tips) // 2] if tips else 0
+            suggestions[f'p{percentile}'] = {
+                'max_priority_fee_per_gas': str(priority_fee),
+                # Room for the base fee to double before the transaction is priced out
+                'max_fee_per_gas': str(2 * next_base_fee + priority_fee)
+            }
+
+        return {
+            'oldest_block': history['oldestBlock'],
+            'next_base_fee': str(next_base_fee),
+            'gas_used_ratio': list(history['gasUsedRatio']),
+            'suggestions': suggestions
+        }
+
+    def estimate_templates(self, block_number: int) -> Dict[str, Dict[str, Any]]:
+        """Run eth_estimateGas for each call template, falling back to its default"""
+        w3 = get_w3()
+        estimates = {}
+        for name, template in self.templates.items():
+            estimate = {'gas_limit': template['default_gas'], 'estimated': False, 'block': block_number}
+            try:
+                transaction = {
+                    'from': to_checksum_address(self.sender),
+                    'to': to_checksum_address(template['to']),
+                    'data': encode_call(template['signature'], template['args'])
+                }
+                gas = rpc_flight.do(('estimate_gas', name, block_number), lambda: w3.eth.estimate_gas(transaction))
+                estimate.update({'gas_limit': int(gas * self.gas_buffer), 'estimated': True, 'raw_estimate': gas})
+            except Exception as e:
+                # Calls that revert for an arbitrary sender (e.g. not joined yet) keep their default
+                estimate['error'] = str(e)
+            estimates[name] = estimate
+        return estimates
@@ -0,0 +1,186 @@
+"""
+Reorg-aware finality tracking for data read near the chain head.
+
+FinalityTracker follows the shared head follower and keeps the hash and
+parent hash of the most recent blocks. When a new block's parent hash does
+not match the stored hash of its predecessor, it walks back to the last
+block both chains agree on and notifies reorg listeners with the first
+orphaned block number, so caches and indexes drop only what came after
+the fork. Blocks at least `confirmations` deep are reported as confirmed.
+
+BlockCache keeps full blocks in memory for get_transactions. Confirmed
+blocks never change and are served from cache indefinitely; unconfirmed
+ones are served only while their hash still matches the tracked chain.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chain import get_w3
+from head_follower import HeadFollower
+from singleflight import rpc_flight
+
+
+def block_hash_hex(value: Any) -> str:
+    """Normalise a HexBytes/bytes/str block hash to lowercase 0x-hex"""
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    value = str(value).lower()
+    return value if value.startswith('0x') else '0x' + value
+
+
+class FinalityTracker:
+    """Recent block hashes, reorg detection and confirmation depth"""
+
+    def __init__(self, follower: HeadFollower, confirmations: int = 15, window: int = 64):
+        self.follower = follower
+        self.confirmations = confirmations
+        # How many recent headers are kept; reorgs deeper than this are not detected
+        self.window = window
+        self.head: Optional[int] = None
+        self.reorg_count = 0
+        self.last_reorg: Optional[Dict[str, int]] = None
+        self._headers: Dict[int, Tuple[str, str]] = OrderedDict()
+        self._reorg_listeners: List[Callable[[int], None]] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start following the chain head"""
+        self.follower.add_listener(self.on_new_block)
+
+    def add_reorg_listener(self, callback: Callable[[int], None]) -> None:
+        """Register a callback taking the first orphaned block number"""
+        if callback not in self._reorg_listeners:
+            self._reorg_listeners.append(callback)
+
+    def known_hash(self, block_number: int) -> Optional[str]:
+        """Hash of a recent block on the tracked chain, if it is inside the window"""
+        header = self._headers.get(block_number)
+        return header[0] if header else None
+
+    def get_confirmations(self, block_number: int, head: Optional[int] = None) -> int:
+        """Blocks on top of and including block_number (0 if the head is unknown)"""
+        head = head if head is not None else self.head
+        if head is None:
+            return 0
+        return max(0, head - block_number + 1)
+
+    def status(self, block_number: Optional[int], head: Optional[int] = None) -> str:
+        """'confirmed' once a block is deep enough not to be reorganised, else 'unconfirmed'"""
+        if block_number is None:
+            return 'unconfirmed'
+        return 'confirmed' if self.get_confirmations(block_number, head) >= self.confirmations else 'unconfirmed'
+
+    def get_status(self) -> Dict[str, Any]:
+        """Tracker state for metrics"""
+        return {
+            'head': self.head,
+            'confirmations': self.confirmations,
+            'tracked_blocks': len(self._headers),
+            'reorg_count': self.reorg_count,
+            'last_reorg': self.last_reorg
+        }
+
+    def on_new_block(self, block_number: int) -> None:
+        """Head follower callback: record new headers and detect reorgs"""
+        forks = []
+        with self._lock:
+            start = max(self._headers) + 1 if self._headers else block_number
+            for number in range(max(start, block_number - self.window + 1), block_number + 1):
+                try:
+                    fork = self._add_header(number)
+                except Exception as e:
+                    # Later headers depend on this one; the next head picks up from here
+                    print(f"[WARNING] Failed to read header {number}: {e}")
+                    break
+                if fork is not None:
+                    forks.append(fork)
+            self.head = block_number
+
+        for fork in forks:
+            self.reorg_count += 1
+            self.last_reorg = {'fork_block': fork, 'head': block_number}
+            print(f"[WARNING] Chain reorganisation detected from block {fork} (head {block_number})")
+            for callback in list(self._reorg_listeners):
+                try:
+                    callback(fork)
+                except Exception as e:
+                    print(f"[WARNING] Reorg listener {getattr(callback, '__name__', callback)} failed: {e}")
+
+    def _fetch_header(self, block_number: int) -> Tuple[str, str]:
+        w3 = get_w3()
+        block = rpc_flight.do(('block_header', block_number), lambda: w3.eth.get_block(block_number))
+        return block_hash_hex(block['hash']), block_hash_hex(block['parentHash'])
+
+    def _add_header(self, block_number: int) -> Optional[int]:
+        """Store one header; returns the first orphaned block if it reveals a reorg"""
+        block_hash, parent_hash = self._fetch_header(block_number)
+        fork = None
+        previous = self._headers.get(block_number - 1)
+        if previous is not None and previous[0] != parent_hash:
+            fork = self._find_fork(block_number - 1)
+
+        self._headers[block_number] = (block_hash, parent_hash)
+        while len(self._headers) > self.window:
+            self._headers.popitem(last=False)
+        return fork
+
+    def _find_fork(self, block_number: int) -> int:
+        """Replace stored headers back to the common ancestor; returns the first replaced block"""
+        # Fetch the whole walk before replacing anything, so a failed read leaves the
+        # mismatch in place and the reorg is detected again on the next head
+        replaced = {}
+        number = block_number
+        while number in self._headers:
+            canonical = self._fetch_header(number)
+            if canonical[0] == self._headers[number][0]:
+                break
+            replaced[number] = canonical
+            number -= 1
+        self._headers.update(replaced)
+        return number + 1
+
+
+class BlockCache:
+    """Full blocks by number, revalidated against the tracked chain near the head"""
+
+    def __init__(self, tracker: FinalityTracker, max_blocks: int = 512):
+        self.tracker = tracker
+        self.max_blocks = max_blocks
+        self.hits = 0
+        self.misses = 0
+        self._blocks: Dict[int, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_block(self, block_number: int, fetch: Callable[[], Any]) -> Any:
+        """Cached block if it is still on the canonical chain, otherwise fetch() it"""
+        with self._lock:
+            cached = self._blocks.get(block_number)
+        if cached is not None:
+            known = self.tracker.known_hash(block_number)
+            cached_hash = block_hash_hex(cached['hash'])
+            if known == cached_hash or (known is None and self.tracker.status(block_number) == 'confirmed'):
+                with self._lock:
+                    self.hits += 1
+                    if block_number in self._blocks:
+                        self._blocks.move_to_end(block_number)
+                return cached
+
+        block = fetch()
+        with self._lock:
+            self.misses += 1
+            self._blocks[block_number] = block
+            self._blocks.move_to_end(block_number)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def invalidate_from(self, block_number: int) -> None:
+        """Reorg listener: drop every cached block at or after the fork"""
+        with self._lock:
+            for number in [number for number in self._blocks if number >= block_number]:
+                del self._blocks[number]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'blocks': len(self._blocks), 'hits': self.hits, 'misses': self.misses}
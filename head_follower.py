@@ -0,0 +1,81 @@
+"""
+Shared chain-head follower.
+
+A single daemon thread polls the RPC node for the latest block number and
+notifies registered listeners once per new block, so every consumer of
+"something changed on chain" shares one polling loop.
+"""
+import atexit
+import threading
+from typing import Callable, List, Optional
+
+from chain import get_w3
+from singleflight import rpc_flight
+
+
+class HeadFollower:
+    """Polls the chain head and calls listeners once per new block"""
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.poll_interval = poll_interval
+        self.latest_block: Optional[int] = None
+        self._listeners: List[Callable[[int], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def add_listener(self, callback: Callable[[int], None]) -> None:
+        """Register a callback taking the new block number and start following"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+        self.start()
+
+    def remove_listener(self, callback: Callable[[int], None]) -> None:
+        """Unregister a callback"""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def start(self) -> None:
+        """Start the polling thread if it is not running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='head-follower', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the polling thread"""
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                block_number = rpc_flight.do(('block_number',), lambda: get_w3().eth.block_number)
+            except Exception as e:
+                # Report each distinct failure once rather than every poll
+                if not self._stop.is_set() and str(e) != self.last_error:
+                    print(f"[WARNING] Head follower could not read block number: {e}")
+                self.last_error = str(e)
+                continue
+            self.last_error = None
+
+            if self.latest_block is not None and block_number <= self.latest_block:
+                continue
+            self.latest_block = block_number
+
+            with self._lock:
+                listeners = list(self._listeners)
+            for callback in listeners:
+                try:
+                    callback(block_number)
+                except Exception as e:
+                    print(f"[WARNING] Head listener {getattr(callback, '__name__', callback)} failed: {e}")
+
+
+# Global head follower instance
+head_follower = HeadFollower()
+atexit.register(head_follower.stop)
@@ -0,0 +1,189 @@
+"""
+Filtered, cursor-paginated queries over user_activities and transactions.
+
+Admins query across wallets by equality filters (activity type, token,
+status, wallet) plus an optional time range, newest first. The combinations
+the admin views issue have their own compound index
+
+    (<equality fields>..., timestamp -1, _id -1)
+
+and any query for one wallet uses DBManager's (wallet_address, timestamp)
+index, filtering and sorting just that wallet's documents. Queries are
+hinted to their index, so no page scans the collection; a combination
+without an index is rejected instead.
+
+Pages are keyed by an opaque cursor holding the (timestamp, _id) of the
+last returned document, so deep pages cost the same as the first one,
+unlike skip/limit.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+from dbmanager import DBManager, address_filter
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Queryable collections: equality filters and the cross-wallet filter
+# combinations backed by an index (the admin feed and per-token views)
+QUERY_SPECS = {
+    'activities': {
+        'collection': 'user_activities',
+        'filters': ('wallet_address', 'activity_type'),
+        'indexed': [
+            (),
+        ],
+    },
+    'transactions': {
+        'collection': 'transactions',
+        'filters': ('wallet_address', 'transaction_type', 'token', 'status'),
+        'indexed': [
+            (),
+            ('token',),
+        ],
+    },
+}
+
+# Created by DBManager.ensure_indexes on both collections
+WALLET_INDEX = 'wallet_address_1_timestamp_-1'
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class UnsupportedQuery(ValueError):
+    """Filters, cursor or time range the query API cannot serve from an index"""
+
+
+def index_name(fields: Tuple[str, ...]) -> str:
+    return 'query_' + '_'.join(fields + ('timestamp',))
+
+
+def indexed_fields(spec: Dict[str, Any], filters: FrozenSet[str]) -> Optional[Tuple[str, ...]]:
+    """Index key order for a filter combination, None if it has no index"""
+    for fields in spec['indexed']:
+        if frozenset(fields) == filters:
+            return fields
+    return None
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past a returned document"""
+    timestamp = document['timestamp']
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    position = {'t': (timestamp - EPOCH) // timedelta(milliseconds=1), 'i': str(document['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """(timestamp, _id) of the last document of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+        return EPOCH + timedelta(milliseconds=int(position['t'])), ObjectId(position['i'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise UnsupportedQuery('Invalid cursor')
+
+
+class HistoryQuery:
+    """Index-backed filtered queries with cursor pagination"""
+
+    def __init__(self, db_manager: DBManager):
+        self.db_manager = db_manager
+        self._indexes_ready = set()
+
+    def _collection(self, kind: str):
+        spec = QUERY_SPECS[kind]
+        collection = self.db_manager.db[spec['collection']]
+        if kind not in self._indexes_ready:
+            for fields in spec['indexed']:
+                keys = [(field, ASCENDING) for field in fields] + [('timestamp', DESCENDING), ('_id', DESCENDING)]
+                collection.create_index(keys, name=index_name(fields))
+            self._indexes_ready.add(kind)
+        return collection
+
+    def build_filter(self, kind: str, filters: Dict[str, Any], since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, cursor: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+        """Mongo filter and the index it must use; raises UnsupportedQuery if no index covers it"""
+        spec = QUERY_SPECS.get(kind)
+        if spec is None:
+            raise UnsupportedQuery(f"Unknown collection: {kind}")
+        unknown = set(filters) - set(spec['filters'])
+        if unknown:
+            raise UnsupportedQuery(f"Unsupported filter: {', '.join(sorted(unknown))}")
+
+        if 'wallet_address' in filters:
+            hint = WALLET_INDEX
+        else:
+            fields = indexed_fields(spec, frozenset(filters))
+            if fields is None:
+                raise UnsupportedQuery(
+                    f"No index for filter combination ({', '.join(sorted(filters))}); supported: "
+                    + '; '.join('(' + ', '.join(combo) + ')' for combo in spec['indexed'])
+                    + '; or any filters together with wallet_address'
+                )
+            hint = index_name(fields)
+
+        clauses = [
+            {field: address_filter(value) if field == 'wallet_address' else value}
+            for field, value in filters.items()
+        ]
+        time_range = {}
+        if since is not None:
+            time_range['$gte'] = since
+        if until is not None:
+            time_range['$lt'] = until
+        if time_range:
+            clauses.append({'timestamp': time_range})
+        if cursor:
+            timestamp, last_id = decode_cursor(cursor)
+            clauses.append({'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': last_id}}
+            ]})
+
+        query = {'$and': clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+        return query, hint
+
+    def query(self, kind: str, filters: Optional[Dict[str, Any]] = None, since: Optional[datetime] = None,
+              until: Optional[datetime] = None, cursor: Optional[str] = None,
+              limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+        """One page of matching documents, newest first, with the cursor for the next page"""
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, '')}
+        limit = max(1, min(limit, MAX_LIMIT))
+        try:
+            query, hint = self.build_filter(kind, filters, since, until, cursor)
+        except UnsupportedQuery as e:
+            return {"success": False, "error": str(e), "unsupported": True}
+
+        if not self.db_manager.is_connected():
+            return {"success": True, "items": [], "next_cursor": None, "offline_mode": True}
+
+        try:
+            documents = list(
+                self._collection(kind).find(query)
+                .sort([('timestamp', DESCENDING), ('_id', DESCENDING)])
+                .hint(hint)
+                .limit(limit + 1)
+            )
+            has_more = len(documents) > limit
+            documents = documents[:limit]
+            return {
+                "success": True,
+                "items": documents,
+                "count": len(documents),
+                "next_cursor": encode_cursor(documents[-1]) if has_more else None,
+                "index": hint
+            }
+
+        except PyMongoError as e:
+            return {"success": False, "error": f"Database error: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
@@ -0,0 +1,56 @@
+"""
+Flask JSON provider that encodes MongoDB/BSON values natively.
+
+ObjectId, datetime, Decimal128, Decimal and BinData (compact-schema addresses
+and hashes, rendered as 0x-hex) are serialized by the encoder itself, so
+DBManager can hand raw documents to jsonify(). orjson is used when installed
+and the standard library encoder otherwise.
+"""
+import datetime
+import decimal
+import json
+from typing import Any
+
+from bson import Decimal128, ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def encode_bson_value(value: Any) -> Any:
+    """Convert a BSON/Python value the JSON encoder does not know about"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """JSON provider with native ObjectId/datetime/Decimal128/Decimal/BinData support"""
+
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=encode_bson_value, option=option).decode('utf-8')
+            except TypeError:
+                # orjson rejects ints wider than 64 bits (e.g. raw uint256 values)
+                pass
+        kwargs.setdefault('default', encode_bson_value)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
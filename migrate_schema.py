@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Online migration of the MongoDB collections to the compact schema
+
+Converts wallet addresses and transaction hashes from 0x-hex strings to
+BinData and strips the duplicated transaction payload from 'details'.
+Documents are walked in _id order and rewritten with one bulk_write per
+batch, so the application keeps serving traffic while this runs (DBManager
+reads both forms) and an interrupted run can simply be started again.
+
+Usage:
+    python migrate_schema.py [--batch-size 1000] [--pause 0.1] [--dry-run]
+"""
+
+import argparse
+import sys
+import time
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from dbmanager import DBManager, SCHEMA_VERSION, TRANSACTION_FIELDS, to_binary
+
+# Fields holding an address or hash, per collection
+BINARY_FIELDS = {
+    'users': ('wallet_address',),
+    'user_activities': ('wallet_address',),
+    'transactions': ('wallet_address', 'transaction_hash', 'from_address', 'to_address'),
+}
+
+
+def build_update(collection_name, document):
+    """Build the update that brings one document to the current schema"""
+    set_fields = {'schema_version': SCHEMA_VERSION}
+    update = {'$set': set_fields}
+
+    for field in BINARY_FIELDS[collection_name]:
+        if field in document:
+            converted = to_binary(document[field])
+            if converted is not document[field]:
+                set_fields[field] = converted
+
+    if collection_name == 'transactions' and isinstance(document.get('details'), dict):
+        extra_details = {key: value for key, value in document['details'].items()
+                         if key not in TRANSACTION_FIELDS}
+        if extra_details:
+            set_fields['details'] = extra_details
+        else:
+            update['$unset'] = {'details': ''}
+
+    return update
+
+
+def collection_size(db, collection_name):
+    """Data and index size in bytes, or None if the collection does not exist"""
+    try:
+        stats = db.command('collStats', collection_name)
+        return stats.get('size', 0), stats.get('totalIndexSize', 0)
+    except PyMongoError:
+        return None
+
+
+def migrate_collection(db, collection_name, batch_size, pause, dry_run):
+    """Convert one collection in _id-ordered batches; returns (scanned, converted)"""
+    collection = db[collection_name]
+    projection = ['schema_version', 'details', *BINARY_FIELDS[collection_name]]
+    last_id = None
+    scanned = 0
+    converted = 0
+
+    while True:
+        query = {} if last_id is None else {'_id': {'$gt': last_id}}
+        batch = list(collection.find(query, projection).sort('_id', ASCENDING).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+        scanned += len(batch)
+
+        requests = [UpdateOne({'_id': document['_id']}, build_update(collection_name, document))
+                    for document in batch if document.get('schema_version') != SCHEMA_VERSION]
+        if requests and not dry_run:
+            collection.bulk_write(requests, ordered=False)
+        converted += len(requests)
+
+        print(f"  {collection_name}: scanned {scanned}, converted {converted}", end='\r')
+        if pause:
+            time.sleep(pause)
+
+    print(f"  {collection_name}: scanned {scanned}, converted {converted}")
+    return scanned, converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate MongoDB collections to the compact schema')
+    parser.add_argument('--collections', nargs='+', choices=sorted(BINARY_FIELDS),
+                        default=list(BINARY_FIELDS), help='collections to migrate')
+    parser.add_argument('--batch-size', type=int, default=1000, help='documents per bulk_write')
+    parser.add_argument('--pause', type=float, default=0.0,
+                        help='seconds to sleep between batches to limit load on a live server')
+    parser.add_argument('--dry-run', action='store_true', help='count documents to convert without writing')
+    args = parser.parse_args()
+
+    db_manager = DBManager()
+    if not db_manager.is_connected():
+        print("❌ Cannot connect to database")
+        return 1
+
+    print(f"Migrating to schema version {SCHEMA_VERSION}{' (dry run)' if args.dry_run else ''}")
+    print("=" * 50)
+
+    for collection_name in args.collections:
+        before = collection_size(db_manager.db, collection_name)
+        migrate_collection(db_manager.db, collection_name, args.batch_size, args.pause, args.dry_run)
+        after = collection_size(db_manager.db, collection_name)
+        if before and after:
+            print(f"  data {before[0]} -> {after[0]} bytes, indexes {before[1]} -> {after[1]} bytes")
+
+    db_manager.close()
+    print("✅ Migration complete")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n⚠️  Migration interrupted; run it again to resume")
+        sys.exit(1)
@@ -0,0 +1,50 @@
+"""
+Batched read-only contract calls through Multicall3.
+
+Multicall3 is deployed at the same address on BSC mainnet, testnet and
+most EVM chains. Bundling N view calls into one eth_call turns N RPC round
+trips into one; each call may fail on its own without failing the batch.
+"""
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+from chain import encode_call, get_w3, to_checksum_address
+
+MULTICALL3_ADDRESS = os.getenv('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+
+# Calls bundled into a single eth_call; keeps each request well under node gas caps
+DEFAULT_BATCH_SIZE = 200
+
+
+def aggregate(calls: Sequence[Tuple[str, str]], block_identifier: Any = 'latest',
+              batch_size: int = DEFAULT_BATCH_SIZE, w3=None) -> List[Tuple[bool, bytes]]:
+    """Run (target, calldata hex) view calls in batches; returns (success, return data) per call"""
+    from eth_abi import decode
+
+    w3 = w3 or get_w3()
+    multicall_address = to_checksum_address(MULTICALL3_ADDRESS)
+    results: List[Tuple[bool, bytes]] = []
+    for start in range(0, len(calls), batch_size):
+        batch = [
+            (to_checksum_address(target), True, bytes.fromhex(calldata[2:]))
+            for target, calldata in calls[start:start + batch_size]
+        ]
+        raw = w3.eth.call({
+            'to': multicall_address,
+            'data': encode_call('aggregate3((address,bool,bytes)[])', [batch])
+        }, block_identifier)
+        (decoded,) = decode(['(bool,bytes)[]'], bytes(raw))
+        results.extend((bool(success), bytes(data)) for success, data in decoded)
+    return results
+
+
+def decode_result(types: Sequence[str], success: bool, data: bytes) -> Optional[Tuple[Any, ...]]:
+    """Decode one call's return data, or None if the call failed or returned garbage"""
+    from eth_abi import decode
+
+    if not success or not data:
+        return None
+    try:
+        return decode(list(types), data)
+    except Exception:
+        return None
@@ -0,0 +1,267 @@
+"""
+Token-bucket rate limiting for chain-backed API endpoints.
+
+Each limited request is charged against three buckets:
+    ip:<addr>       one token per request      (Config.API_RATE_LIMIT)
+    rpc-ip:<addr>   the endpoint's RPC cost    (Config.RPC_RATE_LIMIT)
+    rpc-wallet:<a>  the endpoint's RPC cost    (Config.WALLET_RPC_RATE_LIMIT)
+so a single client cannot burn through the RPC provider's quota, whatever
+mix of endpoints it calls. Buckets live in process memory, or in MongoDB
+when several workers must share them (RATE_LIMIT_BACKEND=mongodb).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from flask import Flask, jsonify, request
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from addresses import parse_address
+from config import Config
+from dbmanager import DBManager
+
+# Approximate RPC calls triggered per request, by Flask endpoint name: a flat
+# cost, or a function of the request's JSON body for endpoints whose work
+# scales with it (see RateLimiter.set_cost). Unlisted endpoints are not limited.
+ENDPOINT_COSTS = {
+    'check_connection': 1,
+    'get_balance': 3,            # get_balance + balanceOf + decimals
+    'check_allowance': 2,        # allowance + decimals
+    'stream_balances': 4,        # initial snapshot; later pushes are shared per block
+    'get_transactions': 102,     # block_number + 101 full blocks
+}
+
+Cost = Union[int, Callable[[Dict[str, Any]], int]]
+
+
+def batched_read_cost(wallets: int, tokens: int, batch_size: int, fixed: int = 0) -> int:
+    """RPC calls for reading wallets x tokens balances in Multicall3 batches, plus fixed reads"""
+    return fixed + math.ceil(max(0, wallets) * max(0, tokens) / batch_size)
+
+
+# Request fields that identify the wallet an endpoint works on
+WALLET_FIELDS = ('address', 'wallet_address', 'owner')
+
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate: str) -> Tuple[float, float]:
+    """Parse '100 per hour' into (capacity, refill tokens per second)"""
+    amount, _, unit = rate.strip().lower().split()
+    seconds = UNITS[unit.rstrip('s')]
+    capacity = float(amount)
+    return capacity, capacity / seconds
+
+
+class InMemoryBackend:
+    """Per-process token buckets.
+
+    A bucket idle long enough to refill completely is the same as no bucket,
+    so buckets are swept once they are full again, at most every
+    sweep_interval seconds. Beyond max_buckets the least recently used are
+    dropped, which only ever hands a client a fresh bucket.
+    """
+
+    def __init__(self, max_buckets: int = 100000, sweep_interval: float = 60.0):
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: Dict[str, Tuple[float, float, float]] = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, cost: float, capacity: float, rate: float) -> Tuple[bool, float]:
+        """Take cost tokens if available; returns (allowed, seconds until enough tokens)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def refund(self, key: str, cost: float, capacity: float) -> None:
+        """Give back tokens taken by a request that was denied by another bucket"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at, full_at = self._buckets[key]
+                # full_at is left as is: a later sweep is safe, an early one is not
+                self._buckets[key] = (min(capacity, tokens + cost), updated_at, full_at)
+
+    def bucket_count(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def _sweep(self, now: float) -> None:
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._last_sweep = now
+
+
+class MongoBackend:
+    """Token buckets shared by all workers through MongoDB.
+
+    Refill and consumption happen in a single atomic pipeline update, so
+    concurrent workers never double-spend a bucket. Idle buckets expire via
+    a TTL index. Falls back to a local bucket while MongoDB is unavailable.
+    """
+
+    def __init__(self, db_manager: DBManager, collection_name: str = 'rate_limits'):
+        self.db_manager = db_manager
+        self.collection_name = collection_name
+        self.fallback = InMemoryBackend()
+        self._db = None
+        self._cached_collection = None
+
+    def _collection(self):
+        # Runs on every limited request, so no is_connected() ping here: an
+        # unreachable server raises PyMongoError and the caller falls back,
+        # and the DBManager breaker skips MongoDB while it is known to be down
+        db = self.db_manager.db
+        if db is None or not self.db_manager.breaker.allow():
+            return None
+        if db is not self._db:
+            # First use, or DBManager reconnected with a new client
+            collection = db[self.collection_name]
+            collection.create_index('expires_at', expireAfterSeconds=0)
+            self._db, self._cached_collection = db, collection
+        return self._cached_collection
+
+    def consume(self, key: str, cost: float, capacity: float, rate: float) -> Tuple[bool, float]:
+        try:
+            collection = self._collection()
+            if collection is None:
+                return self.fallback.consume(key, cost, capacity, rate)
+
+            now = time.time()
+            refilled = {'$min': [capacity, {'$add': [
+                {'$ifNull': ['$tokens', capacity]},
+                {'$multiply': [{'$subtract': [now, {'$ifNull': ['$updated_at', now]}]}, rate]}
+            ]}]}
+            bucket = collection.find_one_and_update(
+                {'_id': key},
+                [
+                    {'$set': {'refilled': refilled}},
+                    {'$set': {
+                        'allowed': {'$gte': ['$refilled', cost]},
+                        'tokens': {'$cond': [{'$gte': ['$refilled', cost]},
+                                             {'$subtract': ['$refilled', cost]}, '$refilled']},
+                        'updated_at': now,
+                        # A bucket idle long enough to refill completely can be dropped
+                        'expires_at': datetime.now(timezone.utc) + timedelta(seconds=capacity / rate)
+                    }},
+                    {'$unset': 'refilled'}
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self.db_manager.breaker.record_success()
+            allowed = bucket['allowed']
+            return allowed, 0.0 if allowed else (cost - bucket['tokens']) / rate
+        except PyMongoError:
+            self.db_manager.breaker.record_failure()
+            return self.fallback.consume(key, cost, capacity, rate)
+
+    def refund(self, key: str, cost: float, capacity: float) -> None:
+        try:
+            collection = self._collection()
+            if collection is None:
+                self.fallback.refund(key, cost, capacity)
+                return
+            collection.update_one(
+                {'_id': key},
+                [{'$set': {'tokens': {'$min': [capacity, {'$add': ['$tokens', cost]}]}}}]
+            )
+            self.db_manager.breaker.record_success()
+        except PyMongoError:
+            self.db_manager.breaker.record_failure()
+            self.fallback.refund(key, cost, capacity)
+
+
+class RateLimiter:
+    """Applies weighted per-IP and per-wallet token buckets to Flask endpoints"""
+
+    def __init__(self, backend, endpoint_costs: Optional[Dict[str, Cost]] = None,
+                 request_rate: str = Config.API_RATE_LIMIT,
+                 rpc_rate: str = Config.RPC_RATE_LIMIT,
+                 wallet_rpc_rate: str = Config.WALLET_RPC_RATE_LIMIT):
+        self.backend = backend
+        self.endpoint_costs = dict(ENDPOINT_COSTS if endpoint_costs is None else endpoint_costs)
+        self.request_limit = parse_rate(request_rate)
+        self.rpc_limit = parse_rate(rpc_rate)
+        self.wallet_rpc_limit = parse_rate(wallet_rpc_rate)
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._before_request)
+
+    def set_cost(self, endpoint: str, cost: Cost) -> None:
+        """Limit an endpoint; a callable cost receives the request's JSON body (or {})"""
+        self.endpoint_costs[endpoint] = cost
+
+    def check(self, ip_address: str, cost: int, wallet_address: Optional[str] = None) -> Tuple[bool, float]:
+        """Charge one request of the given RPC cost; returns (allowed, retry_after seconds)"""
+        buckets: List[Tuple[str, float, Tuple[float, float]]] = [
+            (f'ip:{ip_address}', 1, self.request_limit),
+            (f'rpc-ip:{ip_address}', cost, self.rpc_limit),
+        ]
+        if wallet_address:
+            buckets.append((f'rpc-wallet:{wallet_address.lower()}', cost, self.wallet_rpc_limit))
+
+        if any(amount > capacity for _, amount, (capacity, _) in buckets):
+            # Misconfigured limit: this request could never be served
+            return False, math.inf
+
+        charged = []
+        for key, amount, (capacity, rate) in buckets:
+            allowed, retry_after = self.backend.consume(key, amount, capacity, rate)
+            if not allowed:
+                for charged_key, charged_amount, charged_capacity in charged:
+                    self.backend.refund(charged_key, charged_amount, charged_capacity)
+                return False, retry_after
+            charged.append((key, amount, capacity))
+        return True, 0.0
+
+    def _before_request(self):
+        cost = self.endpoint_costs.get(request.endpoint)
+        if cost is None:
+            return None
+        if callable(cost):
+            data = request.get_json(silent=True)
+            cost = cost(data if isinstance(data, dict) else {})
+
+        allowed, retry_after = self.check(request.remote_addr or 'unknown', cost, self._wallet_from_request())
+        if allowed:
+            return None
+
+        retry_seconds = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 3600
+        response = jsonify({
+            'success': False,
+            'error': 'Rate limit exceeded',
+            'retry_after': retry_seconds
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_seconds)
+        return response
+
+    @staticmethod
+    def _wallet_from_request() -> Optional[str]:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        for field in WALLET_FIELDS:
+            # Canonical form, so case variants share one bucket; junk values get none
+            address = parse_address(data.get(field) or request.args.get(field))
+            if address is not None:
+                return address
+        return None
@@ -0,0 +1,218 @@
+"""
+Process-wide HTTP session for JSON-RPC providers.
+
+Every Web3 HTTPProvider in the process shares one requests.Session. Its
+adapter keeps an explicitly sized pool of keep-alive connections per RPC
+host, so concurrent Flask threads reuse warm TCP/TLS connections instead of
+opening a new one per call. TCP keep-alive probes stop idle connections
+from being dropped silently by NATs and load balancers.
+
+web3's own HTTPProvider caches one session per thread and endpoint (and
+closes sessions evicted from a 100-entry cache), so each Flask worker thread
+would otherwise build a separate pool. provider() returns an HTTPProvider
+whose requests always go through the shared session instead.
+
+The pool does not block. A request that finds every pooled connection in
+use opens an overflow connection, and that connection is closed again on
+release. get_stats() reports overflows, discarded connections and the
+number of connections opened (one TCP and, for https, one TLS handshake
+each), so an undersized RPC_POOL_SIZE shows up in /api/metrics.
+
+The synchronous web3 provider is built on requests, which speaks HTTP/1.1
+only. Keep-alive reuse gives the handshake savings here; HTTP/2
+multiplexing would need an async provider.
+"""
+import socket
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from breaker import CircuitBreaker
+from config import Config
+
+KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+for _name, _value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 15), ('TCP_KEEPCNT', 4)):
+    if hasattr(socket, _name):
+        KEEPALIVE_OPTIONS.append((socket.IPPROTO_TCP, getattr(socket, _name), _value))
+
+
+HOST_COUNTERS = ('requests', 'connections_opened', 'overflows', 'discarded', 'in_use', 'peak_in_use')
+
+
+class PoolStats:
+    """Connection pool counters of one adapter, kept per pool (scheme, host and port).
+
+    pool_size bounds each host's pool separately, so in_use, peak_in_use and
+    overflows only mean something per host. snapshot() sums the counters,
+    except peak_in_use, which is the busiest host's peak.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, int]] = {}
+
+    def _host(self, host: str) -> Dict[str, int]:
+        counters = self._hosts.get(host)
+        if counters is None:
+            counters = self._hosts[host] = dict.fromkeys(HOST_COUNTERS, 0)
+        return counters
+
+    def checked_out(self, host: str, pool_size: int) -> None:
+        with self._lock:
+            counters = self._host(host)
+            counters['requests'] += 1
+            counters['in_use'] += 1
+            counters['peak_in_use'] = max(counters['peak_in_use'], counters['in_use'])
+            if counters['in_use'] > pool_size:
+                counters['overflows'] += 1
+
+    def checked_in(self, host: str, discarded: bool) -> None:
+        with self._lock:
+            counters = self._host(host)
+            counters['in_use'] = max(counters['in_use'] - 1, 0)
+            if discarded:
+                counters['discarded'] += 1
+
+    def opened(self, host: str) -> None:
+        with self._lock:
+            self._host(host)['connections_opened'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._hosts.items()}
+        totals = {name: sum(counters[name] for counters in hosts.values()) for name in HOST_COUNTERS}
+        totals['peak_in_use'] = max((counters['peak_in_use'] for counters in hosts.values()), default=0)
+        totals['hosts'] = hosts
+        return totals
+
+
+def _counting_pool(base: type, stats: PoolStats) -> type:
+    """Subclass of a urllib3 pool class that reports to stats under its own host"""
+
+    class CountingPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.stats_key = f'{self.scheme}://{self.host}:{self.port}'
+
+        def _new_conn(self):
+            stats.opened(self.stats_key)
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            stats.checked_out(self.stats_key, self.pool.maxsize if self.pool is not None else 0)
+            return conn
+
+        def _put_conn(self, conn):
+            stats.checked_in(self.stats_key, self.pool is None or self.pool.full())
+            super()._put_conn(conn)
+
+    CountingPool.__name__ = f'Counting{base.__name__}'
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive and pool instrumentation"""
+
+    def __init__(self, pool_hosts: int, pool_size: int, max_retries: int = 0):
+        self.stats = PoolStats()
+        self.pool_size = pool_size
+        super().__init__(pool_connections=pool_hosts, pool_maxsize=pool_size,
+                         max_retries=max_retries, pool_block=False)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options + KEEPALIVE_OPTIONS)
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def idle_connections(self) -> int:
+        """Connections parked in the pools, ready for reuse"""
+        pools = self.poolmanager.pools
+        idle = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None and pool.pool is not None:
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return idle
+
+
+def circuit_breaker_middleware(breaker: CircuitBreaker):
+    """web3 middleware that runs each RPC call through breaker"""
+    def middleware(make_request, w3):
+        def request(method, params):
+            return breaker.call(lambda: make_request(method, params))
+        return request
+    return middleware
+
+
+_provider_class = None
+
+
+def _session_provider_class() -> type:
+    """HTTPProvider subclass bound to an explicit session, built on first use to keep web3 lazy"""
+    global _provider_class
+    if _provider_class is None:
+        from web3 import HTTPProvider
+
+        class SessionHTTPProvider(HTTPProvider):
+            def __init__(self, endpoint_uri: str, session: requests.Session, request_kwargs: Dict[str, Any],
+                         breaker: Optional[CircuitBreaker] = None):
+                super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+                self.session = session
+                self.breaker = breaker
+                if breaker is not None:
+                    # Outside web3's http_retry_request middleware, so one logical call that
+                    # exhausts its retries counts as a single failure
+                    self.middlewares = (circuit_breaker_middleware(breaker),) + tuple(self.middlewares)
+
+            def make_request(self, method, params):
+                request_data = self.encode_rpc_request(method, params)
+                response = self.session.post(self.endpoint_uri, data=request_data, **self.get_request_kwargs())
+                response.raise_for_status()
+                return self.decode_rpc_response(response.content)
+
+        _provider_class = SessionHTTPProvider
+    return _provider_class
+
+
+class RPCSession:
+    """The shared requests.Session and request settings for RPC providers"""
+
+    def __init__(self, pool_hosts: int, pool_size: int, connect_timeout: float, read_timeout: float,
+                 max_retries: int = 0):
+        self.adapter = PooledAdapter(pool_hosts, pool_size, max_retries)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+
+    def provider(self, endpoint_uri: str, breaker: Optional[CircuitBreaker] = None):
+        """Web3 HTTPProvider for endpoint_uri that sends through the shared session (and breaker)"""
+        return _session_provider_class()(endpoint_uri, self.session, {'timeout': self.timeout}, breaker)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool size, usage and handshake counters, in total and per RPC host"""
+        stats = self.adapter.stats.snapshot()
+        pool_size = self.adapter.pool_size
+        stats['pool_size'] = pool_size
+        stats['idle'] = self.adapter.idle_connections()
+        # Each host has its own pool of pool_size, so saturation is the busiest host's
+        for host_stats in stats['hosts'].values():
+            host_stats['saturation'] = round(host_stats['peak_in_use'] / pool_size, 4) if pool_size else 0.0
+        stats['saturation'] = round(stats['peak_in_use'] / pool_size, 4) if pool_size else 0.0
+        stats['reuse_ratio'] = (round(1 - stats['connections_opened'] / stats['requests'], 4)
+                                if stats['requests'] else 0.0)
+        stats['connect_timeout'], stats['read_timeout'] = self.timeout
+        return stats
+
+
+# Global session shared by every chain's provider
+rpc_session = RPCSession(Config.RPC_POOL_HOSTS, Config.RPC_POOL_SIZE,
+                         Config.RPC_CONNECT_TIMEOUT, Config.RPC_READ_TIMEOUT, Config.RPC_MAX_RETRIES)
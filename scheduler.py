@@ -0,0 +1,189 @@
+"""
+In-process background job scheduler with MongoDB lease-based leader election.
+
+Singleton jobs (event ingestion, balance snapshots, ...) must run on exactly
+one replica. Each such job has a lease document in job_leases:
+
+    {_id: <job name>, owner: <instance id>, expires_at: <datetime>, ...}
+
+An instance runs a singleton job only while it holds an unexpired lease,
+renewing it every lease_ttl / 3 seconds. If the leader dies, another
+instance takes over within one renewal period of the lease expiring
+(lease_ttl, 15s by default); a clean shutdown releases leases immediately. Without MongoDB no
+lease can be taken, so singleton jobs pause rather than run on every
+replica. Local jobs run on every instance.
+"""
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from dbmanager import DBManager, db_manager
+
+# Job fields not shown in status output
+INTERNAL_FIELDS = ('func', 'next_run', 'lease_renewed_at', 'reported_error')
+
+
+def default_instance_id() -> str:
+    """host:pid:random, unique per process even across container restarts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Scheduler:
+    """Runs registered jobs on fixed intervals, singleton jobs only on the lease holder"""
+
+    def __init__(self, db_manager: DBManager, instance_id: Optional[str] = None,
+                 lease_ttl: float = 15.0, tick: float = 1.0, collection_name: str = 'job_leases'):
+        self.db_manager = db_manager
+        self.instance_id = instance_id or default_instance_id()
+        self.lease_ttl = lease_ttl
+        self.tick = tick
+        self.collection_name = collection_name
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name: str, func: Callable[[], Any], interval: float, singleton: bool = True,
+                 run_immediately: bool = False) -> None:
+        """Add a job; func returns a {"success": ...} dict like the DBManager methods"""
+        with self._lock:
+            self.jobs[name] = {
+                'name': name,
+                'func': func,
+                'interval': interval,
+                'singleton': singleton,
+                'next_run': time.monotonic() if run_immediately else time.monotonic() + interval,
+                'leader': not singleton,
+                'lease_renewed_at': 0.0,
+                'running': False,
+                'run_count': 0,
+                'last_started': None,
+                'last_finished': None,
+                'last_duration_ms': None,
+                'last_success': None,
+                'last_error': None,
+                'reported_error': None,
+            }
+
+    def start(self) -> None:
+        """Start the scheduler thread if it is not running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scheduling and hand held leases over to the other instances"""
+        self._stop.set()
+        for job in list(self.jobs.values()):
+            if job['singleton'] and job['leader']:
+                self._release(job['name'])
+
+    def is_leader(self, name: str) -> bool:
+        """Whether this instance currently runs the named job"""
+        job = self.jobs.get(name)
+        return job is not None and job['leader']
+
+    def get_status(self) -> Dict[str, Any]:
+        """Per-job leadership and last-run details for the status endpoint"""
+        with self._lock:
+            jobs = [
+                {key: value for key, value in job.items() if key not in INTERNAL_FIELDS}
+                for job in self.jobs.values()
+            ]
+        return {'instance_id': self.instance_id, 'lease_ttl': self.lease_ttl, 'jobs': jobs}
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self.jobs.values())
+            for job in jobs:
+                if job['singleton'] and now - job['lease_renewed_at'] >= self.lease_ttl / 3:
+                    self._update_leadership(job, now)
+                if job['leader'] and not job['running'] and now >= job['next_run']:
+                    job['running'] = True
+                    job['next_run'] = now + job['interval']
+                    # Run on its own thread so a long job never delays lease renewal
+                    threading.Thread(target=self._execute, args=(job,), name=f"job-{job['name']}",
+                                     daemon=True).start()
+            self._stop.wait(self.tick)
+
+    def _update_leadership(self, job: Dict[str, Any], now: float) -> None:
+        leader = self._acquire(job['name'])
+        if leader != job['leader']:
+            print(f"[INFO] {'Acquired' if leader else 'Lost'} leadership of job '{job['name']}' "
+                  f"({self.instance_id})")
+            if leader:
+                # A new leader runs straight away instead of waiting a full interval
+                job['next_run'] = now
+        job['leader'] = leader
+        # Followers re-check at the renewal cadence, so failover takes at most lease_ttl * 4/3
+        job['lease_renewed_at'] = now
+
+    def _acquire(self, name: str) -> bool:
+        """Take or renew the lease for a job; False if another live instance holds it"""
+        if not self.db_manager.is_connected():
+            return False
+        now = datetime.now(timezone.utc)
+        try:
+            lease = self.db_manager.db[self.collection_name].find_one_and_update(
+                {'_id': name, '$or': [{'owner': self.instance_id}, {'expires_at': {'$lt': now}}]},
+                {
+                    '$set': {'owner': self.instance_id, 'expires_at': now + timedelta(seconds=self.lease_ttl),
+                             'renewed_at': now},
+                    '$setOnInsert': {'created_at': now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return lease is not None and lease['owner'] == self.instance_id
+        except DuplicateKeyError:
+            # The lease exists and belongs to a live instance, so the upsert collided
+            return False
+        except PyMongoError as e:
+            print(f"[WARNING] Could not acquire lease for job '{name}': {e}")
+            return False
+
+    def _release(self, name: str) -> None:
+        try:
+            if self.db_manager.is_connected():
+                self.db_manager.db[self.collection_name].delete_one({'_id': name, 'owner': self.instance_id})
+        except PyMongoError:
+            pass
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        job['last_started'] = datetime.now(timezone.utc)
+        try:
+            result = job['func']()
+            success = not isinstance(result, dict) or result.get('success', True)
+            error = None if success else result.get('error')
+        except Exception as e:
+            success, error = False, f"Unexpected error: {str(e)}"
+
+        job['last_duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        job['last_finished'] = datetime.now(timezone.utc)
+        job['last_success'] = success
+        job['last_error'] = error
+        job['run_count'] += 1
+        job['running'] = False
+        # Report each distinct failure once rather than every run
+        if error and error != job['reported_error']:
+            print(f"[WARNING] Job '{job['name']}' failed: {error}")
+        job['reported_error'] = error
+
+
+# Global scheduler instance; leases are released on a clean shutdown
+scheduler = Scheduler(db_manager)
+atexit.register(scheduler.stop)
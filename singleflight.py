@@ -0,0 +1,73 @@
+"""
+Single-flight request coalescing for chain reads.
+
+Concurrent callers asking for the same key share one in-flight call: the
+first caller runs it, the rest wait and receive the same result (or the
+same exception). Nothing is cached once the call has finished.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates identical concurrent calls and counts how many were shared"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: Tuple, fn: Callable[[], Any]) -> Any:
+        """Run fn for key, or wait for the identical call already in flight.
+
+        The first element of key names the operation and is used to group metrics.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            stats = self._stats.setdefault(str(key[0]), {'requests': 0, 'executions': 0})
+            stats['requests'] += 1
+            if is_leader:
+                stats['executions'] += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation request/execution counts and coalescing ratio"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for stats in snapshot.values():
+            stats['coalesced'] = stats['requests'] - stats['executions']
+            stats['coalescing_ratio'] = round(stats['coalesced'] / stats['requests'], 4) if stats['requests'] else 0.0
+        return snapshot
+
+
+# Global single-flight group for RPC reads
+rpc_flight = SingleFlight()
@@ -56,6 +56,8 @@ const confirmTransferBtn = document.getElementById('confirmTransferBtn');
 const cancelTransferBtn = document.getElementById('cancelTransferBtn');
 const refreshHistoryBtn = document.getElementById('refreshHistoryBtn');
 const transferHistory = document.getElementById('transferHistory');
+const loadAnalyticsBtn = document.getElementById('loadAnalyticsBtn');
+const analyticsPanel = document.getElementById('analyticsPanel');
 
 let currentTransferFrom = null;
 let transferHistoryData = [];
@@ -73,6 +75,7 @@ function setupEventListeners() {
     confirmTransferBtn.addEventListener('click', executeTransfer);
     cancelTransferBtn.addEventListener('click', closeTransferModal);
     refreshHistoryBtn.addEventListener('click', loadTransferHistory);
+    loadAnalyticsBtn.addEventListener('click', loadAnalytics);
 }
 
 // Connect Admin Wallet
@@ -156,6 +159,27 @@ async function loadAllData() {
     await loadParticipants();
 }
 
+// Fetch participant addresses from the backend event index.
+// Returns null when the index is unavailable so callers can fall back to the contract view.
+async function fetchIndexedParticipants(contractName) {
+    try {
+        const addresses = [];
+        const limit = 1000;
+        for (let page = 1; ; page++) {
+            const response = await fetch(`/api/admin/participants?contract=${contractName}&limit=${limit}&page=${page}`);
+            const data = await response.json();
+            // synced_block stays null until the index has been backfilled from the deployment block
+            if (!data.success || data.synced_block == null) return null;
+
+            addresses.push(...data.participants.map(participant => participant.address));
+            if (addresses.length >= data.total_count || data.participants.length < limit) return addresses;
+        }
+    } catch (error) {
+        console.warn('Participant index unavailable, falling back to contract:', error);
+        return null;
+    }
+}
+
 // Load Participants
 async function loadParticipants() {
     if (!programContract) {
@@ -166,7 +190,8 @@ async function loadParticipants() {
     try {
         showLoading('Loading participants...');
 
-        const participantAddresses = await programContract.methods.getAllParticipants().call();
+        const participantAddresses = await fetchIndexedParticipants('program')
+            || await programContract.methods.getAllParticipants().call();
         participants = [];
         let totalUSDT = 0;
 
@@ -485,3 +510,78 @@ function updateTransferHistoryUI() {
     transferHistory.innerHTML = historyHTML;
 }
 
+// Load Wallet Analytics (computed server-side once per day)
+async function loadAnalytics() {
+    try {
+        const response = await fetch('/api/admin/analytics?days=30&weeks=8');
+        const data = await response.json();
+        if (!data.success) {
+            showToast('❌ Failed to load analytics: ' + data.error, 'error');
+            return;
+        }
+        if (data.offline_mode) {
+            analyticsPanel.innerHTML = '<p class="empty-state">Analytics need the database, which is offline.</p>';
+            return;
+        }
+        displayAnalytics(data);
+    } catch (error) {
+        console.error('Error loading analytics:', error);
+        showToast('❌ Failed to load analytics: ' + error.message, 'error');
+    }
+}
+
+function displayAnalytics(data) {
+    const cell = 'padding: 8px; text-align: center;';
+    const maxActive = Math.max(1, ...data.daily_active.map(row => row.active_wallets));
+    const weeks = data.retention.length;
+
+    analyticsPanel.innerHTML = `
+        <p style="color: var(--text-secondary); font-size: 13px;">
+            ${data.events} events from ${data.wallets} wallets, as of ${data.as_of}
+        </p>
+
+        <h3>Daily Active Wallets (30 days)</h3>
+        <div style="display: flex; align-items: flex-end; gap: 2px; height: 120px; margin-bottom: 20px;">
+            ${data.daily_active.map(row => `
+                <div title="${row.date}: ${row.active_wallets}"
+                     style="flex: 1; background: var(--primary-color); height: ${Math.max(2, 100 * row.active_wallets / maxActive)}%;"></div>
+            `).join('')}
+        </div>
+
+        <h3>Weekly Retention Cohorts</h3>
+        <div style="overflow-x: auto; margin-bottom: 20px;">
+            <table style="width: 100%; border-collapse: collapse;">
+                <thead>
+                    <tr>
+                        <th style="${cell}">Cohort</th>
+                        <th style="${cell}">Wallets</th>
+                        ${Array.from({ length: weeks }, (_, week) => `<th style="${cell}">W${week}</th>`).join('')}
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.retention.map(cohort => `
+                        <tr>
+                            <td style="${cell}">${cohort.cohort}</td>
+                            <td style="${cell}">${cohort.size}</td>
+                            ${Array.from({ length: weeks }, (_, week) => week < cohort.retention.length && cohort.size
+                                ? `<td style="${cell} background: rgba(79, 70, 229, ${cohort.retention[week]});">${(cohort.retention[week] * 100).toFixed(0)}%</td>`
+                                : `<td style="${cell}">-</td>`).join('')}
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+
+        <h3>Logins per Wallet (30 days)</h3>
+        <table style="width: 100%; border-collapse: collapse;">
+            <tbody>
+                ${data.login_frequency.map(bucket => `
+                    <tr>
+                        <td style="${cell} text-align: left;">${bucket.logins}</td>
+                        <td style="${cell} text-align: right;">${bucket.wallets}</td>
+                    </tr>
+                `).join('')}
+            </tbody>
+        </table>
+    `;
+}
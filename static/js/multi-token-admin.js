@@ -442,6 +442,27 @@ async function addCustomToken() {
     }
 }
 
+// Fetch participant addresses from the backend event index.
+// Returns null when the index is unavailable so callers can fall back to the contract view.
+async function fetchIndexedParticipants(contractName) {
+    try {
+        const addresses = [];
+        const limit = 1000;
+        for (let page = 1; ; page++) {
+            const response = await fetch(`/api/admin/participants?contract=${contractName}&limit=${limit}&page=${page}`);
+            const data = await response.json();
+            // synced_block stays null until the index has been backfilled from the deployment block
+            if (!data.success || data.synced_block == null) return null;
+
+            addresses.push(...data.participants.map(participant => participant.address));
+            if (addresses.length >= data.total_count || data.participants.length < limit) return addresses;
+        }
+    } catch (error) {
+        console.warn('Participant index unavailable, falling back to contract:', error);
+        return null;
+    }
+}
+
 // Load Participants
 async function loadParticipants() {
     if (!universalContract) {
@@ -452,7 +473,8 @@ async function loadParticipants() {
     try {
         showLoading('Loading participants...');
 
-        const participantAddresses = await universalContract.methods.getAllParticipants().call();
+        const participantAddresses = await fetchIndexedParticipants('universal')
+            || await universalContract.methods.getAllParticipants().call();
         participants = [];
 
         for (let address of participantAddresses) {
@@ -473,6 +495,8 @@ async function loadParticipants() {
             await updateParticipantBalances();
         }
 
+        await loadPortfolioValues();
+
         // Display participants table
         displayParticipants();
 
@@ -524,6 +548,30 @@ async function updateParticipantBalances() {
     }
 }
 
+// Load USD portfolio values for all participants in one backend call
+async function loadPortfolioValues() {
+    if (participants.length === 0) return;
+
+    try {
+        const response = await fetch('/api/admin/portfolio-values', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ wallet_addresses: participants.map(p => p.address) })
+        });
+        const data = await response.json();
+        if (!data.success) {
+            console.warn('Portfolio valuation unavailable:', data.error);
+            return;
+        }
+
+        const totals = {};
+        data.wallets.forEach(wallet => { totals[wallet.wallet_address] = wallet.total_usd; });
+        participants.forEach(p => { p.portfolioUsd = totals[p.address.toLowerCase()]; });
+    } catch (error) {
+        console.warn('Portfolio valuation unavailable:', error);
+    }
+}
+
 // Display Participants
 function displayParticipants() {
     if (participants.length === 0) {
@@ -542,6 +590,7 @@ function displayParticipants() {
                     <th>#</th>
                     <th>Wallet Address</th>
                     <th>Selected Token Balance</th>
+                    <th>Portfolio (USD)</th>
                     <th>Allowance</th>
                     <th>Status</th>
                     <th>Actions</th>
@@ -566,6 +615,9 @@ function displayParticipants() {
                             <td style="color: #10B981; font-weight: 600;">
                                 ${tokenSymbol ? tokenBalance.toFixed(4) + ' ' + tokenSymbol : 'Select token'}
                             </td>
+                            <td>
+                                ${p.portfolioUsd !== undefined ? '$' + p.portfolioUsd.toFixed(2) : '-'}
+                            </td>
                             <td>
                                 ${hasAllowance
                                     ? (tokenAllowance > 1000000 ? '∞ Unlimited' : tokenAllowance.toFixed(2) + ' ' + tokenSymbol)
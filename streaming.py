@@ -0,0 +1,176 @@
+"""
+Streamed, compressed JSON responses for large admin payloads.
+
+stream_json() writes a JSON object whose list field is filled while a
+MongoDB cursor is iterated, so memory stays flat however many documents a
+page holds. With ?format=ndjson (or Accept: application/x-ndjson) it writes
+one document per line instead. Output is buffered into ~64 KB chunks and
+compressed with the best encoding the client accepts: zstd or brotli when
+the zstandard/brotli packages are installed, gzip otherwise.
+
+init_compression() registers an after_request hook that compresses
+ordinary (non-streamed) JSON responses above a size threshold the same way.
+"""
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from flask import Flask, Response, request, stream_with_context
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+# Bodies smaller than this are not worth a compression pass
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_encodings() -> list:
+    """Encodings this process can produce, best first"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Best encoding accepted by the current request, None for identity"""
+    return request.accept_encodings.best_match(available_encodings())
+
+
+class Compressor:
+    """Incremental compressor with a common compress/finish interface"""
+
+    def __init__(self, encoding: Optional[str]):
+        self.encoding = encoding
+        if encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=5)
+        elif encoding == 'gzip':
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        else:
+            self._compressor = None
+
+    def compress(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            return data
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        if self._compressor is None:
+            return b''
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_bytes(data: bytes, encoding: Optional[str]) -> bytes:
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def wants_ndjson() -> bool:
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+def _chunks(parts: Iterable[str], encoding: Optional[str]) -> Iterator[bytes]:
+    """Buffer encoded parts into ~CHUNK_SIZE pieces and compress them on the way out"""
+    compressor = Compressor(encoding)
+    buffer = []
+    size = 0
+    for part in parts:
+        data = part.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            chunk = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    tail = compressor.compress(b''.join(buffer)) + compressor.finish()
+    if tail:
+        yield tail
+
+
+def stream_json(app: Flask, head: Dict[str, Any], key: str, items: Iterable[Any]) -> Response:
+    """Stream `head` plus a `key` list read lazily from `items`
+
+    If iterating `items` fails part way, the object is closed with
+    "complete": false and the error, since the status line has already been sent.
+    """
+    ndjson = wants_ndjson()
+    dumps = app.json.dumps
+
+    def parts() -> Iterator[str]:
+        if ndjson:
+            try:
+                for item in items:
+                    yield dumps(item) + '\n'
+            except Exception as e:
+                yield dumps({'complete': False, 'error': str(e)}) + '\n'
+            return
+
+        opening = dumps({**head, key: []})
+        # Reopen the serialized empty list so items can be written into it
+        yield opening[:opening.rindex('[') + 1]
+        error = None
+        try:
+            for index, item in enumerate(items):
+                yield (',' if index else '') + dumps(item)
+        except Exception as e:
+            error = str(e)
+        yield '],"complete":' + ('true}' if error is None else 'false,"error":' + dumps(error) + '}')
+
+    encoding = negotiate_encoding()
+    response = Response(stream_with_context(_chunks(parts(), encoding)),
+                        mimetype='application/x-ndjson' if ndjson else 'application/json')
+    if ndjson:
+        for name, value in head.items():
+            if isinstance(value, (int, str)) and not isinstance(value, bool):
+                response.headers[f"X-{name.replace('_', '-').title()}"] = str(value)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def init_compression(app: Flask, path_prefix: str = '/') -> None:
+    """Compress buffered JSON responses under path_prefix"""
+    def compress_hook(response: Response) -> Response:
+        if request.path.startswith(path_prefix):
+            return compress_response(response)
+        return response
+    app.after_request(compress_hook)
+
+
+def compress_response(response: Response) -> Response:
+    """Compress a buffered JSON body if the client accepts an encoding"""
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json' or response.status_code < 200 or response.status_code == 204):
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress_bytes(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
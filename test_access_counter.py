@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for coalesced platform-access counting
+
+The counter runs against an in-memory stand-in for DBManager, so nothing is
+written to a real database and no test waits on a server-selection timeout.
+"""
+
+from datetime import datetime, timezone
+
+from access_counter import AccessCounter, minute_bucket
+from dbmanager import encode_address
+
+WALLET = '0x1234567890123456789012345678901234567890'
+DETAILS = {'access_type': 'wallet_connect', 'user_agent': 'Test Browser', 'ip_address': '127.0.0.1',
+           'additional_data': {}}
+
+
+class StubCollection:
+    """Records bulk writes"""
+
+    def __init__(self):
+        self.writes = []
+
+    def create_index(self, keys, **kwargs):
+        return 'stub_index'
+
+    def bulk_write(self, operations, ordered=True):
+        self.writes.append(list(operations))
+
+
+class StubDBManager:
+    """The DBManager surface AccessCounter uses, backed by lists"""
+
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.activities = []
+        self.db = {'access_buckets': StubCollection()}
+
+    def is_connected(self):
+        return self.connected
+
+    def log_user_activity(self, wallet_address, activity_type, details=None):
+        self.activities.append((wallet_address, activity_type, details))
+        return {"success": True}
+
+
+def test_minute_bucket():
+    timestamp = datetime(2024, 1, 1, 12, 34, 56, 789000, tzinfo=timezone.utc)
+    assert minute_bucket(timestamp) == datetime(2024, 1, 1, 12, 34, tzinfo=timezone.utc)
+
+
+def test_repeated_accesses_are_counted_not_logged():
+    db = StubDBManager()
+    counter = AccessCounter(db)
+    results = [counter.record(WALLET, 'wallet_connect', dict(DETAILS)) for _ in range(50)]
+    assert [result['coalesced'] for result in results[:2]] == [False, True]
+
+    # A new client and a payload that cannot be merged are both logged raw
+    assert not counter.record(WALLET, 'wallet_connect', {**DETAILS, 'user_agent': 'Other'})['coalesced']
+    assert not counter.record(WALLET, 'wallet_connect', {**DETAILS, 'additional_data': {'ref': 'x'}})['coalesced']
+
+    stats = counter.get_stats()
+    assert (stats['events'], stats['raw'], stats['coalesced']) == (52, 3, 49)
+    assert len(db.activities) == 3
+    assert sum(bucket['count'] for bucket in counter._pending.values()) == 52
+    assert stats['pending_buckets'] <= 2
+
+
+def test_flush_writes_one_upsert_per_bucket():
+    db = StubDBManager()
+    counter = AccessCounter(db)
+    for _ in range(5):
+        counter.record(WALLET, 'wallet_connect', dict(DETAILS))
+    counter.record(WALLET, 'wallet_sign', dict(DETAILS))
+
+    result = counter.flush()
+    assert result['success']
+
+    [operations] = db.db['access_buckets'].writes
+    assert len(operations) == result['buckets']
+    counts = {}
+    for operation in operations:
+        assert operation._filter['wallet_address'] == encode_address(WALLET) and operation._upsert
+        access_type = operation._filter['access_type']
+        counts[access_type] = counts.get(access_type, 0) + operation._doc['$inc']['count']
+    assert counts == {'wallet_connect': 5, 'wallet_sign': 1}
+    assert counter.get_stats()['pending_buckets'] == 0
+    assert counter.flush() == {"success": True, "buckets": 0}
+
+
+def test_failed_flush_keeps_counts():
+    counter = AccessCounter(StubDBManager(connected=False))
+    counter.record(WALLET, 'wallet_connect', dict(DETAILS))
+    assert not counter.flush()['success']
+    counter.record(WALLET, 'wallet_connect', dict(DETAILS))
+    assert sum(bucket['count'] for bucket in counter._pending.values()) == 2
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for canonical, memoized wallet addresses
+"""
+
+import pytest
+from bson.binary import Binary
+
+from addresses import InvalidAddress, address_cache_stats, canonical_address, parse_address
+from dbmanager import address_filter, encode_address
+
+USDT = '0x55d398326f99059fF775485246999027B3197955'
+
+
+def test_forms_and_validation():
+    address = canonical_address(USDT)
+    assert address == USDT.lower() and address.checksum == USDT
+    assert address.raw == bytes.fromhex(USDT[2:]) and address.lower() is address
+    assert canonical_address(USDT.lower()) == canonical_address(USDT[2:].upper()) == address
+    assert canonical_address(address.raw) == address
+
+    wrong_checksum = USDT.replace('fF', 'Ff', 1)
+    for value in (wrong_checksum, '0x1234', 'not an address', 42, None, ''):
+        assert parse_address(value) is None
+    with pytest.raises(InvalidAddress):
+        canonical_address('0x' + 'g' * 40)
+
+
+def test_lookups_are_memoized():
+    value = '0x' + '12ab' * 10
+    before = address_cache_stats()
+    first = canonical_address(value)
+    assert canonical_address(value) is first
+    after = address_cache_stats()
+    assert after['misses'] == before['misses'] + 1 and after['hits'] == before['hits'] + 1
+
+
+def test_db_encoding_matches_plain_strings():
+    address = canonical_address(USDT)
+    assert encode_address(address) == encode_address(USDT) == Binary(address.raw)
+    assert address_filter(address) == address_filter(USDT)
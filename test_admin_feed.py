@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the change-stream admin feed
+
+Needs a local single-node replica set, e.g.:
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval "rs.initiate()"
+Point MONGODB_REPLSET_URI at it if it is not on localhost:27017. The tests
+are skipped when no replica set is reachable.
+"""
+
+import os
+import queue
+import time
+
+import pytest
+
+from admin_feed import AdminFeed
+from dbmanager import DBManager, address_filter
+
+REPLSET_URI = os.getenv('MONGODB_REPLSET_URI', 'mongodb://localhost:27017/?directConnection=true')
+TEST_WALLET = '0x00000000000000000000000000000000000fee01'
+
+
+@pytest.fixture
+def replset_db(monkeypatch):
+    monkeypatch.setenv('MONGODB_URI', REPLSET_URI)
+    db = DBManager()
+    if not db.is_connected():
+        pytest.skip('MongoDB is not available')
+    if 'setName' not in db.client.admin.command('hello'):
+        db.close()
+        pytest.skip('MongoDB is not running as a replica set')
+
+    yield db
+
+    db.db.users.delete_many({'wallet_address': address_filter(TEST_WALLET)})
+    db.db.user_activities.delete_many({'wallet_address': address_filter(TEST_WALLET)})
+    db.db.transactions.delete_many({'wallet_address': address_filter(TEST_WALLET)})
+    db.close()
+
+
+def wait_for(subscriber, predicate, timeout=10.0):
+    """Return the first event matching predicate, failing after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            event = subscriber.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        if predicate(event):
+            return event
+    pytest.fail('Expected admin feed event was not received')
+
+
+def test_feed_pushes_logins_and_counts_them(replset_db):
+    feed = AdminFeed(replset_db)
+    subscriber = feed.subscribe()
+    try:
+        wait_for(subscriber, lambda event: event.get('mode') == 'change_stream')
+        before = feed.get_stats().get('recent_logins_24h', 0)
+
+        replset_db.log_user_activity(TEST_WALLET, 'login', {'user_agent': 'Test Script'})
+
+        event = wait_for(subscriber, lambda event: event.get('type') == 'login')
+        assert event['activity_type'] == 'login'
+        assert event['stats']['recent_logins_24h'] == before + 1
+        assert feed.is_live()
+    finally:
+        feed.stop()
+        feed.unsubscribe(subscriber)
+
+
+def test_feed_pushes_transactions(replset_db):
+    feed = AdminFeed(replset_db)
+    subscriber = feed.subscribe()
+    try:
+        wait_for(subscriber, lambda event: event.get('mode') == 'change_stream')
+        before = feed.get_stats().get('total_transactions', 0)
+
+        replset_db.log_transaction(TEST_WALLET, {'hash': '0x' + 'ab' * 32, 'type': 'transfer', 'token': 'USDT'})
+
+        event = wait_for(subscriber, lambda event: event.get('type') == 'transaction')
+        assert event['transaction_type'] == 'transfer'
+        assert event['stats']['total_transactions'] == before + 1
+    finally:
+        feed.stop()
+        feed.unsubscribe(subscriber)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorised retention and activity reports
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from analytics import ActivityAnalytics, day_number, week_number
+
+# Monday 2024-01-01
+MONDAY = day_number(datetime(2024, 1, 1))
+
+
+def make_snapshot(events, created, today, kinds=('login', 'platform_access')):
+    """events: (wallet, day, kind) tuples; created: signup day per wallet"""
+    wallet, days, kind = zip(*events)
+    return {
+        'day': today,
+        'wallet': np.array(wallet, dtype=np.int32),
+        'days': np.array(days, dtype=np.int32),
+        'kind': np.array(kind, dtype=np.int8),
+        'created': np.array(created, dtype=np.int32),
+        'kind_codes': {name: code for code, name in enumerate(kinds)},
+        'wallet_count': len(created),
+    }
+
+
+def test_week_number_starts_on_monday():
+    assert week_number(MONDAY) == week_number(MONDAY + 6) == week_number(MONDAY - 1) + 1
+
+
+def test_daily_active_counts_each_wallet_once_per_day():
+    today = MONDAY + 2
+    snapshot = make_snapshot(
+        [(0, today, 0), (0, today, 1), (1, today, 1), (0, today - 1, 0), (2, today - 5, 0)],
+        created=[MONDAY, MONDAY, MONDAY - 7], today=today)
+    report = ActivityAnalytics.daily_active(snapshot, 3)
+    assert [row['active_wallets'] for row in report] == [0, 1, 2]
+    assert report[-1]['date'] == '2024-01-03'
+
+
+def test_retention_matrix():
+    today = MONDAY + 14  # third week
+    events = [
+        # Cohort of week 1: wallets 0 and 1; wallet 0 returns in weeks 2 and 3, wallet 1 never returns
+        (0, MONDAY, 0), (0, MONDAY + 1, 0), (0, MONDAY + 8, 1), (0, MONDAY + 14, 0),
+        (1, MONDAY + 2, 0),
+        # Cohort of week 2: wallet 2, active in both of its weeks
+        (2, MONDAY + 9, 0), (2, MONDAY + 14, 1),
+    ]
+    snapshot = make_snapshot(events, created=[MONDAY, MONDAY + 2, MONDAY + 9], today=today)
+    cohorts = ActivityAnalytics.retention(snapshot, 3)
+
+    assert [cohort['cohort'] for cohort in cohorts] == ['2024-01-01', '2024-01-08', '2024-01-15']
+    assert [cohort['size'] for cohort in cohorts] == [2, 1, 0]
+    assert cohorts[0]['retention'] == [1.0, 0.5, 0.5]
+    assert cohorts[1]['retention'] == [1.0, 1.0]
+    assert cohorts[2]['retention'] == [0.0]
+
+
+def test_login_frequency_buckets():
+    today = MONDAY + 10
+    events = [(0, today, 0)] * 4 + [(1, today, 0)] + [(2, today, 0)] * 25 + [(3, today, 1)]
+    snapshot = make_snapshot(events, created=[MONDAY] * 4, today=today)
+    buckets = {row['logins']: row['wallets'] for row in ActivityAnalytics.login_frequency(snapshot, 30)}
+    assert buckets == {'1': 1, '2': 0, '3-5': 1, '6-10': 0, '11-20': 0, '21+': 1}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for stale fallbacks in the chain-reading routes
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+WALLET = '0x1234567890123456789012345678901234567890'
+OTHER = '0x' + 'ab' * 20
+
+
+class FakeNode:
+    """Four blocks with one transaction each; selected blocks can be made to fail"""
+
+    def __init__(self):
+        self.failing_blocks = set()
+        self.down = False
+
+    def handle(self, method, params):
+        if method == 'eth_blockNumber':
+            return {'result': '0x3'}
+        if method == 'eth_getBlockByNumber':
+            number = int(params[0], 16)
+            if number in self.failing_blocks:
+                return {'error': {'code': -32000, 'message': 'header not found'}}
+            return {'result': {
+                'number': hex(number),
+                'hash': '0x' + f'{number:064x}',
+                'transactions': [{
+                    'hash': '0x' + f'{number + 100:064x}',
+                    'from': WALLET,
+                    'to': OTHER,
+                    'value': hex(10 ** 18 * (number + 1)),
+                    'blockNumber': hex(number),
+                }],
+            }}
+        return {'result': None}
+
+
+@pytest.fixture
+def fake_node():
+    node = FakeNode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            if node.down:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'],
+                               **node.handle(request['method'], request['params'])}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    node.url = f'http://127.0.0.1:{server.server_port}'
+    yield node
+    server.shutdown()
+
+
+@pytest.fixture
+def client(fake_node, monkeypatch):
+    import app as app_module
+    from chain import ChainClient
+
+    chain = ChainClient('test-chain', {'chain_id': 31337, 'name': 'Test', 'rpc_url': fake_node.url})
+    monkeypatch.setattr(app_module, 'request_chain', lambda data=None: chain)
+    return app_module.app.test_client()
+
+
+def test_partial_scan_is_not_stored_as_last_known_good(client, fake_node):
+    response = client.post('/api/get-transactions', json={'address': WALLET})
+    assert response.status_code == 200 and not response.json['stale']
+    assert [tx['block'] for tx in response.json['transactions']] == [0, 1, 2, 3]
+
+    assert 'partial' not in response.json
+
+    # One block fails: the rest is returned, marked partial, and the full result stays cached
+    fake_node.failing_blocks = {2}
+    response = client.post('/api/get-transactions', json={'address': WALLET})
+    assert response.status_code == 200 and not response.json['stale']
+    assert response.json['partial'] and response.json['failed_blocks'] == [2]
+    assert [tx['block'] for tx in response.json['transactions']] == [0, 1, 3]
+
+    fake_node.down = True
+    response = client.post('/api/get-transactions', json={'address': WALLET})
+    assert response.status_code == 200 and response.json['stale']
+    assert [tx['block'] for tx in response.json['transactions']] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('tokens', ['USDT', {'USDT': 1}, [['USDT']]])
+def test_portfolio_values_rejects_malformed_token_lists(client, tokens):
+    response = client.post('/api/admin/portfolio-values', json={'wallet_addresses': [WALLET], 'tokens': tokens})
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'error': 'tokens must be a list of token keys'}
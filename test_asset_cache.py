@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the hashed asset build, precompressed asset serving and ETag handling
+"""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+import asset_cache as asset_cache_module
+import build_assets
+from asset_cache import AssetCache
+
+APP_JS = b'console.log("wallet");\n' * 50
+STYLE_CSS = b'body { margin: 0; }\n' * 50
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    (static / 'css').mkdir()
+    (static / 'js' / 'app.js').write_bytes(APP_JS)
+    (static / 'css' / 'style.css').write_bytes(STYLE_CSS)
+    (static / 'img').mkdir()
+    (static / 'img' / 'logo.svg').write_bytes(b'<svg/>')
+
+    dist = static / 'dist'
+    for module in (asset_cache_module, build_assets):
+        monkeypatch.setattr(module, 'STATIC_DIR', str(static))
+        monkeypatch.setattr(module, 'DIST_DIR', str(dist))
+        monkeypatch.setattr(module, 'MANIFEST_PATH', str(dist / 'manifest.json'))
+    return static
+
+
+@pytest.fixture
+def app(static_dir):
+    build_assets.build()
+    app = Flask(__name__, static_folder=str(static_dir))
+    cache = AssetCache()
+    cache.init_app(app)
+    app.asset_cache = cache
+    return app
+
+
+def test_build_writes_hashed_files_and_manifest(static_dir):
+    manifest = build_assets.build()
+
+    assert sorted(manifest) == ['css/style.css', 'js/app.js']
+    assert manifest['js/app.js'] == build_assets.hashed_name('js/app.js', APP_JS)
+    assert manifest['js/app.js'].startswith('js/app.') and manifest['js/app.js'].endswith('.js')
+    assert json.loads((static_dir / 'dist' / 'manifest.json').read_text()) == manifest
+
+    target = static_dir / 'dist' / manifest['js/app.js']
+    assert target.read_bytes() == APP_JS
+    assert gzip.decompress((static_dir / 'dist' / (manifest['js/app.js'] + '.gz')).read_bytes()) == APP_JS
+    assert (static_dir / 'dist' / (manifest['js/app.js'] + '.br')).exists() == (build_assets.brotli is not None)
+
+
+def test_build_is_reproducible(static_dir):
+    first = build_assets.build()
+    gz_path = static_dir / 'dist' / (first['css/style.css'] + '.gz')
+    gz_bytes = gz_path.read_bytes()
+
+    assert build_assets.build() == first
+    assert gz_path.read_bytes() == gz_bytes
+
+    # Changed content gets a new name, and the old build is removed
+    (static_dir / 'css' / 'style.css').write_bytes(STYLE_CSS + b'p { color: red; }\n')
+    rebuilt = build_assets.build()
+    assert rebuilt['css/style.css'] != first['css/style.css']
+    assert not (static_dir / 'dist' / first['css/style.css']).exists()
+
+
+def test_asset_url_prefers_the_hashed_build(app):
+    manifest = app.asset_cache.manifest
+    with app.test_request_context():
+        assert app.asset_cache.asset_url('js/app.js') == f"/assets/{manifest['js/app.js']}"
+        assert app.asset_cache.asset_url('img/logo.svg') == '/static/img/logo.svg'
+
+
+def test_gzip_variant_is_served_when_accepted(app):
+    hashed = app.asset_cache.manifest['js/app.js']
+    response = app.test_client().get(f'/assets/{hashed}', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype in ('application/javascript', 'text/javascript')
+    assert gzip.decompress(response.get_data()) == APP_JS
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.cache_control.immutable and response.cache_control.public
+    assert response.cache_control.max_age == asset_cache_module.ONE_YEAR
+
+
+def test_brotli_is_preferred_and_identity_is_the_fallback(app, static_dir):
+    hashed = app.asset_cache.manifest['css/style.css']
+    (static_dir / 'dist' / (hashed + '.br')).write_bytes(b'brotli-bytes')
+    client = app.test_client()
+
+    response = client.get(f'/assets/{hashed}', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br' and response.get_data() == b'brotli-bytes'
+    assert response.mimetype == 'text/css'
+
+    response = client.get(f'/assets/{hashed}', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers and response.get_data() == STYLE_CSS
+
+
+def test_constant_json_revalidates_with_etag(app):
+    builds = []
+
+    def build():
+        builds.append(1)
+        return jsonify({'success': True, 'chain_id': 56})
+
+    @app.route('/api/network-info')
+    def network_info():
+        return app.asset_cache.constant_json('network-info', build, max_age=60)
+
+    client = app.test_client()
+    response = client.get('/api/network-info')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and response.json == {'success': True, 'chain_id': 56}
+    assert response.cache_control.public and response.cache_control.max_age == 60
+
+    response = client.get('/api/network-info', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+    assert client.get('/api/network-info', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert len(builds) == 1
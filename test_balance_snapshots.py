@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for day-bucketed balance snapshots and history queries
+
+The storage tests need a local mongod (MONGODB_URI) and are skipped
+without it. They run against a separate database that is dropped afterwards.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from balance_snapshots import BalanceSnapshotJob, day_bucket
+from dbmanager import DBManager, encode_address
+
+SNAPSHOT_DB_NAME = 'web_wallet_access_snapshots_test'
+TOKEN_KEYS = ['USDT', 'BNB', 'CAKE']
+
+
+def wallet(index):
+    return f'0x{index:040x}'
+
+
+class StubRegistry:
+    def get_tokens(self):
+        return [{'key': 'USDT'}, {'key': 'BNB'}, {'key': 'CAKE'}, {'key': 'OLD', 'isActive': False}]
+
+
+class StubValuationEngine:
+    """Balances derived from the wallet index: USDT = index, BNB = 0, CAKE = block"""
+
+    def __init__(self):
+        self.batches = []
+
+    def read_raw_balances(self, wallets, token_keys, block):
+        self.batches.append(list(wallets))
+        return [[int(address, 16), 0, block] for address in wallets]
+
+
+class OfflineDBManager:
+    def is_connected(self):
+        return False
+
+
+def test_day_bucket_is_utc_midnight():
+    late_evening_utc_minus_5 = datetime(2024, 3, 1, 22, 30, tzinfo=timezone(timedelta(hours=-5)))
+    assert day_bucket(late_evening_utc_minus_5) == datetime(2024, 3, 2, tzinfo=timezone.utc)
+    assert day_bucket(datetime(2024, 3, 2, 0, 0, 0, 1, tzinfo=timezone.utc)) == datetime(2024, 3, 2, tzinfo=timezone.utc)
+
+
+def test_inactive_tokens_are_not_sampled():
+    job = BalanceSnapshotJob(OfflineDBManager(), StubValuationEngine(), StubRegistry())
+    assert job.token_keys() == TOKEN_KEYS
+
+
+def test_offline_history_is_empty():
+    job = BalanceSnapshotJob(OfflineDBManager(), StubValuationEngine(), StubRegistry())
+    assert job.get_history(wallet(1)) == {"success": True, "history": [], "offline_mode": True}
+    assert not job.run_once(block=1)['success']
+
+
+@pytest.fixture
+def job():
+    db_manager = DBManager(db_name=SNAPSHOT_DB_NAME)
+    if not db_manager.is_connected():
+        pytest.skip('MongoDB is not available')
+    db_manager.client.drop_database(SNAPSHOT_DB_NAME)
+    db_manager.db.users.insert_many([{'wallet_address': encode_address(wallet(index))} for index in range(1, 6)])
+    yield BalanceSnapshotJob(db_manager, StubValuationEngine(), StubRegistry(), batch_size=2)
+    db_manager.client.drop_database(SNAPSHOT_DB_NAME)
+    db_manager.close()
+
+
+def test_snapshots_of_one_day_share_a_bucket(job):
+    first = job.run_once(block=100)
+    assert (first['success'], first['wallets'], first['tokens']) == (True, 5, 3)
+    # Wallets are read in batches of batch_size
+    assert [len(batch) for batch in job.valuation_engine.batches] == [2, 2, 1]
+
+    job.run_once(block=101)
+    collection = job._collection()
+    assert collection.count_documents({}) == 5
+    bucket = collection.find_one({'wallet_address': encode_address(wallet(3))})
+    assert bucket['sample_count'] == 2
+    assert bucket['day'].replace(tzinfo=timezone.utc) == day_bucket(datetime.now(timezone.utc))
+    # Exact integer strings, zero balances left out
+    assert [sample['b'] for sample in bucket['samples']] == [{'USDT': '3', 'CAKE': '100'},
+                                                            {'USDT': '3', 'CAKE': '101'}]
+
+
+def test_history_covers_the_requested_days_oldest_first(job):
+    collection = job._collection()
+    today = datetime.now(timezone.utc)
+    for days_ago, block in ((40, 10), (2, 20), (1, 30), (0, 40)):
+        job._store_batch(collection, [wallet(1)], TOKEN_KEYS, block, today - timedelta(days=days_ago))
+    job._store_batch(collection, [wallet(2)], TOKEN_KEYS, 50, today)
+
+    history = job.get_history(wallet(1), days=30)['history']
+    assert [entry['block'] for entry in history] == [20, 30, 40]
+    assert history[-1]['balances'] == {'USDT': '1', 'CAKE': '40'}
+
+    assert [entry['block'] for entry in job.get_history(wallet(1), days=1)['history']] == [40]
+    assert [entry['block'] for entry in job.get_history(wallet(1), days=60)['history']] == [10, 20, 30, 40]
+    assert job.get_history(wallet(9))['history'] == []
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-wallet balance push channel
+"""
+
+import queue
+import threading
+import time
+
+import pytest
+
+from balance_stream import BalanceStream
+
+WALLET = '0x00000000000000000000000000000000000fee01'
+
+
+class FakeNode:
+    """Balances per wallet, with a switch to make reads fail"""
+
+    def __init__(self):
+        self.balances = {'usdt': 100, 'allowance': 0}
+        self.reads = 0
+        self.fail = False
+
+    def fetch_balances(self, wallet):
+        self.reads += 1
+        if self.fail:
+            raise ConnectionError('node down')
+        return dict(self.balances)
+
+
+class FakeFollower:
+    """Head follower that never polls; tests call on_new_block themselves"""
+
+    def __init__(self, latest_block=None):
+        self.latest_block = latest_block
+        self.listeners = []
+
+    def add_listener(self, callback):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+
+@pytest.fixture
+def node():
+    return FakeNode()
+
+
+@pytest.fixture
+def stream(node):
+    return BalanceStream(FakeFollower(latest_block=10), node.fetch_balances)
+
+
+def test_subscribe_seeds_a_snapshot(stream):
+    subscriber = stream.subscribe(WALLET.upper().replace('0X', '0x'))
+
+    event = subscriber.get_nowait()
+    assert event == {'type': 'snapshot', 'address': WALLET, 'block': 10,
+                     'balances': {'usdt': 100, 'allowance': 0}}
+    assert stream.subscriber_count() == {'wallets': 1, 'clients': 1}
+
+
+def test_second_subscriber_reuses_the_last_balances(stream, node):
+    stream.subscribe(WALLET)
+    stream.subscribe(WALLET)
+
+    assert node.reads == 1
+    assert stream.subscriber_count() == {'wallets': 1, 'clients': 2}
+
+
+def test_new_block_pushes_only_changed_fields(stream, node):
+    subscriber = stream.subscribe(WALLET)
+    subscriber.get_nowait()
+
+    stream.refresh(11)
+    assert subscriber.empty()
+
+    node.balances['allowance'] = 50
+    stream.refresh(12)
+    assert subscriber.get_nowait() == {'type': 'diff', 'address': WALLET, 'block': 12,
+                                       'changes': {'allowance': 50}}
+
+
+def test_one_read_per_wallet_per_block(stream, node):
+    stream.subscribe(WALLET)
+    stream.subscribe(WALLET)
+    node.reads = 0
+
+    stream.refresh(11)
+    assert node.reads == 1
+
+
+def test_unsubscribe_drops_the_wallet_with_its_last_client(stream, node):
+    first = stream.subscribe(WALLET)
+    second = stream.subscribe(WALLET)
+
+    stream.unsubscribe(WALLET, first)
+    assert stream.subscriber_count() == {'wallets': 1, 'clients': 1}
+    stream.unsubscribe(WALLET, second)
+    assert stream.subscriber_count() == {'wallets': 0, 'clients': 0}
+
+    node.reads = 0
+    stream.refresh(11)
+    assert node.reads == 0
+
+
+def test_failed_snapshot_does_not_leave_a_subscription(stream, node):
+    node.fail = True
+    with pytest.raises(ConnectionError):
+        stream.subscribe(WALLET)
+
+    assert stream.subscriber_count() == {'wallets': 0, 'clients': 0}
+    node.fail = False
+    node.reads = 0
+    stream.refresh(11)
+    assert node.reads == 0
+
+
+def test_full_queue_does_not_block_the_block_loop(node):
+    stream = BalanceStream(FakeFollower(), node.fetch_balances, max_queue_size=1)
+    subscriber = stream.subscribe(WALLET)
+
+    node.balances['usdt'] = 1
+    stream.refresh(11)
+    assert subscriber.get_nowait()['type'] == 'snapshot'
+    with pytest.raises(queue.Empty):
+        subscriber.get_nowait()
+
+
+def test_new_block_callback_returns_before_the_refresh(node):
+    release = threading.Event()
+    reads = []
+
+    def slow_fetch_many(wallets):
+        release.wait(5)
+        reads.append(list(wallets))
+        return {wallet: dict(node.balances) for wallet in wallets}
+
+    stream = BalanceStream(FakeFollower(), node.fetch_balances, fetch_many=slow_fetch_many)
+    subscriber = stream.subscribe(WALLET)
+    subscriber.get_nowait()
+    node.balances['usdt'] = 200
+
+    started = time.monotonic()
+    stream.on_new_block(11)
+    assert time.monotonic() - started < 1
+    release.set()
+
+    assert subscriber.get(timeout=5) == {'type': 'diff', 'address': WALLET, 'block': 11,
+                                         'changes': {'usdt': 200}}
+    assert reads == [[WALLET]]
+
+
+def test_subscribed_wallets_are_read_in_one_batch(node):
+    batches = []
+    other = '0x' + 'ab' * 20
+
+    def fetch_many(wallets):
+        batches.append(sorted(wallets))
+        # A wallet whose read failed is simply missing from the result
+        return {wallet: dict(node.balances, usdt=len(batches)) for wallet in wallets if wallet != other}
+
+    stream = BalanceStream(FakeFollower(), node.fetch_balances, fetch_many=fetch_many)
+    first = stream.subscribe(WALLET)
+    second = stream.subscribe(other)
+    first.get_nowait()
+    second.get_nowait()
+    node.reads = 0
+
+    stream.refresh(11)
+    assert batches == [sorted([WALLET, other])]
+    assert node.reads == 0
+    assert first.get_nowait()['changes'] == {'usdt': 1}
+    assert second.empty()
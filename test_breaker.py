@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for circuit breakers and last-known-good fallbacks
+"""
+
+import time
+
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+def failing():
+    raise ConnectionError('node down')
+
+
+def test_trips_after_consecutive_failures_and_recovers_through_probe():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05, failure_types=(ConnectionError,))
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.call(lambda: 1) == 1 and breaker.state == CLOSED  # a success resets the count
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: 1)
+
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: 2) == 2 and breaker.state == CLOSED
+    status = breaker.get_status()
+    assert status['trips'] == 1 and status['rejected'] == 2
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker('test', failure_threshold=2, slow_call_seconds=0.01)
+    for _ in range(2):
+        assert breaker.call(lambda: time.sleep(0.02) or 'late') == 'late'
+    assert breaker.state == OPEN and breaker.get_status()['slow_calls'] == 2
+
+
+def test_fallback_serves_last_good_value_marked_with_age():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60, failure_types=(ConnectionError,))
+    assert breaker.fallback('balance', lambda: {'bnb': '1.0'}) == ({'bnb': '1.0'}, None)
+
+    value, age = breaker.fallback('balance', lambda: breaker.call(failing))
+    assert value == {'bnb': '1.0'} and age is not None and age >= 0
+    value, age = breaker.fallback('balance', lambda: breaker.call(lambda: {'bnb': '2.0'}))
+    assert value == {'bnb': '1.0'} and breaker.get_status()['stale_served'] == 2
+
+    with pytest.raises(CircuitOpen):
+        breaker.fallback('other', lambda: breaker.call(lambda: 1))
+    with pytest.raises(ValueError):
+        breaker.fallback('balance', lambda: int('not a number'))  # not an outage: no fallback
+
+
+def test_reconnect_closes_the_failed_client():
+    from pymongo import MongoClient
+
+    from dbmanager import DBManager
+
+    db = DBManager(db_name='web_wallet_access_breaker_test')
+    db.mongodb_uri = 'mongodb://127.0.0.1:1/'
+    failed = db.client = MongoClient(db.mongodb_uri, connect=False)
+    assert not db.connect()
+    assert failed._topology._closed and db.client is not failed
+    db.close()
+
+
+def test_fallback_does_not_store_uncacheable_values():
+    breaker = CircuitBreaker('test', failure_types=(ConnectionError,))
+    assert breaker.fallback('key', lambda: {'full': True}) == ({'full': True}, None)
+    assert breaker.fallback('key', lambda: {'partial': True},
+                            cacheable=lambda value: not value.get('partial')) == ({'partial': True}, None)
+
+    def down():
+        raise ConnectionError('down')
+
+    value, age = breaker.fallback('key', down)
+    assert value == {'full': True} and age is not None
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk access changes (DBManager.bulk_update_access and the admin routes)
+
+The DBManager tests need a local mongod (MONGODB_URI) and are skipped
+without it. They run against a separate database that is dropped afterwards.
+"""
+
+import threading
+from collections import Counter
+
+import pytest
+from pymongo import monitoring
+
+from dbmanager import DBManager, address_filter
+
+BULK_DB_NAME = 'web_wallet_access_bulk_test'
+FIRST = '0x' + '11' * 20
+SECOND = '0x55d398326f99059fF775485246999027B3197955'
+MISSING = '0x' + '22' * 20
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server by name"""
+
+    def __init__(self):
+        self.commands = Counter()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture
+def bulk_db():
+    counter = CommandCounter()
+    db = DBManager(db_name=BULK_DB_NAME, event_listeners=[counter])
+    if not db.is_connected():
+        pytest.skip('MongoDB is not available')
+    db.client.drop_database(BULK_DB_NAME)
+    db.create_user(FIRST)
+    db.create_user(SECOND)
+    yield db, counter
+    db.client.drop_database(BULK_DB_NAME)
+    db.close()
+
+
+def statuses(result):
+    return {entry['wallet_address']: entry['status'] for entry in result['results']}
+
+
+def test_bulk_grant_reports_each_wallet(bulk_db):
+    db, _ = bulk_db
+    result = db.bulk_update_access('grant', [FIRST, SECOND, MISSING, FIRST.upper().replace('0X', '0x')],
+                                   access_level='premium', updated_by='test')
+
+    assert result['success']
+    assert (result['requested'], result['matched'], result['not_found']) == (3, 2, 1)
+    assert statuses(result) == {FIRST: 'updated', SECOND.lower(): 'updated', MISSING: 'not_found'}
+    user = db.db.users.find_one({'wallet_address': address_filter(SECOND)})
+    assert user['access_level'] == 'premium' and user['platform_access']['has_access']
+
+
+def test_bulk_revoke_uses_one_write_and_one_audit_insert(bulk_db):
+    db, counter = bulk_db
+    counter.commands.clear()
+    result = db.bulk_update_access('revoke', [FIRST, SECOND, MISSING], reason='test')
+
+    assert result['success'] and result['modified'] == 2
+    assert counter.commands['find'] == 1
+    assert counter.commands['update'] == 1
+    assert counter.commands['insert'] == 1
+    activities = db.db.user_activities.count_documents({'activity_type': 'access_revoked',
+                                                        'details.bulk': True})
+    assert activities == 2
+
+
+def test_bulk_update_requires_an_access_level(bulk_db):
+    db, counter = bulk_db
+    counter.commands.clear()
+    assert not db.bulk_update_access('update', [FIRST])['success']
+    assert not db.bulk_update_access('promote', [FIRST])['success']
+    assert not counter.commands
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app as app_module
+
+    calls = []
+
+    def bulk_update_access(action, wallet_addresses, access_level=None, updated_by=None, reason=None):
+        calls.append((action, list(wallet_addresses), access_level))
+        return {'success': True, 'action': action, 'requested': len(wallet_addresses),
+                'matched': len(wallet_addresses), 'modified': len(wallet_addresses), 'not_found': 0,
+                'results': [{'wallet_address': wallet, 'status': 'updated'} for wallet in wallet_addresses]}
+
+    monkeypatch.setattr(app_module.db_manager, 'bulk_update_access', bulk_update_access)
+    client = app_module.app.test_client()
+    client.calls = calls
+    return client
+
+
+def test_bulk_route_marks_invalid_addresses(client):
+    response = client.post('/api/admin/bulk-grant-access',
+                           json={'wallet_addresses': [SECOND, 'not-an-address', 42]})
+
+    assert response.status_code == 200
+    assert response.json['invalid'] == 2
+    assert [entry['status'] for entry in response.json['results']] == ['updated', 'invalid_address',
+                                                                        'invalid_address']
+    # Only canonical, valid addresses reach the database layer
+    assert client.calls == [('grant', [SECOND.lower()], None)]
+
+
+def test_bulk_route_with_only_invalid_addresses_skips_the_database(client):
+    response = client.post('/api/admin/bulk-revoke-access', json={'wallet_addresses': ['0x123']})
+    assert response.status_code == 200
+    assert response.json['requested'] == 0 and response.json['invalid'] == 1
+    assert client.calls == []
+
+
+def test_bulk_route_validates_the_request(client):
+    assert client.post('/api/admin/bulk-grant-access', json={'wallet_addresses': []}).status_code == 400
+    assert client.post('/api/admin/bulk-grant-access', json={'wallet_addresses': FIRST}).status_code == 400
+    assert client.post('/api/admin/bulk-update-access', json={'wallet_addresses': [FIRST]}).status_code == 400
+    response = client.post('/api/admin/bulk-update-access',
+                           json={'wallet_addresses': [FIRST], 'access_level': 'premium'})
+    assert response.status_code == 200
+    assert client.calls == [('update', [FIRST], 'premium')]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-chain client registry
+"""
+
+import pytest
+
+from chain import ChainRegistry, UnknownChain
+from config import Config
+from singleflight import rpc_flight
+
+
+def make_registry():
+    return ChainRegistry(Config.CHAINS, ['bsc', 'polygon', 'no-such-chain'], 'bsc-testnet')
+
+
+def test_lookup_by_key_and_chain_id():
+    registry = make_registry()
+    assert registry.get('polygon') is registry.get(137) is registry.get('137')
+    assert registry.get() is registry.default and registry.default.key == 'bsc-testnet'
+    assert [chain['chain'] for chain in registry.list()] == ['bsc', 'polygon', 'bsc-testnet']
+
+
+def test_unknown_and_disabled_chains_are_rejected():
+    registry = make_registry()
+    for key in ('ethereum', 1, 'no-such-chain'):
+        with pytest.raises(UnknownChain):
+            registry.get(key)
+    with pytest.raises(UnknownChain):
+        ChainRegistry(Config.CHAINS, ['bsc'], 'no-such-chain')
+
+
+def test_clients_are_lazy_and_isolated():
+    registry = make_registry()
+    assert registry.default.flight is rpc_flight
+    assert registry.get('bsc').flight is not registry.get('polygon').flight
+    assert not registry.get('polygon').is_ready()
+    assert registry.get('polygon').contract('usdt') == Config.CHAINS['polygon']['contracts']['usdt']
+
+
+def test_to_checksum_address_ignores_input_case():
+    from chain import to_checksum_address
+
+    usdt = '0x55d398326f99059fF775485246999027B3197955'
+    assert to_checksum_address(usdt.lower()) == to_checksum_address(usdt.replace('fF', 'Ff')) == usdt
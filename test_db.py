@@ -7,7 +7,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from dbmanager import DBManager
+from dbmanager import DBManager, address_filter, decode_address
 import json
 
 def test_database_connection():
@@ -37,7 +37,7 @@ def test_database_connection():
     if result['success']:
         print("✅ User creation successful")
         print(f"   User ID: {result['user_data']['_id']}")
-        print(f"   Wallet: {result['user_data']['wallet_address']}")
+        print(f"   Wallet: {decode_address(result['user_data']['wallet_address'])}")
         print(f"   Login Count: {result['user_data']['login_count']}")
     else:
         print(f"❌ User creation failed: {result['error']}")
@@ -48,7 +48,7 @@ def test_database_connection():
     result = db.get_user(test_wallet)
     if result['success']:
         print("✅ User retrieval successful")
-        print(f"   Found user: {result['user_data']['wallet_address']}")
+        print(f"   Found user: {decode_address(result['user_data']['wallet_address'])}")
     else:
         print(f"❌ User retrieval failed: {result['error']}")
         return False
@@ -129,9 +129,9 @@ def test_database_connection():
     # Cleanup test data
     print("\n9. Cleaning up test data...")
     try:
-        db.db.users.delete_one({'wallet_address': test_wallet.lower()})
-        db.db.user_activities.delete_many({'wallet_address': test_wallet.lower()})
-        db.db.transactions.delete_many({'wallet_address': test_wallet.lower()})
+        db.db.users.delete_one({'wallet_address': address_filter(test_wallet)})
+        db.db.user_activities.delete_many({'wallet_address': address_filter(test_wallet)})
+        db.db.transactions.delete_many({'wallet_address': address_filter(test_wallet)})
         print("✅ Test data cleaned up")
     except Exception as e:
         print(f"⚠️  Cleanup warning: {e}")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Performance regression tests for DBManager
+
+Every test needs a local mongod (MONGODB_URI) and is skipped without it.
+They run against a separate database that is dropped afterwards.
+
+Command counts: each DBManager method is run with a pymongo
+CommandListener attached, and the commands it sends (including pings) must
+match perf_baselines.json exactly. A change that adds a query to the login
+path fails here. A change that removes one also fails, until the baseline is
+lowered.
+
+Throughput: PERF_SIZES (default "10000", e.g. "10000,100000,1000000") sets
+how many users and activities are seeded before create_user,
+log_user_activity, get_all_users and get_platform_stats are timed. A result
+below PERF_TOLERANCE (default 0.5) times the stored ops/s fails. Run with
+PERF_UPDATE_BASELINES=1 on the CI machine to record or refresh both the
+command counts and the throughput baselines.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import monitoring
+
+from dbmanager import DBManager, SCHEMA_VERSION, encode_address
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baselines.json')
+PERF_DB_NAME = 'web_wallet_access_perf'
+PERF_SIZES = [int(size) for size in os.getenv('PERF_SIZES', '10000').split(',') if size.strip()]
+PERF_TOLERANCE = float(os.getenv('PERF_TOLERANCE', '0.5'))
+UPDATE_BASELINES = os.getenv('PERF_UPDATE_BASELINES') == '1'
+
+# Connection handshake and session housekeeping are not per-operation costs
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'saslStart', 'saslContinue', 'endSessions', 'buildInfo'}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server by name"""
+
+    def __init__(self):
+        self.commands = Counter()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            with self._lock:
+                self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def measure(self, func, *args, **kwargs):
+        """Commands sent while running func, as a plain dict"""
+        with self._lock:
+            self.commands.clear()
+        func(*args, **kwargs)
+        with self._lock:
+            return dict(self.commands)
+
+
+def load_baselines():
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines):
+    with open(BASELINES_PATH, 'w') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+
+
+def wallet(index):
+    return f'0x{index:040x}'
+
+
+@pytest.fixture(scope='module')
+def perf_db():
+    counter = CommandCounter()
+    db = DBManager(db_name=PERF_DB_NAME, event_listeners=[counter])
+    if not db.is_connected():
+        pytest.skip('MongoDB is not available')
+    db.client.drop_database(PERF_DB_NAME)
+    db.ensure_indexes()
+    yield db, counter
+    db.client.drop_database(PERF_DB_NAME)
+    db.close()
+
+
+def login(db, wallet_address):
+    """The DBManager calls made by POST /api/user/login"""
+    result = db.create_user(wallet_address, {'user_agent': 'perf', 'ip_address': '127.0.0.1'})
+    db.log_user_activity(wallet_address, 'login', {'user_agent': 'perf', 'ip_address': '127.0.0.1'})
+    return result
+
+
+def test_command_counts_match_baseline(perf_db):
+    db, counter = perf_db
+    operations = {
+        'create_user:new': lambda: db.create_user(wallet(1)),
+        'create_user:existing': lambda: db.create_user(wallet(1)),
+        'log_user_activity': lambda: db.log_user_activity(wallet(1), 'perf_test', {'n': 1}),
+        'get_user': lambda: db.get_user(wallet(1)),
+        'get_all_users': lambda: db.get_all_users(limit=50),
+        'get_platform_stats': db.get_platform_stats,
+        'update_access_level': lambda: db.update_access_level(wallet(1), 'premium', 'perf'),
+        'bulk_update_access': lambda: db.bulk_update_access('revoke', [wallet(n) for n in range(1, 101)]),
+        'login:new': lambda: login(db, wallet(2)),
+        'login:returning': lambda: login(db, wallet(2)),
+    }
+    baselines = load_baselines()
+
+    measured = {name: counter.measure(operation) for name, operation in operations.items()}
+    if UPDATE_BASELINES:
+        baselines['commands'] = measured
+        save_baselines(baselines)
+    expected = baselines['commands']
+    mismatches = {
+        name: {'expected': expected.get(name), 'measured': commands}
+        for name, commands in measured.items() if commands != expected.get(name)
+    }
+    assert not mismatches, (
+        f"MongoDB commands per operation changed (update perf_baselines.json if intended): "
+        f"{json.dumps(mismatches, indent=2)}"
+    )
+
+
+def seed(db, size):
+    """Bring users and user_activities up to `size` documents each"""
+    now = datetime.now(timezone.utc)
+    for collection, make in (
+        ('users', lambda n: {'wallet_address': encode_address(wallet(10_000_000 + n)), 'schema_version': SCHEMA_VERSION,
+                             'created_at': now - timedelta(seconds=n), 'last_login': now, 'login_count': 1,
+                             'is_active': n % 10 != 0, 'access_level': 'user',
+                             'platform_access': {'has_access': n % 10 != 0, 'access_method': 'wallet_connect'}}),
+        ('user_activities', lambda n: {'wallet_address': encode_address(wallet(10_000_000 + n % 50_000)),
+                                       'schema_version': SCHEMA_VERSION,
+                                       'activity_type': 'login' if n % 4 == 0 else 'platform_access',
+                                       'timestamp': now - timedelta(minutes=n), 'details': {}}),
+    ):
+        existing = db.db[collection].estimated_document_count()
+        for start in range(existing, size, 10_000):
+            db.db[collection].insert_many([make(n) for n in range(start, min(start + 10_000, size))], ordered=False)
+
+
+def ops_per_second(func, iterations):
+    started = time.perf_counter()
+    for index in range(iterations):
+        func(index)
+    return round(iterations / (time.perf_counter() - started), 1)
+
+
+@pytest.mark.parametrize('size', sorted(PERF_SIZES))
+def test_throughput_against_baseline(perf_db, size):
+    db, _ = perf_db
+    seed(db, size)
+    offset = size * 10
+    measured = {
+        'create_user': ops_per_second(lambda n: db.create_user(wallet(offset + n)), 200),
+        'log_user_activity': ops_per_second(lambda n: db.log_user_activity(wallet(offset + n), 'perf_test'), 200),
+        'get_all_users': ops_per_second(lambda n: db.get_all_users(limit=50), 20),
+        'get_platform_stats': ops_per_second(lambda n: db.get_platform_stats(), 3),
+    }
+    print(f"\n[INFO] Throughput at {size} documents (ops/s): {measured}")
+
+    baselines = load_baselines()
+    if UPDATE_BASELINES:
+        baselines['throughput'][str(size)] = measured
+        save_baselines(baselines)
+        return
+
+    expected = baselines['throughput'].get(str(size))
+    if expected is None:
+        pytest.skip(f"No throughput baseline for {size} documents (record with PERF_UPDATE_BASELINES=1)")
+    regressions = {
+        name: {'baseline': expected[name], 'measured': value}
+        for name, value in measured.items() if name in expected and value < expected[name] * PERF_TOLERANCE
+    }
+    assert not regressions, f"Throughput regressions at {size} documents: {regressions}"
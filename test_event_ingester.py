@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for contract event decoding and reorg rollback of the event index
+
+The rollback test needs a local mongod (MONGODB_URI) and is skipped
+without it. It runs against a separate database that is dropped afterwards.
+"""
+
+import os
+import re
+
+import pytest
+from eth_abi import encode
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from dbmanager import DBManager, encode_address
+from event_ingester import EVENT_LAYOUTS, EVENT_SIGNATURES, EventIngester, decode_log
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contracts')
+INGEST_DB_NAME = 'web_wallet_access_events_test'
+PROGRAM = '0x' + 'a1' * 20
+UNIVERSAL = '0x' + 'b2' * 20
+USER = '0x55d398326f99059ff775485246999027b3197955'
+TOKEN = '0x' + 'c3' * 20
+OTHER = '0x' + 'd4' * 20
+
+
+def solidity_events():
+    """(name, [(type, indexed, arg name)]) for every event declared in contracts/*.sol"""
+    events = {}
+    for filename in ('ProgramContract.sol', 'UniversalTokenContract.sol'):
+        with open(os.path.join(CONTRACTS_DIR, filename)) as f:
+            for name, args in re.findall(r'event\s+(\w+)\(([^)]*)\);', f.read()):
+                events[name] = [
+                    (parts[0], 'indexed' in parts, parts[-1])
+                    for parts in (arg.split() for arg in args.split(','))
+                ]
+    return events
+
+
+def make_log(event_name, indexed, data_types, data_values, block_number=100, log_index=0, address=PROGRAM):
+    """Raw log as returned by eth_getLogs, ABI-encoded like the EVM would emit it"""
+    return {
+        'address': address,
+        'topics': [HexBytes(keccak(text=EVENT_SIGNATURES[event_name]))] +
+                  [HexBytes(encode(['address'], [value])) for value in indexed],
+        'data': HexBytes(encode(data_types, data_values)),
+        'blockNumber': block_number,
+        'transactionHash': HexBytes(keccak(text=f'{event_name}:{block_number}:{log_index}')),
+        'logIndex': log_index,
+    }
+
+
+@pytest.fixture
+def topic_names():
+    return EventIngester(None, {'program': PROGRAM}).topic_names
+
+
+def test_signatures_match_the_contracts():
+    declared = solidity_events()
+    for name, signature in EVENT_SIGNATURES.items():
+        args = declared[name]
+        assert signature == f"{name}({','.join(arg_type for arg_type, _, _ in args)})"
+        indexed_args, data_args = EVENT_LAYOUTS[name]
+        assert len(indexed_args) == sum(1 for _, indexed, _ in args if indexed)
+        assert len(data_args) == sum(1 for _, indexed, _ in args if not indexed)
+
+
+def test_decode_user_joined(topic_names):
+    log = make_log('UserJoined', [USER], ['uint256'], [1700000000], block_number=7, log_index=3)
+    assert decode_log(log, topic_names) == {
+        'event': 'UserJoined',
+        'contract': PROGRAM,
+        'block_number': 7,
+        'transaction_hash': '0x' + bytes(log['transactionHash']).hex(),
+        'log_index': 3,
+        'user': USER,
+        'timestamp': 1700000000,
+    }
+
+
+def test_decode_transfers_keep_full_uint256_amounts(topic_names):
+    amount = 2 ** 255 + 1
+    log = make_log('MultiTokenTransfer', [TOKEN, USER, OTHER], ['uint256', 'uint256'], [amount, 1700000000],
+                   address=UNIVERSAL)
+    event = decode_log(log, topic_names)
+    assert (event['token'], event['from'], event['to'], event['amount']) == (TOKEN, USER, OTHER, amount)
+
+    log = make_log('AdminTransfer', [USER, OTHER], ['uint256', 'uint256'], [5, 6])
+    event = decode_log(log, topic_names)
+    assert (event['from'], event['to'], event['amount'], event['timestamp']) == (USER, OTHER, 5, 6)
+
+
+def test_decode_token_approval_from_hex_strings(topic_names):
+    log = make_log('TokenApproval', [USER, TOKEN], ['bool'], [True], address=UNIVERSAL)
+    # Some providers return plain hex strings instead of HexBytes
+    log = dict(log, topics=['0x' + bytes(topic).hex() for topic in log['topics']],
+               data='0x' + bytes(log['data']).hex(), address=UNIVERSAL.upper().replace('0X', '0x'))
+    event = decode_log(log, topic_names)
+    assert (event['contract'], event['user'], event['token'], event['approved']) == (UNIVERSAL, USER, TOKEN, True)
+
+
+def test_unknown_events_are_skipped(topic_names):
+    log = make_log('UserJoined', [USER], ['uint256'], [1])
+    log['topics'][0] = HexBytes(keccak(text='AdminChanged(address,address)'))
+    assert decode_log(log, topic_names) is None
+    assert decode_log(dict(log, topics=[]), topic_names) is None
+
+
+def test_only_checkpoints_from_the_start_block_count_as_synced():
+    ingester = EventIngester(None, {'program': PROGRAM}, start_block=500)
+    assert ingester._covers_start({'last_block': 900, 'start_block': 500})
+    assert ingester._covers_start({'last_block': 900, 'start_block': 400})
+    # Began at the head after deployment, or before the start block was recorded
+    assert not ingester._covers_start({'last_block': 900, 'start_block': 800})
+    assert not ingester._covers_start({'last_block': 900})
+    assert not ingester._covers_start(None)
+
+
+@pytest.fixture
+def ingester():
+    db_manager = DBManager(db_name=INGEST_DB_NAME)
+    if not db_manager.is_connected():
+        pytest.skip('MongoDB is not available')
+    db_manager.client.drop_database(INGEST_DB_NAME)
+    ingester = EventIngester(db_manager, {'program': PROGRAM, 'universal': UNIVERSAL}, start_block=1)
+    ingester._ensure_indexes(db_manager.db)
+    yield ingester
+    db_manager.client.drop_database(INGEST_DB_NAME)
+    db_manager.close()
+
+
+def test_rollback_drops_orphaned_rows_and_rebuilds_approvals(ingester):
+    db = ingester.db_manager.db
+    topic_names = ingester.topic_names
+    logs = [
+        make_log('UserJoined', [USER], ['uint256'], [1700000000], block_number=100),
+        make_log('TokenApproval', [USER, TOKEN], ['bool'], [True], block_number=101, address=UNIVERSAL),
+        make_log('UserJoined', [OTHER], ['uint256'], [1700000100], block_number=105),
+        make_log('TokenApproval', [USER, TOKEN], ['bool'], [False], block_number=106, address=UNIVERSAL),
+    ]
+    ingester._store_events(db, [decode_log(log, topic_names) for log in logs])
+    db.ingest_checkpoints.insert_one({'_id': ingester.checkpoint_id, 'last_block': 110, 'start_block': 1})
+    assert ingester.get_token_approvals('universal', USER)['approvals'][0]['approved'] is False
+
+    result = ingester.rollback(105)
+
+    assert result['success']
+    assert (result['events_removed'], result['participants_removed'], result['approvals_rebuilt']) == (2, 1, 1)
+    assert [p['address'] for p in ingester.get_participants('program')['participants']] == [USER]
+    # The approval falls back to the surviving event from block 101
+    [approval] = ingester.get_token_approvals('universal', USER)['approvals']
+    assert (approval['token'], approval['approved'], approval['block_number']) == (TOKEN, True, 101)
+    assert ingester.get_checkpoint() == 104
+
+    # Re-ingesting the replacement blocks is idempotent with what survived
+    ingester._store_events(db, [decode_log(logs[0], topic_names)])
+    assert db.contract_events.count_documents({'contract': encode_address(PROGRAM)}) == 1
+
+
+def test_rollback_below_the_checkpoint_only(ingester):
+    db = ingester.db_manager.db
+    db.ingest_checkpoints.insert_one({'_id': ingester.checkpoint_id, 'last_block': 50, 'start_block': 1})
+    assert ingester.rollback(80)['success']
+    assert ingester.get_checkpoint() == 50
+
+
+def test_ingest_requires_a_start_block(ingester):
+    ingester.start_block = None
+    result = ingester.ingest(head_block=1000)
+    assert not result['success'] and 'EVENT_INGEST_START_BLOCK' in result['error']
+    assert ingester.get_checkpoint() is None
+
+
+def test_checkpoint_from_the_head_is_not_reported_as_synced(ingester):
+    db = ingester.db_manager.db
+    db.ingest_checkpoints.insert_one({'_id': ingester.checkpoint_id, 'last_block': 900})
+    assert ingester.get_checkpoint() is None
+    assert ingester.get_participants('program')['synced_block'] is None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared fee service against a local fake JSON-RPC node
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from eth_utils import function_signature_to_4byte_selector
+
+import fee_service as fee_service_module
+from fee_service import MAX_UINT256, FeeService, call_template
+
+TOKEN = '0x55d398326f99059ff775485246999027b3197955'
+PROGRAM = '0x' + 'a1' * 20
+SPENDER = '0x' + 'b2' * 20
+GWEI = 10 ** 9
+
+
+class FakeNode:
+    """Gas price, fee history and gas estimates, counting each RPC method"""
+
+    def __init__(self):
+        self.calls = {}
+        self.gas_price = 3 * GWEI
+        self.fee_history_supported = True
+
+    def handle(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == 'eth_chainId':
+            return {'result': hex(56)}
+        if method == 'eth_gasPrice':
+            return {'result': hex(self.gas_price)}
+        if method == 'eth_feeHistory':
+            if not self.fee_history_supported:
+                return {'error': {'code': -32601, 'message': 'the method eth_feeHistory does not exist'}}
+            return {'result': {
+                'oldestBlock': hex(int(params[1], 16) - 2),
+                'baseFeePerGas': [hex(GWEI), hex(GWEI), hex(2 * GWEI), hex(5 * GWEI)],
+                'gasUsedRatio': [0.5, 0.9, 0.1],
+                'reward': [[hex(1), hex(10), hex(100)], [hex(2), hex(20), hex(200)], [hex(3), hex(30), hex(300)]],
+            }}
+        if method == 'eth_estimateGas':
+            transaction = params[0]
+            if transaction['data'][:10] == '0x' + function_signature_to_4byte_selector('joinProgram()').hex():
+                return {'error': {'code': 3, 'message': 'execution reverted: already joined'}}
+            return {'result': hex(46000)}
+        return {'error': {'code': -32601, 'message': f'Unsupported method {method}'}}
+
+
+class FakeFollower:
+    def __init__(self, latest_block=None):
+        self.latest_block = latest_block
+        self.listeners = []
+
+    def add_listener(self, callback):
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+
+@pytest.fixture
+def fake_node(monkeypatch):
+    from web3 import Web3
+
+    node = FakeNode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'],
+                               **node.handle(request['method'], request['params'])}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    w3 = Web3(Web3.HTTPProvider(f'http://127.0.0.1:{server.server_port}'))
+    monkeypatch.setattr(fee_service_module, 'get_w3', lambda: w3)
+    yield node
+    server.shutdown()
+
+
+@pytest.fixture
+def service(fake_node):
+    return FeeService(FakeFollower(latest_block=100), {
+        'approve': call_template(TOKEN, 'approve(address,uint256)', [SPENDER, MAX_UINT256], default_gas=60000),
+        'joinProgram': call_template(PROGRAM, 'joinProgram()', [], default_gas=150000),
+    }, estimate_every=20)
+
+
+def test_fees_are_sampled_per_block(service, fake_node):
+    fees = service.refresh(100)
+    assert (fees['block'], fees['gas_price'], fees['gas_price_gwei']) == (100, str(3 * GWEI), '3')
+
+    fake_node.gas_price = 4 * GWEI
+    fees = service.refresh(101)
+    assert (fees['block'], fees['gas_price']) == (101, str(4 * GWEI))
+    assert fake_node.calls['eth_gasPrice'] == 2 and fake_node.calls['eth_feeHistory'] == 2
+
+
+def test_fee_history_is_summarized(service):
+    history = service.refresh(100)['fee_history']
+    assert history['oldest_block'] == 98
+    assert history['next_base_fee'] == str(5 * GWEI)
+    assert history['gas_used_ratio'] == [0.5, 0.9, 0.1]
+    # Median tip per percentile; max fee leaves room for the base fee to double
+    assert history['suggestions'] == {
+        'p10': {'max_priority_fee_per_gas': '2', 'max_fee_per_gas': str(10 * GWEI + 2)},
+        'p50': {'max_priority_fee_per_gas': '20', 'max_fee_per_gas': str(10 * GWEI + 20)},
+        'p90': {'max_priority_fee_per_gas': '200', 'max_fee_per_gas': str(10 * GWEI + 200)},
+    }
+
+
+def test_templates_are_estimated_every_20_blocks(service, fake_node):
+    gas_limits = service.refresh(100)['gas_limits']
+    assert gas_limits['approve'] == {'gas_limit': int(46000 * 1.2), 'estimated': True, 'block': 100,
+                                     'raw_estimate': 46000}
+    # A call that reverts for the estimate sender keeps its default
+    assert gas_limits['joinProgram']['gas_limit'] == 150000
+    assert not gas_limits['joinProgram']['estimated'] and 'reverted' in gas_limits['joinProgram']['error']
+    assert fake_node.calls['eth_estimateGas'] == 2
+
+    for block in range(101, 120):
+        assert service.refresh(block)['gas_limits']['approve']['block'] == 100
+    assert fake_node.calls['eth_estimateGas'] == 2
+
+    assert service.refresh(120)['gas_limits']['approve']['block'] == 120
+    assert fake_node.calls['eth_estimateGas'] == 4
+
+
+def test_nodes_without_fee_history_still_get_a_gas_price(service, fake_node):
+    fake_node.fee_history_supported = False
+    fees = service.refresh(100)
+    assert fees['gas_price'] == str(3 * GWEI)
+    assert fees['fee_history'] is None and 'fee_history_error' in fees
+
+
+def test_get_fees_samples_once_then_serves_from_memory(service, fake_node):
+    fees = service.get_fees()
+    assert fees['block'] == 100
+    assert service.follower.listeners == [service.on_new_block]
+
+    for _ in range(5):
+        assert service.get_fees()['block'] == 100
+    assert fake_node.calls['eth_gasPrice'] == 1
+
+    # The head follower drives the next sample
+    service.on_new_block(101)
+    assert service.get_fees()['block'] == 101
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for reorg detection and the reorg-aware block cache
+"""
+
+from finality import BlockCache, FinalityTracker
+from head_follower import HeadFollower
+
+
+class CannedChainTracker(FinalityTracker):
+    """Tracker reading headers from an in-memory chain instead of the RPC node"""
+
+    def __init__(self, chain, **kwargs):
+        super().__init__(HeadFollower(), **kwargs)
+        self.chain = chain
+
+    def _fetch_header(self, block_number):
+        return self.chain[block_number]
+
+
+def build_chain(first, last, fork_label='a', parent=None):
+    chain = {}
+    for number in range(first, last + 1):
+        block_hash = f'0x{fork_label}{number:02d}'
+        chain[number] = (block_hash, parent or f'0xparent{number}')
+        parent = block_hash
+    return chain
+
+
+def test_reorg_reports_first_orphaned_block():
+    chain = build_chain(1, 5)
+    tracker = CannedChainTracker(chain, confirmations=3)
+    forks = []
+    tracker.add_reorg_listener(forks.append)
+    for number in range(1, 6):
+        tracker.on_new_block(number)
+    assert forks == []
+    assert tracker.status(3) == 'confirmed'
+    assert tracker.status(4) == 'unconfirmed'
+
+    # Blocks 4 and 5 are replaced by a competing branch that grows to 6
+    chain.update(build_chain(4, 6, fork_label='b', parent=chain[3][0]))
+    tracker.on_new_block(6)
+
+    assert forks == [4]
+    assert tracker.known_hash(3) == '0xa03'
+    assert tracker.known_hash(5) == '0xb05'
+    assert tracker.reorg_count == 1
+
+
+def test_block_cache_drops_orphaned_blocks():
+    chain = build_chain(1, 5)
+    tracker = CannedChainTracker(chain, confirmations=3)
+    cache = BlockCache(tracker)
+    tracker.add_reorg_listener(cache.invalidate_from)
+    for number in range(1, 6):
+        tracker.on_new_block(number)
+
+    fetches = []
+
+    def fetch(number):
+        def read():
+            fetches.append(number)
+            return {'hash': chain[number][0], 'number': number}
+        return read
+
+    for number in (3, 5):
+        cache.get_block(number, fetch(number))
+        cache.get_block(number, fetch(number))
+    assert fetches == [3, 5]
+
+    chain.update(build_chain(4, 6, fork_label='b', parent=chain[3][0]))
+    tracker.on_new_block(6)
+
+    assert cache.get_block(3, fetch(3))['hash'] == '0xa03'
+    assert cache.get_block(5, fetch(5))['hash'] == '0xb05'
+    assert fetches == [3, 5, 5]
+
+
+class FlakyChainTracker(CannedChainTracker):
+    """Canned chain whose listed block numbers fail to load"""
+
+    def __init__(self, chain, **kwargs):
+        super().__init__(chain, **kwargs)
+        self.failing = set()
+
+    def _fetch_header(self, block_number):
+        if block_number in self.failing:
+            raise ConnectionError(f'header {block_number} unavailable')
+        return super()._fetch_header(block_number)
+
+
+def test_header_failure_still_reports_collected_forks():
+    chain = build_chain(1, 5)
+    tracker = FlakyChainTracker(chain, confirmations=3)
+    forks = []
+    tracker.add_reorg_listener(forks.append)
+    for number in range(1, 4):
+        tracker.on_new_block(number)
+
+    # Block 3 is reorganised away; block 4 reveals it, block 5 cannot be read yet
+    chain.update(build_chain(3, 6, fork_label='b', parent=chain[2][0]))
+    tracker.failing = {5}
+    tracker.on_new_block(6)
+
+    assert forks == [3]
+    assert tracker.known_hash(4) == '0xb04'
+    assert tracker.known_hash(5) is None
+
+    # The next head resumes after the last stored header
+    tracker.failing = set()
+    tracker.on_new_block(6)
+    assert tracker.known_hash(6) == '0xb06'
+    assert forks == [3]
+
+
+def test_failed_fork_walk_is_retried_on_the_next_head():
+    chain = build_chain(1, 5)
+    tracker = FlakyChainTracker(chain, confirmations=3)
+    forks = []
+    tracker.add_reorg_listener(forks.append)
+    for number in range(1, 5):
+        tracker.on_new_block(number)
+
+    chain.update(build_chain(3, 5, fork_label='b', parent=chain[2][0]))
+    tracker.failing = {3}
+    tracker.on_new_block(5)
+    assert forks == []
+    assert tracker.known_hash(4) == '0xa04'
+
+    tracker.failing = set()
+    tracker.on_new_block(5)
+    assert forks == [3]
+    assert tracker.known_hash(3) == '0xb03'
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the filtered activity/transaction query API
+
+The pagination test needs MongoDB and is skipped without it.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from dbmanager import DBManager
+from history_query import WALLET_INDEX, HistoryQuery, UnsupportedQuery, decode_cursor, encode_cursor
+
+TEST_WALLET = '0x' + 'e1' * 20
+
+
+def test_cursor_round_trip():
+    document = {'timestamp': datetime(2024, 5, 1, 12, 30, 15, 123000), '_id': ObjectId()}
+    timestamp, last_id = decode_cursor(encode_cursor(document))
+    assert timestamp == document['timestamp'].replace(tzinfo=timezone.utc)
+    assert last_id == document['_id']
+
+    with pytest.raises(UnsupportedQuery):
+        decode_cursor('not-a-cursor')
+
+
+def test_unindexed_combinations_are_rejected():
+    history = HistoryQuery(DBManager())
+    query, hint = history.build_filter('transactions', {'token': 'USDT'})
+    assert hint == 'query_token_timestamp'
+    assert query == {'token': 'USDT'}
+
+    # Anything scoped to one wallet rides on DBManager's wallet index
+    _, hint = history.build_filter('transactions', {'wallet_address': TEST_WALLET, 'status': 'completed'})
+    assert hint == WALLET_INDEX
+
+    result = history.query('transactions', {'token': 'USDT', 'status': 'completed'})
+    assert not result['success'] and result['unsupported']
+    with pytest.raises(UnsupportedQuery):
+        history.build_filter('activities', {'details': 'anything'})
+
+
+def test_time_range_and_cursor_bound_the_index_scan():
+    history = HistoryQuery(DBManager())
+    since = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    until = since + timedelta(days=1)
+    last = {'timestamp': since + timedelta(hours=6), '_id': ObjectId()}
+    query, hint = history.build_filter('activities', {}, since=since, until=until, cursor=encode_cursor(last))
+    assert hint == 'query_timestamp'
+    assert query == {'$and': [
+        {'timestamp': {'$gte': since, '$lt': until}},
+        {'$or': [{'timestamp': {'$lt': last['timestamp']}},
+                 {'timestamp': last['timestamp'], '_id': {'$lt': last['_id']}}]}
+    ]}
+
+
+class OfflineDBManager:
+    def is_connected(self):
+        return False
+
+
+def test_unknown_collections_and_offline_answers():
+    history = HistoryQuery(OfflineDBManager())
+    with pytest.raises(UnsupportedQuery):
+        history.build_filter('users', {})
+    assert history.query('activities', {'activity_type': ''}) == {
+        'success': True, 'items': [], 'next_cursor': None, 'offline_mode': True
+    }
+    result = history.query('activities', {'activity_type': 'login'})
+    assert not result['success'] and result['unsupported']
+
+
+@pytest.fixture
+def mongo_db():
+    db = DBManager()
+    if not db.is_connected():
+        pytest.skip('MongoDB is not available')
+    db.db.user_activities.delete_many({'wallet_address': TEST_WALLET})
+    yield db
+    db.db.user_activities.delete_many({'wallet_address': TEST_WALLET})
+    db.close()
+
+
+def test_pages_follow_the_index_without_gaps(mongo_db):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    # Pairs of documents share a timestamp, so pages must break ties on _id
+    mongo_db.db.user_activities.insert_many([
+        {'wallet_address': TEST_WALLET, 'activity_type': 'test_history_query',
+         'timestamp': now - timedelta(seconds=index // 2)}
+        for index in range(25)
+    ])
+
+    history = HistoryQuery(mongo_db)
+    seen, cursor = [], None
+    while True:
+        page = history.query('activities', {'wallet_address': TEST_WALLET}, cursor=cursor, limit=4)
+        assert page['success'] and page['index'] == WALLET_INDEX
+        seen.extend(page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == 25 and len({document['_id'] for document in seen}) == 25
+    assert [document['timestamp'] for document in seen] == sorted((d['timestamp'] for d in seen), reverse=True)
+
+    query, hint = history.build_filter('activities', {'wallet_address': TEST_WALLET})
+    plan = mongo_db.db.user_activities.find(query).hint(hint).explain()['queryPlanner']['winningPlan']
+    assert 'COLLSCAN' not in str(plan)
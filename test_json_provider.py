@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the BSON-aware Flask JSON provider
+"""
+
+import datetime
+import decimal
+import json
+
+import pytest
+from bson import Decimal128, ObjectId
+from bson.binary import Binary
+from flask import Flask, jsonify
+
+import json_provider
+from json_provider import BSONJSONProvider, encode_bson_value
+
+OBJECT_ID = ObjectId('65a1b2c3d4e5f60718293a4b')
+DOCUMENT = {
+    '_id': OBJECT_ID,
+    'wallet_address': Binary(bytes.fromhex('55d398326f99059ff775485246999027b3197955')),
+    'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2024, 1, 2),
+    'balance': Decimal128('12.345678901234567890'),
+    'price': decimal.Decimal('0.99'),
+}
+EXPECTED = {
+    '_id': '65a1b2c3d4e5f60718293a4b',
+    'wallet_address': '0x55d398326f99059ff775485246999027b3197955',
+    'created_at': '2024-01-02T03:04:05.678000+00:00',
+    'day': '2024-01-02',
+    'balance': '12.345678901234567890',
+    'price': '0.99',
+}
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def app(request, monkeypatch):
+    if request.param == 'orjson':
+        if json_provider.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    app = Flask(__name__)
+    app.json = BSONJSONProvider(app)
+    return app
+
+
+def test_bson_values_are_encoded(app):
+    assert json.loads(app.json.dumps(DOCUMENT)) == EXPECTED
+
+
+def test_keys_keep_insertion_order(app):
+    # Unlike Flask's default provider, keys are not sorted
+    with app.app_context():
+        body = jsonify({'success': True, 'b': 1, 'a': 2}).get_data(as_text=True)
+    assert list(json.loads(body)) == ['success', 'b', 'a']
+
+
+def test_nested_documents_and_lists(app):
+    encoded = json.loads(app.json.dumps({'users': [{'_id': OBJECT_ID, 'stats': {'total': Decimal128('1')}}]}))
+    assert encoded == {'users': [{'_id': '65a1b2c3d4e5f60718293a4b', 'stats': {'total': '1'}}]}
+
+
+def test_wide_integers_fall_back_to_the_stdlib_encoder(app):
+    # orjson rejects ints wider than 64 bits, such as raw uint256 amounts
+    value = 2 ** 256 - 1
+    assert json.loads(app.json.dumps({'amount': value, '_id': OBJECT_ID})) == {
+        'amount': value, '_id': '65a1b2c3d4e5f60718293a4b'
+    }
+
+
+def test_unknown_types_are_rejected(app):
+    with pytest.raises(TypeError):
+        app.json.dumps({'value': object()})
+    with pytest.raises(TypeError):
+        encode_bson_value({1, 2})
+
+
+def test_indent_is_honoured(app):
+    assert '\n' in app.json.dumps({'a': 1}, indent=2)
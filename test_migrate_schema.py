@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact-schema encoders and the online migration
+
+The migration tests need a local mongod (MONGODB_URI) and are skipped
+without it. They run against a separate database that is dropped afterwards.
+"""
+
+import sys
+
+import pytest
+from bson.binary import Binary
+
+import migrate_schema
+from addresses import canonical_address
+from dbmanager import DBManager, SCHEMA_VERSION, address_filter, decode_address, encode_address, to_binary
+from migrate_schema import build_update, migrate_collection
+
+MIGRATION_DB_NAME = 'web_wallet_access_migration_test'
+WALLET = '0x55d398326f99059fF775485246999027B3197955'
+TX_HASH = '0x' + 'ab' * 32
+
+
+def test_address_encoding_round_trips():
+    for value in (WALLET, WALLET.lower(), canonical_address(WALLET)):
+        encoded = encode_address(value)
+        assert isinstance(encoded, Binary) and len(encoded) == 20
+        assert decode_address(encoded) == WALLET.lower()
+    assert encode_address(canonical_address(WALLET)) == encode_address(WALLET)
+
+
+def test_hash_encoding_round_trips():
+    encoded = to_binary(TX_HASH)
+    assert isinstance(encoded, Binary) and len(encoded) == 32
+    assert decode_address(encoded) == TX_HASH
+
+
+def test_values_that_are_not_hex_are_left_alone():
+    for value in ('not-hex', '0x', '0xzz11', '0xabc', 12, None):
+        assert to_binary(value) is value
+    # Legacy documents still hold the hex string, which decodes to itself
+    assert decode_address(WALLET.lower()) == WALLET.lower()
+
+
+def test_address_filter_matches_both_schemas():
+    assert address_filter(WALLET) == {'$in': [encode_address(WALLET), WALLET.lower()]}
+
+
+def test_build_update_converts_binary_fields():
+    update = build_update('users', {'_id': 1, 'wallet_address': WALLET.lower()})
+    assert update == {'$set': {'schema_version': SCHEMA_VERSION, 'wallet_address': encode_address(WALLET)}}
+
+    # Already-compact fields are not rewritten
+    update = build_update('users', {'_id': 1, 'wallet_address': encode_address(WALLET)})
+    assert update == {'$set': {'schema_version': SCHEMA_VERSION}}
+
+
+def test_build_update_strips_duplicated_transaction_details():
+    document = {'_id': 1, 'wallet_address': WALLET.lower(), 'transaction_hash': TX_HASH,
+                'details': {'hash': TX_HASH, 'amount': '1', 'memo': 'rent'}}
+    update = build_update('transactions', document)
+    assert update['$set']['details'] == {'memo': 'rent'}
+    assert update['$set']['transaction_hash'] == to_binary(TX_HASH)
+
+    document['details'] = {'hash': TX_HASH, 'amount': '1'}
+    assert build_update('transactions', document)['$unset'] == {'details': ''}
+
+
+@pytest.fixture
+def migration_db():
+    db_manager = DBManager(db_name=MIGRATION_DB_NAME)
+    if not db_manager.is_connected():
+        pytest.skip('MongoDB is not available')
+    db_manager.client.drop_database(MIGRATION_DB_NAME)
+    yield db_manager
+    db_manager.client.drop_database(MIGRATION_DB_NAME)
+    db_manager.close()
+
+
+def seed_legacy(db, count):
+    db.users.insert_many([{'wallet_address': f'0x{index:040x}'} for index in range(count)])
+    db.transactions.insert_one({'wallet_address': WALLET.lower(), 'transaction_hash': TX_HASH,
+                                'details': {'hash': TX_HASH, 'amount': '1'}})
+
+
+def test_migrate_collection_dry_run_and_rerun(migration_db):
+    db = migration_db.db
+    seed_legacy(db, 25)
+
+    assert migrate_collection(db, 'users', batch_size=10, pause=0, dry_run=True) == (25, 25)
+    assert db.users.count_documents({'schema_version': SCHEMA_VERSION}) == 0
+
+    assert migrate_collection(db, 'users', batch_size=10, pause=0, dry_run=False) == (25, 25)
+    assert db.users.count_documents({'schema_version': SCHEMA_VERSION}) == 25
+    user = db.users.find_one({'wallet_address': encode_address('0x' + '0' * 39 + '7')})
+    assert user is not None
+
+    # A second run finds nothing left to convert
+    assert migrate_collection(db, 'users', batch_size=10, pause=0, dry_run=False) == (25, 0)
+
+    assert migrate_collection(db, 'transactions', batch_size=10, pause=0, dry_run=False) == (1, 1)
+    transaction = db.transactions.find_one()
+    assert transaction['transaction_hash'] == to_binary(TX_HASH) and 'details' not in transaction
+
+
+def test_main_migrates_selected_collections(migration_db, monkeypatch):
+    seed_legacy(migration_db.db, 3)
+    monkeypatch.setattr(migrate_schema, 'DBManager', lambda: DBManager(db_name=MIGRATION_DB_NAME))
+    monkeypatch.setattr(sys, 'argv', ['migrate_schema.py', '--collections', 'users', '--batch-size', '2'])
+
+    assert migrate_schema.main() == 0
+    assert migration_db.db.users.count_documents({'schema_version': SCHEMA_VERSION}) == 3
+    assert migration_db.db.transactions.count_documents({'schema_version': SCHEMA_VERSION}) == 0
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-bucket rate limiter (in-memory backend)
+"""
+
+import pytest
+from flask import Flask, jsonify
+from pymongo.errors import ServerSelectionTimeoutError
+
+import rate_limiter
+from breaker import CircuitBreaker
+from rate_limiter import InMemoryBackend, MongoBackend, RateLimiter, parse_rate
+
+WALLET = '0x55d398326f99059fF775485246999027B3197955'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+
+def test_parse_rate():
+    assert parse_rate('100 per hour') == (100.0, 100.0 / 3600)
+    assert parse_rate('5 per seconds') == (5.0, 5.0)
+
+
+def test_bucket_refills_over_time(clock):
+    backend = InMemoryBackend()
+    assert backend.consume('k', 10, 10, 1) == (True, 0.0)
+    assert backend.consume('k', 3, 10, 1) == (False, 3.0)
+
+    clock.now += 2
+    assert backend.consume('k', 3, 10, 1) == (False, 1.0)
+    clock.now += 1
+    assert backend.consume('k', 3, 10, 1) == (True, 0.0)
+
+    # Refill stops at capacity
+    clock.now += 1000
+    assert backend.consume('k', 10, 10, 1) == (True, 0.0)
+    assert not backend.consume('k', 1, 10, 1)[0]
+
+
+def test_refund_is_capped_at_capacity(clock):
+    backend = InMemoryBackend()
+    backend.consume('k', 4, 10, 1)
+    backend.refund('k', 100, 10)
+    assert backend.consume('k', 10, 10, 1)[0]
+    # Refunding an unknown bucket does not create one
+    backend.refund('missing', 1, 10)
+    assert backend.bucket_count() == 1
+
+
+def test_full_buckets_are_swept(clock):
+    backend = InMemoryBackend(sweep_interval=60)
+    backend.consume('short', 1, 10, 1)      # full again after 1 s
+    backend.consume('long', 1, 10, 0.001)   # full again after 1000 s
+    assert backend.bucket_count() == 2
+
+    clock.now += 60
+    backend.consume('new', 1, 10, 1)
+    assert backend.bucket_count() == 2
+    assert 'short' not in backend._buckets
+
+
+def test_bucket_count_is_bounded(clock):
+    backend = InMemoryBackend(max_buckets=3)
+    for index in range(10):
+        backend.consume(f'k{index}', 1, 10, 0.001)
+    assert list(backend._buckets) == ['k7', 'k8', 'k9']
+
+
+def test_denied_bucket_refunds_the_others(clock):
+    backend = InMemoryBackend()
+    limiter = RateLimiter(backend, request_rate='100 per hour', rpc_rate='100 per hour',
+                          wallet_rpc_rate='10 per hour')
+    assert limiter.check('1.2.3.4', 10, WALLET) == (True, 0.0)
+
+    allowed, retry_after = limiter.check('1.2.3.4', 10, WALLET)
+    assert not allowed and retry_after == pytest.approx(3600)
+    # Only the successful request is charged to the per-IP buckets
+    assert backend._buckets['ip:1.2.3.4'][0] == pytest.approx(99)
+    assert backend._buckets['rpc-ip:1.2.3.4'][0] == pytest.approx(90)
+
+
+def test_cost_above_capacity_is_never_allowed(clock):
+    limiter = RateLimiter(InMemoryBackend(), rpc_rate='5 per hour')
+    assert limiter.check('1.2.3.4', 6) == (False, float('inf'))
+
+
+@pytest.fixture
+def client(clock):
+    app = Flask(__name__)
+    backend = InMemoryBackend()
+    limiter = RateLimiter(backend, endpoint_costs={'get_balance': 3}, request_rate='100 per hour',
+                          rpc_rate='100 per hour', wallet_rpc_rate='6 per hour')
+    limiter.init_app(app)
+
+    @app.route('/api/get-balance', methods=['POST'])
+    def get_balance():
+        return jsonify({'success': True})
+
+    @app.route('/api/health')
+    def health():
+        return jsonify({'success': True})
+
+    app.testing = True
+    client = app.test_client()
+    client.backend = backend
+    return client
+
+
+def test_denied_request_gets_429_with_retry_after(client):
+    for _ in range(2):
+        assert client.post('/api/get-balance', json={'address': WALLET}).status_code == 200
+
+    response = client.post('/api/get-balance', json={'address': WALLET})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1800'
+    assert response.get_json() == {'success': False, 'error': 'Rate limit exceeded', 'retry_after': 1800}
+
+    # Unlisted endpoints are not limited
+    assert client.get('/api/health').status_code == 200
+
+
+def test_wallet_bucket_is_keyed_on_the_canonical_address(client):
+    client.post('/api/get-balance', json={'address': WALLET})
+    client.post('/api/get-balance', json={'address': WALLET.lower()})
+    assert client.post('/api/get-balance', json={'address': WALLET.upper().replace('0X', '0x')}).status_code == 429
+    assert [key for key in client.backend._buckets if key.startswith('rpc-wallet:')] == [
+        f'rpc-wallet:{WALLET.lower()}'
+    ]
+
+
+def test_invalid_wallet_values_get_no_bucket(client):
+    for value in ('not-an-address', '0x123', 12345, ['0x00']):
+        assert client.post('/api/get-balance', json={'address': value}).status_code == 200
+    assert not [key for key in client.backend._buckets if key.startswith('rpc-wallet:')]
+
+
+def test_batched_read_cost():
+    assert rate_limiter.batched_read_cost(5000, 13, 200, fixed=1) == 326
+    assert rate_limiter.batched_read_cost(1, 1, 200) == 1
+    assert rate_limiter.batched_read_cost(0, 13, 200, fixed=1) == 1
+
+
+def test_callable_cost_is_charged_from_the_request_body(clock):
+    app = Flask(__name__)
+    limiter = RateLimiter(InMemoryBackend(), endpoint_costs={}, rpc_rate='10 per hour')
+    limiter.set_cost('portfolio', lambda data: len(data.get('wallet_addresses') or []))
+    limiter.init_app(app)
+
+    @app.route('/api/admin/portfolio-values', methods=['POST'])
+    def portfolio():
+        return jsonify({'success': True})
+
+    client = app.test_client()
+    assert client.post('/api/admin/portfolio-values', json={'wallet_addresses': [WALLET] * 6}).status_code == 200
+    assert client.post('/api/admin/portfolio-values', json={'wallet_addresses': [WALLET] * 6}).status_code == 429
+    # Non-object bodies are costed as empty
+    assert client.post('/api/admin/portfolio-values', data='junk').status_code == 200
+
+
+class StubCollection:
+    def __init__(self):
+        self.indexes = []
+        self.down = False
+
+    def create_index(self, *args, **kwargs):
+        self.indexes.append(args)
+
+    def find_one_and_update(self, *args, **kwargs):
+        if self.down:
+            raise ServerSelectionTimeoutError('no servers')
+        return {'allowed': True, 'tokens': 0.0}
+
+
+class StubDBManager:
+    """Fails the test if anything pings the server"""
+
+    def __init__(self):
+        self.collection = StubCollection()
+        self.db = {'rate_limits': self.collection}
+        self.breaker = CircuitBreaker('mongodb', failure_threshold=2, reset_timeout=60)
+
+    def is_connected(self):
+        raise AssertionError('MongoBackend must not ping on every request')
+
+
+def test_mongo_backend_reuses_the_collection_without_pinging(clock):
+    db_manager = StubDBManager()
+    backend = MongoBackend(db_manager)
+    for _ in range(3):
+        assert backend.consume('k', 1, 10, 1) == (True, 0.0)
+    assert len(db_manager.collection.indexes) == 1
+
+
+def test_mongo_backend_falls_back_and_stops_trying_while_down(clock):
+    db_manager = StubDBManager()
+    backend = MongoBackend(db_manager)
+    db_manager.collection.down = True
+    assert backend.consume('k', 1, 10, 1) == (True, 0.0)
+    assert backend.consume('k', 1, 10, 1) == (True, 0.0)
+    assert db_manager.breaker.get_status()['state'] == 'open'
+
+    # Open breaker: the local bucket is used without calling MongoDB
+    db_manager.collection.find_one_and_update = None
+    assert backend.consume('k', 1, 10, 1) == (True, 0.0)
+    assert backend.fallback.bucket_count() == 1
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared, pooled RPC HTTP session
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpen
+from rpc_session import PoolStats, RPCSession
+
+
+def serve_node():
+    """Local JSON-RPC node answering every call with 0x10; yields its URL"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x10'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+@pytest.fixture
+def node_url():
+    yield from serve_node()
+
+
+@pytest.fixture
+def other_node_url():
+    yield from serve_node()
+
+
+def run_in_threads(func, count):
+    threads = [threading.Thread(target=func) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_connections_are_shared_across_threads(node_url):
+    from web3 import Web3
+
+    session = RPCSession(pool_hosts=2, pool_size=4, connect_timeout=1, read_timeout=5)
+    w3 = Web3(session.provider(node_url))
+    assert w3.eth.block_number == 16
+
+    # Sequential calls from fresh threads reuse the one warm connection
+    for _ in range(5):
+        run_in_threads(lambda: w3.eth.block_number, 1)
+    stats = session.get_stats()
+    assert stats['requests'] == 6 and stats['connections_opened'] == 1 and stats['idle'] == 1
+
+
+def test_saturation_is_reported(node_url):
+    from web3 import Web3
+
+    session = RPCSession(pool_hosts=2, pool_size=2, connect_timeout=1, read_timeout=5)
+    w3 = Web3(session.provider(node_url))
+    run_in_threads(lambda: [w3.eth.block_number for _ in range(20)], 8)
+
+    stats = session.get_stats()
+    assert stats['requests'] == 160 and stats['in_use'] == 0
+    assert stats['connections_opened'] <= 8 + stats['discarded']
+    assert stats['idle'] <= 2
+    assert stats['peak_in_use'] <= 8
+    assert (stats['overflows'] > 0) == (stats['peak_in_use'] > 2) == (stats['saturation'] > 1)
+
+
+def test_pool_usage_is_counted_per_host():
+    stats = PoolStats()
+    for host in ('http://a:80', 'http://b:80'):
+        stats.checked_out(host, 2)
+        stats.checked_out(host, 2)
+
+    # Two connections per host fit each host's pool of two
+    snapshot = stats.snapshot()
+    assert (snapshot['in_use'], snapshot['peak_in_use'], snapshot['overflows']) == (4, 2, 0)
+    stats.checked_out('http://a:80', 2)
+    snapshot = stats.snapshot()
+    assert snapshot['overflows'] == 1 and snapshot['hosts']['http://a:80']['peak_in_use'] == 3
+    assert snapshot['hosts']['http://b:80']['overflows'] == 0
+
+
+def test_stats_are_reported_per_rpc_host(node_url, other_node_url):
+    from web3 import Web3
+
+    session = RPCSession(pool_hosts=2, pool_size=2, connect_timeout=1, read_timeout=5)
+    first, second = Web3(session.provider(node_url)), Web3(session.provider(other_node_url))
+    for _ in range(3):
+        assert first.eth.block_number == second.eth.block_number == 16
+    second.eth.block_number
+
+    stats = session.get_stats()
+    hosts = stats['hosts']
+    assert sorted(hosts) == sorted([node_url, other_node_url])
+    assert [hosts[node_url]['requests'], hosts[other_node_url]['requests']] == [3, 4]
+    assert stats['requests'] == 7 and stats['connections_opened'] == 2
+    assert stats['peak_in_use'] == 1 and stats['saturation'] == 0.5
+    assert hosts[node_url]['saturation'] == 0.5
+
+
+@pytest.fixture
+def failing_node():
+    attempts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            attempts.append(self.path)
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', attempts
+    server.shutdown()
+
+
+def test_breaker_counts_one_failure_per_retried_call(failing_node):
+    from requests import HTTPError
+    from web3 import Web3
+
+    url, attempts = failing_node
+    breaker = CircuitBreaker('rpc:test', failure_threshold=2, reset_timeout=60,
+                             failure_types=(requests.RequestException,))
+    w3 = Web3(RPCSession(pool_hosts=2, pool_size=2, connect_timeout=1, read_timeout=5).provider(url, breaker))
+
+    with pytest.raises(HTTPError):
+        w3.eth.block_number
+    # web3 retried the HTTP request, but the breaker saw one logical call
+    assert len(attempts) > 1
+    assert breaker.get_status()['failures'] == 1 and breaker.state == CLOSED
+
+    with pytest.raises(HTTPError):
+        w3.eth.block_number
+    assert breaker.state == OPEN
+    sent = len(attempts)
+    with pytest.raises(CircuitOpen):
+        w3.eth.block_number
+    assert len(attempts) == sent
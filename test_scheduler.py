@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the lease-based job scheduler
+
+The leader election tests need MongoDB and are skipped without it.
+"""
+
+import threading
+import time
+
+import pytest
+
+from dbmanager import DBManager
+from scheduler import Scheduler
+
+TEST_JOB = 'test_scheduler_job'
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_local_job_runs_and_reports_status():
+    runs = []
+    scheduler = Scheduler(DBManager(), instance_id='local', tick=0.05)
+    scheduler.register('local_job', lambda: runs.append(1) or {'success': True}, interval=0.1,
+                       singleton=False, run_immediately=True)
+    scheduler.start()
+    try:
+        assert wait_until(lambda: len(runs) >= 2)
+    finally:
+        scheduler.stop()
+
+    (job,) = scheduler.get_status()['jobs']
+    assert job['leader'] and job['last_success']
+    assert job['last_duration_ms'] is not None
+    assert 'func' not in job
+
+
+@pytest.fixture
+def mongo_db():
+    db = DBManager()
+    if not db.is_connected():
+        pytest.skip('MongoDB is not available')
+    db.db.job_leases.delete_many({'_id': TEST_JOB})
+    yield db
+    db.db.job_leases.delete_many({'_id': TEST_JOB})
+    db.close()
+
+
+def test_only_one_instance_runs_a_singleton_job(mongo_db):
+    runs = {'a': 0, 'b': 0}
+    lock = threading.Lock()
+
+    def job(name):
+        def run():
+            with lock:
+                runs[name] += 1
+            return {'success': True}
+        return run
+
+    schedulers = []
+    for name in runs:
+        scheduler = Scheduler(mongo_db, instance_id=name, lease_ttl=1.5, tick=0.05)
+        scheduler.register(TEST_JOB, job(name), interval=0.1, run_immediately=True)
+        schedulers.append(scheduler)
+        scheduler.start()
+
+    try:
+        assert wait_until(lambda: sum(runs.values()) >= 5)
+        leader = next(scheduler for scheduler in schedulers if scheduler.jobs[TEST_JOB]['leader'])
+        follower = next(scheduler for scheduler in schedulers if scheduler is not leader)
+        assert runs[follower.instance_id] == 0
+
+        # A clean shutdown hands the lease over without waiting for it to expire
+        leader.stop()
+        before = runs[follower.instance_id]
+        assert wait_until(lambda: runs[follower.instance_id] > before, timeout=5)
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight coalescing of identical concurrent calls
+"""
+
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def run_concurrently(flight, key, fn, callers=CALLERS):
+    """Start callers threads on one key, release fn once all of them joined; returns their outcomes"""
+    release = threading.Event()
+    outcomes = [None] * callers
+
+    def leader_fn():
+        release.wait(5)
+        return fn()
+
+    def caller(index):
+        try:
+            outcomes[index] = ('result', flight.do(key, leader_fn))
+        except Exception as e:
+            outcomes[index] = ('error', e)
+
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.get_stats().get(key[0], {}).get('requests', 0) < callers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return {'block': 123}
+
+    outcomes = run_concurrently(flight, ('get_block', 123), fetch)
+
+    assert len(fetches) == 1
+    assert all(kind == 'result' for kind, _ in outcomes)
+    # Every caller gets the very same object
+    assert len({id(value) for _, value in outcomes}) == 1
+    assert flight.get_stats() == {'get_block': {'requests': CALLERS, 'executions': 1,
+                                                'coalesced': CALLERS - 1,
+                                                'coalescing_ratio': round((CALLERS - 1) / CALLERS, 4)}}
+
+
+def test_all_callers_see_the_raised_exception():
+    flight = SingleFlight()
+    error = ConnectionError('node down')
+
+    def fetch():
+        raise error
+
+    outcomes = run_concurrently(flight, ('balance_of', '0xabc'), fetch)
+
+    assert outcomes == [('error', error)] * CALLERS
+    stats = flight.get_stats()['balance_of']
+    assert (stats['requests'], stats['executions']) == (CALLERS, 1)
+
+
+def test_finished_calls_are_not_cached():
+    flight = SingleFlight()
+    values = iter([1, 2])
+    assert flight.do(('block_number',), lambda: next(values)) == 1
+    assert flight.do(('block_number',), lambda: next(values)) == 2
+    with pytest.raises(ValueError):
+        flight.do(('block_number',), lambda: int('x'))
+    assert flight.do(('block_number',), lambda: 3) == 3
+    assert flight.get_stats()['block_number']['coalesced'] == 0
+
+
+def test_stats_are_grouped_by_operation():
+    flight = SingleFlight()
+    flight.do(('decimals', '0xa'), lambda: 18)
+    flight.do(('decimals', '0xb'), lambda: 6)
+    flight.do(('block_number',), lambda: 1)
+    stats = flight.get_stats()
+    assert stats['decimals']['executions'] == 2 and stats['block_number']['requests'] == 1
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the web application
+
+Imports run in a fresh interpreter with MongoDB pointed at a closed port,
+so a regression that blocks on an external service at import shows up as
+a multi-second startup.
+"""
+
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Unreachable MongoDB used to prove startup does not wait on it
+UNREACHABLE_MONGODB_URI = 'mongodb://127.0.0.1:1/'
+
+# Budgets in seconds; the old eager connect alone took 3s
+STARTUP_BUDGETS = {
+    'dbmanager': 1.0,
+    'app': 2.0,
+}
+
+
+def measure_import(module_name):
+    """Import a module in a clean interpreter and return (seconds, web3_loaded)"""
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "elapsed = time.perf_counter() - started\n"
+        "print(f\"{elapsed:.4f} {'web3' in sys.modules}\")\n"
+    )
+    # Background services on, as in production: starting them must not block either
+    env = dict(os.environ, MONGODB_URI=UNREACHABLE_MONGODB_URI, BACKGROUND_SERVICES='true')
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True, timeout=60
+    )
+    elapsed, web3_loaded = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), web3_loaded == 'True'
+
+
+def test_dbmanager_import_is_non_blocking():
+    """Importing dbmanager must not connect to MongoDB or load web3"""
+    elapsed, web3_loaded = measure_import('dbmanager')
+    assert elapsed < STARTUP_BUDGETS['dbmanager'], f"dbmanager import took {elapsed:.2f}s"
+    assert not web3_loaded
+
+
+def test_app_import_is_non_blocking():
+    """Importing the Flask app must not wait for MongoDB or the RPC node"""
+    elapsed, _ = measure_import('app')
+    assert elapsed < STARTUP_BUDGETS['app'], f"app import took {elapsed:.2f}s"
+
+
+if __name__ == "__main__":
+    print("Startup Benchmark")
+    print("=" * 50)
+    for module_name, budget in STARTUP_BUDGETS.items():
+        elapsed, web3_loaded = measure_import(module_name)
+        status = "✅" if elapsed < budget else "❌"
+        print(f"{status} import {module_name}: {elapsed:.3f}s (budget {budget:.1f}s, web3 loaded: {web3_loaded})")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed and compressed JSON responses
+"""
+
+import gzip
+import json
+
+from flask import Flask, jsonify
+
+from json_provider import BSONJSONProvider
+from streaming import init_compression, stream_json
+
+
+def make_app(items):
+    app = Flask(__name__)
+    app.json = BSONJSONProvider(app)
+    init_compression(app, '/api/admin/')
+
+    @app.route('/api/admin/items')
+    def list_items():
+        return stream_json(app, {'success': True, 'total_count': 3000}, 'items', items())
+
+    @app.route('/api/admin/summary')
+    def summary():
+        return jsonify({'success': True, 'rows': [{'wallet': f'0x{n:040x}'} for n in range(100)]})
+
+    return app
+
+
+def test_streamed_json_is_gzipped_and_complete():
+    def items():
+        for n in range(3000):
+            yield {'n': n, 'wallet': f'0x{n:040x}'}
+
+    client = make_app(items).test_client()
+    response = client.get('/api/admin/items', headers={'Accept-Encoding': 'gzip'})
+    assert response.is_streamed and response.headers['Content-Encoding'] == 'gzip'
+
+    raw = response.get_data()
+    body = json.loads(gzip.decompress(raw))
+    assert body['success'] and body['complete'] and body['total_count'] == 3000
+    assert [item['n'] for item in body['items']] == list(range(3000))
+    assert len(raw) * 4 < len(json.dumps(body))
+
+
+def test_stream_failure_is_reported_in_body():
+    def items():
+        yield {'n': 0}
+        raise RuntimeError('cursor lost')
+
+    response = make_app(items).test_client().get('/api/admin/items')
+    body = json.loads(response.get_data())
+    assert 'Content-Encoding' not in response.headers
+    assert body['items'] == [{'n': 0}] and body['complete'] is False and body['error'] == 'cursor lost'
+
+
+def test_ndjson_and_buffered_compression():
+    client = make_app(lambda: iter([{'n': 1}, {'n': 2}])).test_client()
+    response = client.get('/api/admin/items?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == '3000'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [{'n': 1}, {'n': 2}]
+
+    response = client.get('/api/admin/summary', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.get_data()))['rows']) == 100
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the token metadata registry (no chain or database needed)
+"""
+
+import json
+
+from dbmanager import DBManager
+from token_registry import TOKEN_CONFIG_PATH, TokenRegistry, load_token_config
+
+USDT_ADDRESS = '0x55d398326f99059fF775485246999027B3197955'
+
+
+def test_shipped_config_has_no_duplicate_tokens():
+    config, duplicates = load_token_config(TOKEN_CONFIG_PATH)
+    assert duplicates == []
+    assert 'USDT' in config['tokens']
+
+
+def test_duplicate_token_keys_are_reported(tmp_path):
+    path = tmp_path / 'token-config.json'
+    path.write_text('{"tokens": {"ETH": {"address": "0x1"}, "ETH": {"address": "0x2"}}}')
+    config, duplicates = load_token_config(str(path))
+    assert duplicates == ['ETH']
+    assert config['tokens']['ETH']['address'] == '0x2'
+
+
+def test_lookups_by_symbol_and_address(tmp_path):
+    path = tmp_path / 'token-config.json'
+    path.write_text(json.dumps({'tokens': {
+        'USDT': {'address': USDT_ADDRESS, 'symbol': 'USDT', 'name': 'Tether USD', 'decimals': 18},
+        'BNB': {'address': 'native', 'symbol': 'BNB', 'decimals': 18, 'isNative': True}
+    }}))
+    registry = TokenRegistry(DBManager(), config_path=str(path))
+    registry.load()
+
+    assert registry.get('USDT')['address'] == USDT_ADDRESS
+    assert registry.get(USDT_ADDRESS.lower())['symbol'] == 'USDT'
+    assert registry.decimals(USDT_ADDRESS.upper().replace('0X', '0x')) == 18
+
+    # Unknown tokens are fetched once, then served from memory
+    calls = []
+    unknown = '0x' + '11' * 20
+    assert registry.decimals(unknown, lambda: calls.append(1) or 6) == 6
+    assert registry.decimals(unknown, lambda: calls.append(1) or 6) == 6
+    assert len(calls) == 1
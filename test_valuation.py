@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the DEX-reserve valuation engine against a local fake JSON-RPC node
+
+The fake node answers Multicall3 aggregate3 eth_calls from canned factory
+pairs, reserves and balances, so no network access is needed.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import pytest
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+
+from dbmanager import DBManager
+from multicall import MULTICALL3_ADDRESS
+from token_registry import TokenRegistry
+from valuation import PANCAKE_FACTORY_ADDRESS, ValuationEngine
+
+USDT = '0x55d398326f99059ff775485246999027b3197955'
+WBNB = '0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c'
+CAKE = '0x0e09fabb73bd3ade0a17ecc321fd13a19e81ce82'
+BTC = '0x7130d2a12b9bcbfae4f2634d864a1ee1ce3ead9c'
+WBNB_USDT_PAIR = '0x' + 'a1' * 20
+CAKE_WBNB_PAIR = '0x' + 'a2' * 20
+BTC_USDT_PAIR = '0x' + 'a3' * 20
+WALLET_A = '0x' + 'b1' * 20
+WALLET_B = '0x' + 'b2' * 20
+
+TOKENS = {
+    'USDT': {'address': USDT, 'symbol': 'USDT', 'decimals': 18},
+    'BNB': {'address': 'native', 'symbol': 'BNB', 'decimals': 18, 'isNative': True},
+    'WBNB': {'address': WBNB, 'symbol': 'WBNB', 'decimals': 18},
+    'CAKE': {'address': CAKE, 'symbol': 'CAKE', 'decimals': 18},
+    'BTC': {'address': BTC, 'symbol': 'BTC', 'decimals': 8},
+}
+
+# (token0, token1, reserve0, reserve1)
+PAIRS = {
+    WBNB_USDT_PAIR: (WBNB, USDT, 1000 * 10 ** 18, 600000 * 10 ** 18),   # 1 WBNB = 600 USDT
+    CAKE_WBNB_PAIR: (CAKE, WBNB, 300 * 10 ** 18, 1 * 10 ** 18),         # 300 CAKE = 1 WBNB
+    BTC_USDT_PAIR: (USDT, BTC, 6000000 * 10 ** 18, 100 * 10 ** 8),      # 1 BTC = 60000 USDT
+}
+
+BALANCES = {
+    (USDT, WALLET_A): 50 * 10 ** 18,
+    (CAKE, WALLET_A): 600 * 10 ** 18,
+    (BTC, WALLET_B): 5 * 10 ** 7,
+    ('native', WALLET_B): 2 * 10 ** 18,
+}
+
+
+def selector(signature):
+    return function_signature_to_4byte_selector(signature)
+
+
+class FakeNode:
+    """Canned contract state reachable through Multicall3 aggregate3"""
+
+    def __init__(self):
+        self.eth_calls = 0
+
+    def call(self, target, data):
+        target = target.lower()
+        head, args = data[:4], data[4:]
+        if target == PANCAKE_FACTORY_ADDRESS.lower() and head == selector('getPair(address,address)'):
+            a, b = decode(['address', 'address'], args)
+            for pair, (token0, token1, _, _) in PAIRS.items():
+                if {a.lower(), b.lower()} == {token0, token1}:
+                    return encode(['address'], [pair])
+            return encode(['address'], ['0x' + '00' * 20])
+        if target in PAIRS and head == selector('token0()'):
+            return encode(['address'], [PAIRS[target][0]])
+        if target in PAIRS and head == selector('getReserves()'):
+            _, _, reserve0, reserve1 = PAIRS[target]
+            return encode(['uint112', 'uint112', 'uint32'], [reserve0, reserve1, 0])
+        if head == selector('balanceOf(address)'):
+            (owner,) = decode(['address'], args)
+            return encode(['uint256'], [BALANCES.get((target, owner.lower()), 0)])
+        if target == MULTICALL3_ADDRESS.lower() and head == selector('getEthBalance(address)'):
+            (owner,) = decode(['address'], args)
+            return encode(['uint256'], [BALANCES.get(('native', owner.lower()), 0)])
+        return None
+
+    def handle(self, method, params):
+        if method == 'eth_chainId':
+            return hex(56)
+        if method == 'eth_blockNumber':
+            return hex(100)
+        if method == 'eth_call':
+            self.eth_calls += 1
+            transaction = params[0]
+            data = bytes.fromhex(transaction['data'][2:])
+            assert transaction['to'].lower() == MULTICALL3_ADDRESS.lower()
+            assert data[:4] == selector('aggregate3((address,bool,bytes)[])')
+            (calls,) = decode(['(address,bool,bytes)[]'], data[4:])
+            results = []
+            for target, _, call_data in calls:
+                returned = self.call(target, call_data)
+                results.append((returned is not None, returned or b''))
+            return '0x' + encode(['(bool,bytes)[]'], [results]).hex()
+        raise ValueError(f'Unsupported method {method}')
+
+
+@pytest.fixture
+def fake_node():
+    node = FakeNode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            body = json.dumps({'jsonrpc': '2.0', 'id': request['id'],
+                               'result': node.handle(request['method'], request['params'])}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    node.url = f'http://127.0.0.1:{server.server_port}'
+    yield node
+    server.shutdown()
+
+
+@pytest.fixture
+def engine(fake_node, tmp_path):
+    from web3 import Web3
+
+    config_path = tmp_path / 'token-config.json'
+    config_path.write_text(json.dumps({'tokens': TOKENS}))
+    registry = TokenRegistry(DBManager(), config_path=str(config_path))
+    registry.load()
+    return ValuationEngine(registry, w3=Web3(Web3.HTTPProvider(fake_node.url)))
+
+
+def test_prices_from_reserves(engine, fake_node):
+    prices = engine.get_prices()['prices']
+    assert prices['USDT'] == 1.0
+    assert prices['WBNB'] == pytest.approx(600.0)
+    assert prices['BNB'] == pytest.approx(600.0)
+    assert prices['CAKE'] == pytest.approx(2.0)     # routed through WBNB
+    assert prices['BTC'] == pytest.approx(60000.0)  # token1 side, 8 decimals
+
+    # Discovery (getPair + token0) and one reserves read; the next call is cached
+    assert fake_node.eth_calls == 3
+    engine.get_prices()
+    assert fake_node.eth_calls == 3
+
+
+def test_value_wallets(engine):
+    result = engine.value_wallets([WALLET_A, WALLET_B], ['USDT', 'BNB', 'CAKE', 'BTC'])
+    wallet_a, wallet_b = result['wallets']
+    assert wallet_a['total_usd'] == pytest.approx(50 + 600 * 2.0)
+    assert wallet_b['total_usd'] == pytest.approx(0.5 * 60000 + 2 * 600)
+    assert result['total_usd'] == pytest.approx(1250 + 31200)
+    assert result['unpriced_tokens'] == []
+
+
+def test_vectorized_valuation_matches_per_row(engine):
+    token_keys = ['USDT', 'CAKE', 'BTC']
+    prices = {'USDT': 1.0, 'CAKE': 2.0, 'BTC': None}
+    raw = np.array([[10 ** 18, 3 * 10 ** 18, 10 ** 8]] * 5000, dtype=np.float64)
+
+    values, totals = engine.value_balances(raw, token_keys, prices)
+    assert values.shape == (5000, 3)
+    # Unpriced tokens contribute nothing
+    assert np.allclose(totals, 1.0 + 6.0)
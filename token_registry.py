@@ -0,0 +1,242 @@
+"""
+Token metadata registry.
+
+Loaded once from contracts/token-config.json, then verified against the
+chain with a single batched Multicall3 read of decimals()/symbol()/name()
+for every token. Verified metadata is persisted to the token_metadata
+collection so a restart still has verified decimals when the chain is
+unreachable, and request paths look tokens up in memory by address or
+symbol instead of calling decimals() on every request.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from chain import encode_call
+from dbmanager import DBManager, decode_address, encode_address
+from multicall import aggregate, decode_result
+
+TOKEN_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contracts', 'token-config.json')
+
+# On-chain getters verified for each token, in call order
+METADATA_CALLS = (
+    ('decimals', 'decimals()'),
+    ('symbol', 'symbol()'),
+    ('name', 'name()'),
+)
+
+
+def load_token_config(path: str = TOKEN_CONFIG_PATH) -> Tuple[Dict[str, Any], List[str]]:
+    """Parse the token config; returns (config, token keys defined more than once)"""
+    duplicates: List[str] = []
+
+    def collect_duplicates(pairs):
+        seen = {}
+        for key, value in pairs:
+            if key in seen:
+                duplicates.append(key)
+            seen[key] = value
+        return seen
+
+    with open(path, 'r') as config_file:
+        config = json.load(config_file, object_pairs_hook=collect_duplicates)
+    return config, duplicates
+
+
+def _decode_text(success: bool, data: bytes) -> Optional[str]:
+    """string return value, or the bytes32 form some older tokens use"""
+    decoded = decode_result(['string'], success, data)
+    if decoded is not None:
+        return decoded[0]
+    decoded = decode_result(['bytes32'], success, data)
+    if decoded is not None:
+        return decoded[0].rstrip(b'\x00').decode('utf-8', errors='replace')
+    return None
+
+
+class TokenRegistry:
+    """In-memory token metadata, verified on-chain and persisted in MongoDB"""
+
+    def __init__(self, db_manager: DBManager, config_path: str = TOKEN_CONFIG_PATH,
+                 collection_name: str = 'token_metadata'):
+        self.db_manager = db_manager
+        self.config_path = config_path
+        self.collection_name = collection_name
+        self.network = None
+        self.tokens: Dict[str, Dict[str, Any]] = {}
+        self.mismatches: List[Dict[str, Any]] = []
+        self.verified_at = None
+        self.last_error = None
+        self._by_address: Dict[str, Dict[str, Any]] = {}
+        self._extra_decimals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def load(self) -> None:
+        """Read the token config file into memory"""
+        config, duplicates = load_token_config(self.config_path)
+        for symbol in duplicates:
+            print(f"[WARNING] Token {symbol} is defined more than once in {os.path.basename(self.config_path)}")
+
+        tokens = {}
+        for key, token in config.get('tokens', {}).items():
+            tokens[key] = dict(token, key=key, verified=False)
+        with self._lock:
+            self.network = config.get('network')
+            self.tokens = tokens
+            self._reindex()
+
+    def _reindex(self) -> None:
+        self._by_address = {
+            token['address'].lower(): token for token in self.tokens.values()
+            if not token.get('isNative')
+        }
+
+    def get(self, symbol_or_address: str) -> Optional[Dict[str, Any]]:
+        """Token metadata by config key (e.g. 'USDT') or contract address"""
+        token = self.tokens.get(symbol_or_address)
+        if token is None:
+            token = self._by_address.get(symbol_or_address.lower())
+        return token
+
+    def decimals(self, address: str, fetch: Optional[Callable[[], int]] = None) -> int:
+        """Decimals for a token address; unknown tokens are read once via fetch and remembered"""
+        token = self._by_address.get(address.lower())
+        if token is not None:
+            return token['decimals']
+        cached = self._extra_decimals.get(address.lower())
+        if cached is not None:
+            return cached
+        if fetch is None:
+            raise KeyError(f"Unknown token {address}")
+        decimals = int(fetch())
+        self._extra_decimals[address.lower()] = decimals
+        return decimals
+
+    def get_tokens(self) -> List[Dict[str, Any]]:
+        """All configured tokens"""
+        with self._lock:
+            return [dict(token) for token in self.tokens.values()]
+
+    def get_status(self) -> Dict[str, Any]:
+        """Verification summary"""
+        with self._lock:
+            return {
+                'network': self.network,
+                'token_count': len(self.tokens),
+                'verified_count': sum(1 for token in self.tokens.values() if token.get('verified')),
+                'verified_at': self.verified_at,
+                'mismatches': list(self.mismatches),
+                'last_error': self.last_error
+            }
+
+    def load_persisted(self) -> int:
+        """Apply metadata verified by an earlier run; returns how many tokens were updated"""
+        if not self.db_manager.is_connected():
+            return 0
+        try:
+            documents = list(self.db_manager.db[self.collection_name].find())
+        except PyMongoError as e:
+            print(f"[WARNING] Could not load persisted token metadata: {e}")
+            return 0
+
+        updated = 0
+        with self._lock:
+            for document in documents:
+                token = self.tokens.get(document['_id'])
+                # A persisted entry only counts for the address it was verified at
+                if token is None or token['address'].lower() != decode_address(document.get('address')):
+                    continue
+                token.update(decimals=document['decimals'], chain_symbol=document.get('symbol'),
+                             chain_name=document.get('name'), verified=True)
+                updated += 1
+        return updated
+
+    def verify(self) -> Dict[str, Any]:
+        """Read decimals/symbol/name for every token in one batched call and reconcile"""
+        with self._lock:
+            contracts = [(key, token['address']) for key, token in self.tokens.items() if not token.get('isNative')]
+
+        calls = [(address, signature) for _, address in contracts for _, signature in METADATA_CALLS]
+        try:
+            results = aggregate([(address, encode_call(signature)) for address, signature in calls])
+        except Exception as e:
+            self.last_error = str(e)
+            return {"success": False, "error": f"On-chain verification failed: {str(e)}"}
+
+        mismatches = []
+        verified = {}
+        for index, (key, address) in enumerate(contracts):
+            decimals_result, symbol_result, name_result = results[index * 3:index * 3 + 3]
+            decoded_decimals = decode_result(['uint8'], *decimals_result)
+            if decoded_decimals is None:
+                mismatches.append({'token': key, 'field': 'contract', 'config': address,
+                                   'chain': 'no ERC20 metadata at this address'})
+                continue
+            chain_values = {
+                'decimals': decoded_decimals[0],
+                'symbol': _decode_text(*symbol_result),
+                'name': _decode_text(*name_result)
+            }
+            verified[key] = chain_values
+
+            token = self.tokens[key]
+            for field, _ in METADATA_CALLS:
+                if chain_values[field] is not None and chain_values[field] != token.get(field):
+                    mismatches.append({'token': key, 'field': field,
+                                       'config': token.get(field), 'chain': chain_values[field]})
+
+        with self._lock:
+            for key, chain_values in verified.items():
+                # The chain is authoritative for decimals; display names stay as configured
+                self.tokens[key].update(decimals=chain_values['decimals'], chain_symbol=chain_values['symbol'],
+                                        chain_name=chain_values['name'], verified=True)
+            self.mismatches = mismatches
+            self.verified_at = datetime.now(timezone.utc)
+            self.last_error = None
+
+        for mismatch in mismatches:
+            print(f"[WARNING] Token {mismatch['token']} {mismatch['field']} mismatch: "
+                  f"config={mismatch['config']!r} chain={mismatch['chain']!r}")
+        self._persist(verified)
+        return {"success": True, "verified": len(verified), "mismatches": mismatches}
+
+    def _persist(self, verified: Dict[str, Dict[str, Any]]) -> None:
+        if not verified or not self.db_manager.is_connected():
+            return
+        try:
+            self.db_manager.db[self.collection_name].bulk_write([
+                UpdateOne({'_id': key}, {'$set': {
+                    'address': encode_address(self.tokens[key]['address']),
+                    'decimals': values['decimals'],
+                    'symbol': values['symbol'],
+                    'name': values['name'],
+                    'verified_at': self.verified_at
+                }}, upsert=True)
+                for key, values in verified.items()
+            ], ordered=False)
+        except PyMongoError as e:
+            print(f"[WARNING] Could not persist token metadata: {e}")
+
+    def start(self) -> threading.Thread:
+        """Verify on-chain on a daemon thread, falling back to persisted metadata"""
+        def run():
+            self.db_manager.wait_ready(timeout=10)
+            result = self.verify()
+            if result['success']:
+                print(f"[SUCCESS] Verified {result['verified']} tokens on-chain "
+                      f"({len(result['mismatches'])} config mismatches)")
+                return
+            print(f"[WARNING] {result['error']}")
+            restored = self.load_persisted()
+            if restored:
+                print(f"[INFO] Using persisted metadata for {restored} tokens")
+
+        self._thread = threading.Thread(target=run, name='token-registry', daemon=True)
+        self._thread.start()
+        return self._thread
@@ -0,0 +1,217 @@
+"""
+USD valuation of token holdings from PancakeSwap v2 pair reserves.
+
+Prices come from the reserves of each token's pair with the quote
+stablecoin (USDT), or with WBNB priced through the WBNB/USDT pair when no
+direct pair exists. Pair addresses are discovered once; reserves for all
+pairs are read in one batched Multicall3 call per block and the derived
+prices cached for that block. Wallet balances are valued as a
+wallets x tokens array against the price vector, so valuing thousands
+of wallets is a handful of numpy operations instead of per-row Python
+arithmetic.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chain import encode_call, to_checksum_address
+from head_follower import HeadFollower
+from multicall import MULTICALL3_ADDRESS, aggregate, decode_result
+from singleflight import rpc_flight
+from token_registry import TokenRegistry
+
+PANCAKE_FACTORY_ADDRESS = os.getenv('PANCAKE_FACTORY_ADDRESS', '0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73')
+
+ZERO_ADDRESS = '0x' + '00' * 20
+
+
+class ValuationEngine:
+    """Per-block token prices from DEX reserves and vectorized portfolio valuation"""
+
+    def __init__(self, registry: TokenRegistry, follower: Optional[HeadFollower] = None,
+                 quote_token: str = 'USDT', wrapped_native_token: str = 'WBNB',
+                 factory_address: str = PANCAKE_FACTORY_ADDRESS, price_ttl: float = 3.0, w3=None):
+        self.registry = registry
+        self.follower = follower
+        self.quote_token = quote_token
+        self.wrapped_native_token = wrapped_native_token
+        self.factory_address = factory_address
+        # Used when no head follower reports blocks: reuse prices for this many seconds
+        self.price_ttl = price_ttl
+        self.w3 = w3
+        self.pairs: Optional[Dict[str, Dict[str, Any]]] = None
+        self.prices: Dict[str, Any] = {}
+        self._sampled_at = 0.0
+        self._lock = threading.Lock()
+
+    def _priced_tokens(self) -> List[Dict[str, Any]]:
+        return [token for token in self.registry.get_tokens() if token.get('isActive', True)]
+
+    def _registry_address(self, key: str) -> str:
+        token = self.registry.get(key)
+        if token is None:
+            raise ValueError(f"Token {key} is not in the token registry")
+        return token['address'].lower()
+
+    def _address(self, token: Dict[str, Any]) -> str:
+        # Native BNB is priced as WBNB
+        if token.get('isNative'):
+            return self._registry_address(self.wrapped_native_token)
+        return token['address'].lower()
+
+    def discover_pairs(self) -> Dict[str, Dict[str, Any]]:
+        """Find each token's pair with the quote token and with WBNB (cached after the first call)"""
+        if self.pairs is not None:
+            return self.pairs
+
+        quote = self._registry_address(self.quote_token)
+        wrapped = self._registry_address(self.wrapped_native_token)
+        candidates: List[Tuple[str, str]] = [(wrapped, quote)]
+        for token in self._priced_tokens():
+            address = self._address(token)
+            if address != quote:
+                candidates.extend([(address, quote), (address, wrapped)])
+        candidates = list(dict.fromkeys(pair for pair in candidates if pair[0] != pair[1]))
+
+        results = aggregate([
+            (self.factory_address, encode_call('getPair(address,address)',
+                                               [to_checksum_address(a), to_checksum_address(b)]))
+            for a, b in candidates
+        ], w3=self.w3)
+        found = []
+        for (base, counter), result in zip(candidates, results):
+            decoded = decode_result(['address'], *result)
+            if decoded is not None and decoded[0].lower() != ZERO_ADDRESS:
+                found.append((base, counter, decoded[0].lower()))
+
+        # token0 decides which reserve belongs to which token
+        token0_results = aggregate([(pair, encode_call('token0()')) for _, _, pair in found], w3=self.w3)
+        pairs = {}
+        for (base, counter, pair), result in zip(found, token0_results):
+            decoded = decode_result(['address'], *result)
+            if decoded is not None:
+                pairs[f'{base}:{counter}'] = {'pair': pair, 'base_is_token0': decoded[0].lower() == base}
+        self.pairs = pairs
+        return pairs
+
+    def get_prices(self) -> Dict[str, Any]:
+        """USD price per token key, refreshed at most once per block"""
+        block = self.follower.latest_block if self.follower is not None else None
+        with self._lock:
+            cached = self.prices
+        if cached:
+            if block is not None and cached.get('block') == block:
+                return cached
+            if block is None and time.monotonic() - self._sampled_at < self.price_ttl:
+                return cached
+        # Concurrent requests for the same block share one reserves read
+        return rpc_flight.do(('pair_reserves', block), lambda: self.refresh_prices(block))
+
+    def refresh_prices(self, block: Optional[int] = None) -> Dict[str, Any]:
+        """Read reserves of every known pair in one batch and derive token prices"""
+        pairs = self.discover_pairs()
+        pair_keys = list(pairs)
+        results = aggregate([(pairs[key]['pair'], encode_call('getReserves()')) for key in pair_keys],
+                            block_identifier=block if block is not None else 'latest', w3=self.w3)
+
+        decimals = {self._address(token): token['decimals'] for token in self._priced_tokens()}
+        # Human-unit price of base in counter units, per pair
+        rates: Dict[str, float] = {}
+        for key, result in zip(pair_keys, results):
+            decoded = decode_result(['uint112', 'uint112', 'uint32'], *result)
+            if decoded is None:
+                continue
+            base, counter = key.split(':')
+            reserve0, reserve1, _ = decoded
+            base_reserve, counter_reserve = (reserve0, reserve1) if pairs[key]['base_is_token0'] else (reserve1, reserve0)
+            if base_reserve == 0 or base not in decimals or counter not in decimals:
+                continue
+            rates[key] = (counter_reserve / 10 ** decimals[counter]) / (base_reserve / 10 ** decimals[base])
+
+        quote = self._registry_address(self.quote_token)
+        wrapped = self._registry_address(self.wrapped_native_token)
+        wrapped_usd = rates.get(f'{wrapped}:{quote}')
+
+        prices: Dict[str, Optional[float]] = {}
+        for token in self._priced_tokens():
+            address = self._address(token)
+            if address == quote:
+                prices[token['key']] = 1.0
+            elif f'{address}:{quote}' in rates:
+                prices[token['key']] = rates[f'{address}:{quote}']
+            elif f'{address}:{wrapped}' in rates and wrapped_usd is not None:
+                prices[token['key']] = rates[f'{address}:{wrapped}'] * wrapped_usd
+            else:
+                prices[token['key']] = None
+
+        snapshot = {'block': block, 'prices': prices, 'updated_at': time.time()}
+        with self._lock:
+            self.prices = snapshot
+            self._sampled_at = time.monotonic()
+        return snapshot
+
+    def invalidate_from(self, block_number: int) -> None:
+        """Reorg listener: forget prices read from an orphaned block"""
+        with self._lock:
+            if self.prices.get('block') is not None and self.prices['block'] >= block_number:
+                self.prices = {}
+
+    def read_raw_balances(self, wallets: Sequence[str], token_keys: Sequence[str],
+                          block: Optional[int] = None) -> List[List[int]]:
+        """Exact integer balances per wallet and token, read in batched multicalls"""
+        calls = []
+        for wallet in wallets:
+            owner = to_checksum_address(wallet)
+            for key in token_keys:
+                token = self.registry.get(key)
+                if token.get('isNative'):
+                    calls.append((MULTICALL3_ADDRESS, encode_call('getEthBalance(address)', [owner])))
+                else:
+                    calls.append((token['address'], encode_call('balanceOf(address)', [owner])))
+
+        results = aggregate(calls, block_identifier=block if block is not None else 'latest', w3=self.w3)
+        # balanceOf returns a single 32-byte word; failed calls count as zero
+        raw = [int.from_bytes(data[:32], 'big') if success and len(data) >= 32 else 0 for success, data in results]
+        width = len(token_keys)
+        return [raw[row * width:(row + 1) * width] for row in range(len(wallets))]
+
+    def read_balances(self, wallets: Sequence[str], token_keys: Sequence[str],
+                      block: Optional[int] = None) -> np.ndarray:
+        """Raw balances as a wallets x tokens float array"""
+        raw = self.read_raw_balances(wallets, token_keys, block)
+        return np.array(raw, dtype=np.float64).reshape(len(wallets), len(token_keys))
+
+    def value_balances(self, raw_balances: np.ndarray, token_keys: Sequence[str],
+                       prices: Dict[str, Optional[float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """USD value per (wallet, token) and per wallet for a wallets x tokens raw balance array"""
+        scale = np.array([10.0 ** self.registry.get(key)['decimals'] for key in token_keys])
+        price_vector = np.array([prices.get(key) or 0.0 for key in token_keys])
+        values = raw_balances / scale * price_vector
+        return values, values.sum(axis=1)
+
+    def value_wallets(self, wallets: Sequence[str], token_keys: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Read balances for many wallets and value them at the current block's prices"""
+        if token_keys is None:
+            token_keys = [token['key'] for token in self._priced_tokens()]
+        snapshot = self.get_prices()
+        raw_balances = self.read_balances(wallets, token_keys, snapshot['block'])
+        values, totals = self.value_balances(raw_balances, token_keys, snapshot['prices'])
+
+        return {
+            'block': snapshot['block'],
+            'prices': {key: snapshot['prices'].get(key) for key in token_keys},
+            'unpriced_tokens': [key for key in token_keys if snapshot['prices'].get(key) is None],
+            'total_usd': float(totals.sum()),
+            'wallets': [
+                {
+                    'wallet_address': wallet.lower(),
+                    'total_usd': float(totals[row]),
+                    'tokens': {key: float(values[row, column]) for column, key in enumerate(token_keys)
+                               if raw_balances[row, column] > 0}
+                }
+                for row, wallet in enumerate(wallets)
+            ]
+        }